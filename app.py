@@ -7,11 +7,12 @@ import os
 import tempfile
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from werkzeug.utils import secure_filename
-from bytecode_interpreter import BytecodeInterpreter
+from bytecode_interpreter import ENGINES, BytecodeInterpreter, BytecodeLoadError, ExecutionLimitExceeded, RunMetrics
 from bytecode_optimizer import BytecodeOptimizer
+from bytecode_input import IterableSource
+from bytecode_output import ListSink
+from program_cache import ProgramCache
 import io
-import sys
-from contextlib import redirect_stdout, redirect_stderr
 from config import config
 
 app = Flask(__name__)
@@ -30,42 +31,161 @@ if not app.config.get("SECRET_KEY"):
 OUTPUTS_DIR = os.path.join(os.path.dirname(__file__), "outputs")
 os.makedirs(OUTPUTS_DIR, exist_ok=True)
 
+# Decoded programs shared by all requests; most traffic runs the same few programs.
+program_cache = ProgramCache(app.config["PROGRAM_CACHE_SIZE"])
+
+
+# Execution limits a request may set, with the type each value must have.
+LIMIT_TYPES = {
+    "max_instructions": int,
+    "time_limit": (int, float),
+    "max_call_depth": int,
+    "max_stack_size": int,
+    "max_int_bits": int,
+    "max_output_bytes": int,
+    "max_heap_size": int,
+}
+
+# Quotas every run has, so no program can use up the server's memory, with the config
+# setting that holds each one's default and largest value. Output is bounded by
+# MAX_OUTPUT_BYTES, past which it is truncated.
+QUOTA_SETTINGS = {
+    "max_stack_size": "MAX_STACK_SIZE",
+    "max_int_bits": "MAX_INT_BITS",
+    "max_call_depth": "MAX_CALL_DEPTH",
+    "max_heap_size": "MAX_HEAP_SIZE",
+}
+
+
+def parse_limits(data):
+    """
+    Validate the "limits" object of an API request.
+
+    Returns a dict of BytecodeInterpreter keyword arguments. Raises ValueError if a limit
+    is unknown, not a positive number, a time limit above MAX_TIME_LIMIT or a quota above
+    its setting in QUOTA_SETTINGS.
+    """
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError("limits must be an object")
+    limits = {}
+    for name, value in data.items():
+        if name not in LIMIT_TYPES:
+            raise ValueError(f"Unknown limit: {name}")
+        if isinstance(value, bool) or not isinstance(value, LIMIT_TYPES[name]) or value <= 0:
+            raise ValueError(f"{name} must be a positive number")
+        limits[name] = value
+    max_time_limit = app.config["MAX_TIME_LIMIT"]
+    if limits.get("time_limit", 0) > max_time_limit:
+        raise ValueError(f"time_limit must not exceed {max_time_limit:g} seconds")
+    for name, setting in QUOTA_SETTINGS.items():
+        if limits.get(name, 0) > app.config[setting]:
+            raise ValueError(f"{name} must not exceed {app.config[setting]}")
+    return limits
+
+
+def parse_inputs(data):
+    """
+    Validate the "inputs" array of an API request: the values READ takes, in order.
+
+    Returns a list of ints. Raises ValueError if inputs is not an array of integers.
+    """
+    if data is None:
+        return []
+    if not isinstance(data, list) or any(isinstance(value, bool) or not isinstance(value, int) for value in data):
+        raise ValueError("inputs must be an array of integers")
+    return data
+
+
+def parse_engine(data):
+    """
+    Validate the "engine" of an API request, defaulting to the RUN_ENGINE setting.
+
+    Returns the name of an engine in ENGINES. Raises ValueError for any other value.
+    """
+    if data is None:
+        return app.config["RUN_ENGINE"]
+    if data not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    return data
+
 
 class WebBytecodeRunner:
     """Helper class to run bytecode and capture output safely."""
 
     @staticmethod
-    def run_bytecode(code):
-        """Run bytecode and return output and any errors."""
-        interpreter = BytecodeInterpreter()
-
-        # Capture stdout and stderr
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
+    def run_bytecode(code, limits=None, inputs=None, engine=None, stats=False):
+        """
+        Run bytecode with optional execution limits and return output and any errors. READ takes
+        its values from inputs, and reads 0 once they run out; the server's stdin is never read.
+        The quotas in QUOTA_SETTINGS apply unless limits sets lower ones. The program runs with
+        engine, by default the RUN_ENGINE setting. With stats, results of programs that loaded
+        include the resource use of the run (see RunMetrics); measuring it runs the program in
+        the instrumented loop instead of the engine, so it is slower.
+        """
+        # Each run gets its own output and error streams, so concurrent requests do not mix.
+        output = ListSink(max_bytes=app.config["MAX_OUTPUT_BYTES"])
+        errors = io.StringIO()
+        run_limits = {name: app.config[setting] for name, setting in QUOTA_SETTINGS.items()}
+        run_limits.update(limits or {})
+        interpreter = BytecodeInterpreter(
+            engine=engine or app.config["RUN_ENGINE"],
+            output=output,
+            errors=errors,
+            inputs=IterableSource(inputs or []),
+            **run_limits,
+        )
+        metrics = RunMetrics() if stats else None
 
         try:
-            interpreter.load_program(code)
-
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-                interpreter.run()
+            program_cache.load(interpreter, code)
+            interpreter.run(metrics=metrics)
 
-            output = stdout_capture.getvalue()
-            errors = stderr_capture.getvalue()
-
-            return {
+            result = {
                 "success": True,
-                "output": output,
-                "errors": errors,
+                "output": output.getvalue(),
+                "errors": errors.getvalue(),
+                "output_truncated": output.truncated,
                 "stack": interpreter.stack,
                 "variables": interpreter.variables,
                 "halted": interpreter.halted,
             }
+            if metrics is not None:
+                result["stats"] = metrics.to_dict()
+            return result
+
+        except BytecodeLoadError as e:
+            return {
+                "success": False,
+                "output": "",
+                "errors": str(e),
+                "stack": [],
+                "variables": {},
+                "halted": True,
+            }
+
+        except ExecutionLimitExceeded as e:
+            result = {
+                "success": False,
+                "output": output.getvalue(),
+                "errors": f"Runtime error at line {interpreter.line_numbers[interpreter.program_counter]}: {e}",
+                "output_truncated": output.truncated,
+                "limit_exceeded": type(e).__name__,
+                "stack": interpreter.stack,
+                "variables": interpreter.variables,
+                "halted": True,
+            }
+            if metrics is not None:
+                result["stats"] = metrics.to_dict()
+            return result
 
         except Exception as e:
             return {
                 "success": False,
-                "output": stdout_capture.getvalue(),
+                "output": output.getvalue(),
                 "errors": f"Runtime error: {str(e)}",
+                "output_truncated": output.truncated,
                 "stack": getattr(interpreter, "stack", []),
                 "variables": getattr(interpreter, "variables", {}),
                 "halted": True,
@@ -320,7 +440,17 @@ def api_run():
     if not data or "code" not in data:
         return jsonify({"error": "No code provided"}), 400
 
-    result = WebBytecodeRunner.run_bytecode(data["code"])
+    try:
+        limits = parse_limits(data.get("limits"))
+        inputs = parse_inputs(data.get("inputs"))
+        engine = parse_engine(data.get("engine"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    stats = data.get("stats", False)
+    if not isinstance(stats, bool):
+        return jsonify({"error": "stats must be true or false"}), 400
+
+    result = WebBytecodeRunner.run_bytecode(data["code"], limits, inputs, engine, stats)
     return jsonify(result)
 
 
@@ -335,6 +465,12 @@ def api_optimize():
     return jsonify(result)
 
 
+@app.route("/api/cache")
+def api_cache():
+    """API endpoint reporting the size and hit/miss counters of the program cache."""
+    return jsonify(program_cache.stats())
+
+
 @app.route("/health")
 def health():
     """Health check endpoint for deployment."""
@@ -0,0 +1,125 @@
+"""
+Benchmarks the interpreter's execution engines on loop-heavy programs.
+
+Each workload is a tests/test3.bc-style counting loop scaled up to a given number of
+iterations. Every engine runs every workload a few times and the best time is reported,
+together with its speedup over the dispatch engine.
+
+Usage:
+    python benchmark.py [--iterations N] [--repeat R] [--engine NAME ...]
+"""
+
+import argparse
+import time
+
+from bytecode_interpreter import BytecodeInterpreter, ENGINES
+from bytecode_output import ListSink
+
+# Programs parameterised by the loop count {n}. None of them prints inside the loop,
+# so the measurement is dominated by instruction dispatch.
+WORKLOADS = {
+    "countdown": """# tests/test3.bc without the PRINT in the loop body
+PUSH {n}
+STORE x
+LOOP_START:
+LOAD x
+PUSH 0
+GT
+JZ LOOP_END
+LOAD x
+PUSH 1
+SUB
+STORE x
+JMP LOOP_START
+
+LOOP_END:
+HALT""",
+    "sum": """# Sum of 0..n-1 modulo a prime, keeping integers small
+PUSH 0
+STORE total
+PUSH {n}
+STORE i
+loop:
+    LOAD i
+    JZ end
+    LOAD i
+    PUSH 1
+    SUB
+    STORE i
+    LOAD total
+    LOAD i
+    ADD
+    PUSH 1000003
+    MOD
+    STORE total
+    JMP loop
+end:
+    LOAD total
+    PRINT
+    HALT""",
+    "calls": """# Loop calling a subroutine, like the double_func example in app.py
+PUSH {n}
+STORE i
+loop:
+    LOAD i
+    JZ end
+    LOAD i
+    CALL double_func
+    POP
+    LOAD i
+    PUSH 1
+    SUB
+    STORE i
+    JMP loop
+end:
+    HALT
+
+double_func:
+    DUP
+    ADD
+    RET""",
+}
+
+
+def time_engine(engine: str, source: str, repeat: int) -> float:
+    """
+    Loads and runs a program with the given engine `repeat` times.
+
+    Args:
+        engine (str): The engine name passed to BytecodeInterpreter.
+        source (str): The bytecode program.
+        repeat (int): How many times to run it.
+    Returns:
+        float: The best wall-clock time of run(), in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        interpreter = BytecodeInterpreter(engine=engine, output=ListSink())
+        interpreter.load_program(source)
+        start = time.perf_counter()
+        interpreter.run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bytecode execution engines.")
+    parser.add_argument("--iterations", type=int, default=20000, help="loop iterations per workload")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per engine; the best is kept")
+    parser.add_argument(
+        "--engine", action="append", choices=ENGINES, help="engine to benchmark (default: all)"
+    )
+    options = parser.parse_args()
+    engines = options.engine or list(ENGINES)
+
+    print(f"{'workload':<12}{'engine':<12}{'seconds':>10}{'speedup':>10}")
+    for name, template in WORKLOADS.items():
+        source = template.format(n=options.iterations)
+        baseline = time_engine("dispatch", source, options.repeat)
+        for engine in engines:
+            elapsed = baseline if engine == "dispatch" else time_engine(engine, source, options.repeat)
+            print(f"{name:<12}{engine:<12}{elapsed:>10.4f}{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
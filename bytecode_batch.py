@@ -0,0 +1,533 @@
+"""
+Batched execution of one program over many inputs with NumPy.
+
+run_batch runs the program loaded into a BytecodeInterpreter once per lane, for N lanes
+that differ in the values READ takes and in the variables they start with, and returns
+what each lane printed and its final state. Instead of N interpreters paying for every
+instruction N times, lanes that are at the same instruction run it together: their stack
+entries and variables are NumPy int64 arrays with one element per lane.
+
+- Lanes start as one group. A JZ or JNZ that goes both ways splits a group into the lanes
+  that jump and those that do not; a division by zero, an overflowing PRINT or a limit
+  splits off the lanes it stops.
+- Groups that reach the same instruction with the same call stack, stack depth and defined
+  variables are merged again. The group at the lowest instruction runs first, so lanes that
+  leave a loop early wait at its exit for the others.
+
+Values are signed 64-bit integers that wrap around, so every lane behaves exactly like
+BytecodeInterpreter(int_width=64, overflow="wrap") run on its own. max_instructions and
+max_call_depth apply to each lane and time_limit to the whole batch; a lane that exceeds
+one ends with the error the command line would print. Programs that use heap arrays are not
+supported. NumPy is only needed for this module.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from bytecode_intrinsics import Intrinsic
+from bytecode_interpreter import (
+    ARRAY_OPS,
+    CONTROL_FLOW_OPS,
+    DEFAULT_TIME_LIMIT,
+    OP_ADD,
+    OP_CALL,
+    OP_DIV,
+    OP_DUP,
+    OP_EQ,
+    OP_GE,
+    OP_GT,
+    OP_HALT,
+    OP_INVALID,
+    OP_JMP,
+    OP_JNZ,
+    OP_JZ,
+    OP_LE,
+    OP_LOAD,
+    OP_LT,
+    OP_MOD,
+    OP_MUL,
+    OP_NATIVE,
+    OP_NEG,
+    OP_NEQ,
+    OP_NOP,
+    OP_POP,
+    OP_PRINT,
+    OP_PUSH,
+    OP_READ,
+    OP_RET,
+    OP_STORE,
+    OP_SUB,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    CallDepthExceeded,
+    InstructionLimitExceeded,
+    TimeLimitExceeded,
+)
+
+# Lane steps between two checks of the time limit.
+TIME_CHECK_INTERVAL = 1000
+
+_BINARY = {
+    OP_ADD: np.add,
+    OP_SUB: np.subtract,
+    OP_MUL: np.multiply,
+    OP_EQ: np.equal,
+    OP_NEQ: np.not_equal,
+    OP_LT: np.less,
+    OP_GT: np.greater,
+    OP_LE: np.less_equal,
+    OP_GE: np.greater_equal,
+}
+
+# Python ints of any size are wrapped into int64 the same way as by the fixed-width mode.
+_INT64 = 1 << 64
+_INT64_MIN = -(1 << 63)
+
+
+def wrap_int64(value: int) -> int:
+    """Returns value wrapped around into the signed 64-bit range."""
+    return (value - _INT64_MIN) % _INT64 + _INT64_MIN
+
+
+class LaneResult:
+    """
+    The outcome of one lane of a batch:
+    - output: The values the lane printed, in order.
+    - stack, variables: Its final stack and defined variables.
+    - halted: Whether it stopped at a HALT or a RET with no call to return to.
+    - error: The runtime error that stopped it, or the limit it exceeded, as the command line
+      reports it ("Runtime error at line N: ..."), or None.
+    - instructions_executed: The instructions it executed.
+    """
+
+    def __init__(
+        self,
+        output: List[int],
+        stack: List[int],
+        variables: Dict[str, int],
+        halted: bool,
+        error: Optional[str],
+        instructions_executed: int,
+    ):
+        self.output = output
+        self.stack = stack
+        self.variables = variables
+        self.halted = halted
+        self.error = error
+        self.instructions_executed = instructions_executed
+
+    def to_dict(self) -> Dict[str, object]:
+        """Returns the result as JSON-serialisable data."""
+        return dict(vars(self))
+
+
+class _Group:
+    """Lanes at the same instruction, with the same call stack, stack depth and defined variables."""
+
+    __slots__ = ("lanes", "pc", "stack", "slots", "call_stack", "executed", "reads")
+
+    def __init__(
+        self,
+        lanes: np.ndarray,
+        pc: int,
+        stack: List[np.ndarray],
+        slots: List[Optional[np.ndarray]],
+        call_stack: Tuple[int, ...],
+        executed: np.ndarray,
+        reads: np.ndarray,
+    ):
+        self.lanes = lanes
+        self.pc = pc
+        self.stack = stack
+        self.slots = slots
+        self.call_stack = call_stack
+        self.executed = executed
+        self.reads = reads
+
+    def key(self) -> Tuple:
+        return self.pc, self.call_stack, len(self.stack), tuple(slot is None for slot in self.slots)
+
+    def select(self, mask: np.ndarray) -> "_Group":
+        """Returns the lanes of the group selected by a boolean mask."""
+        return _Group(
+            self.lanes[mask],
+            self.pc,
+            [values[mask] for values in self.stack],
+            [None if values is None else values[mask] for values in self.slots],
+            self.call_stack,
+            self.executed[mask],
+            self.reads[mask],
+        )
+
+    @staticmethod
+    def merge(groups: List["_Group"]) -> "_Group":
+        """Returns one group holding the lanes of groups, which have the same key()."""
+        first = groups[0]
+        return _Group(
+            np.concatenate([group.lanes for group in groups]),
+            first.pc,
+            [np.concatenate(values) for values in zip(*(group.stack for group in groups))],
+            [
+                None if values[0] is None else np.concatenate(values)
+                for values in zip(*(group.slots for group in groups))
+            ],
+            first.call_stack,
+            np.concatenate([group.executed for group in groups]),
+            np.concatenate([group.reads for group in groups]),
+        )
+
+
+class _Batch:
+    """The state of a run_batch call: the program, the active groups and what finished lanes left."""
+
+    def __init__(self, interpreter: BytecodeInterpreter, inputs: np.ndarray, slot_names: List[str]):
+        self.interpreter = interpreter
+        self.code = [
+            (opcode, wrap_int64(arg) if opcode == OP_PUSH else arg) for opcode, arg in interpreter.code
+        ]
+        self.line_numbers = interpreter.line_numbers
+        self.slot_names = slot_names
+        self.inputs = inputs
+        self.groups: List[_Group] = []
+        # Printed values as (lanes, values) in execution order, and finished groups with the
+        # halted flag and error of their lanes.
+        self.printed: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.finished: List[Tuple[_Group, bool, Optional[str]]] = []
+
+    def error(self, pc: int, message: object) -> str:
+        return f"Runtime error at line {self.line_numbers[pc]}: {message}"
+
+    def finish(self, group: _Group, halted: bool = False, error: Optional[str] = None) -> None:
+        if len(group.lanes):
+            self.finished.append((group, halted, error))
+
+    def split(self, group: _Group, failed: np.ndarray, error: str) -> Optional[_Group]:
+        """Finishes the lanes of group selected by failed with error; returns the others, if any."""
+        if not failed.any():
+            return group
+        self.finish(group.select(failed), error=error)
+        if failed.all():
+            return None
+        return group.select(~failed)
+
+    def step(self, group: _Group) -> List[_Group]:
+        """Executes the instruction at group.pc for every lane of group; returns the groups that continue."""
+        pc = group.pc
+        if pc >= len(self.code):
+            self.finish(group)
+            return []
+        opcode, arg = self.code[pc]
+        stack = group.stack
+        group.executed += 1
+        next_pc = pc + 1
+
+        if opcode == OP_PUSH:
+            stack.append(np.full(len(group.lanes), arg, dtype=np.int64))
+        elif opcode == OP_LOAD:
+            values = group.slots[arg]
+            if values is None:
+                self.finish(group, error=self.error(pc, f"Undefined variable: {self.slot_names[arg]}"))
+                return []
+            stack.append(values)
+        elif opcode == OP_STORE:
+            if stack:
+                group.slots[arg] = stack.pop()
+        elif opcode in _BINARY:
+            if len(stack) >= 2:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(_BINARY[opcode](a, b).astype(np.int64, copy=False))
+        elif opcode == OP_DIV or opcode == OP_MOD:
+            if len(stack) >= 2:
+                b = stack.pop()
+                a = stack.pop()
+                zero = b == 0
+                message = "Division by zero" if opcode == OP_DIV else "Modulo by zero"
+                group = self.split(group, zero, self.error(pc, message))
+                if group is None:
+                    return []
+                if zero.any():
+                    a = a[~zero]
+                    b = b[~zero]
+                stack = group.stack
+                stack.append(np.floor_divide(a, b) if opcode == OP_DIV else np.remainder(a, b))
+        elif opcode == OP_NEG:
+            if stack:
+                stack.append(np.negative(stack.pop()))
+        elif opcode == OP_DUP:
+            if stack:
+                stack.append(stack[-1])
+        elif opcode == OP_POP:
+            if not stack:
+                self.finish(group, error=self.error(pc, "Stack Underflow."))
+                return []
+            stack.pop()
+        elif opcode == OP_PRINT:
+            if stack:
+                overflow = stack[-1] > 2147483647
+                group = self.split(group, overflow, self.error(pc, "OVERFLOW!"))
+                if group is None:
+                    return []
+                self.printed.append((group.lanes, group.stack[-1]))
+            else:
+                self.printed.append((group.lanes, np.zeros(len(group.lanes), dtype=np.int64)))
+        elif opcode == OP_READ:
+            column = np.minimum(group.reads, self.inputs.shape[1] - 1)
+            stack.append(self.inputs[group.lanes, column])
+            group.reads = group.reads + 1
+        elif opcode == OP_NATIVE:
+            group = self.call_native(group, pc, arg)
+            if group is None:
+                return []
+        elif opcode == OP_HALT:
+            self.finish(group, halted=True)
+            return []
+        elif opcode == OP_JMP:
+            next_pc = arg
+        elif opcode == OP_JZ or opcode == OP_JNZ:
+            if stack:
+                jumps = (stack.pop() == 0) if opcode == OP_JZ else (stack.pop() != 0)
+                if jumps.all():
+                    next_pc = arg
+                elif jumps.any():
+                    taken = group.select(jumps)
+                    group = group.select(~jumps)
+                    return self.transfer(taken, pc, arg) + self.transfer(group, pc, next_pc)
+        elif opcode == OP_CALL:
+            limit = self.interpreter.max_call_depth
+            if limit is not None and len(group.call_stack) >= limit:
+                self.finish(group, error=self.error(pc, CallDepthExceeded(limit)))
+                return []
+            group.call_stack += (pc + 1,)
+            next_pc = arg
+        elif opcode == OP_RET:
+            if not group.call_stack:
+                self.finish(group, halted=True)
+                return []
+            next_pc = group.call_stack[-1]
+            group.call_stack = group.call_stack[:-1]
+        elif opcode == OP_INVALID:
+            self.finish(group, error=self.error(pc, arg))
+            return []
+        elif opcode != OP_NOP:
+            raise ValueError(f"Unexpected opcode {opcode} at instruction {pc}")
+
+        if opcode in CONTROL_FLOW_OPS:
+            return self.transfer(group, pc, next_pc)
+        group.pc = next_pc
+        return [group]
+
+    def call_native(self, group: _Group, pc: int, intrinsic: Intrinsic) -> Optional[_Group]:
+        """
+        Calls intrinsic once per lane of group, finishing the lanes where it fails; returns the
+        others, if any, with its results on their stacks.
+        """
+        stack = group.stack
+        count = intrinsic.arguments
+        if len(stack) < count:
+            self.finish(group, error=self.error(pc, "Stack Underflow."))
+            return None
+        columns = [values.tolist() for values in stack[len(stack) - count :]]
+        del stack[len(stack) - count :]
+        size = len(group.lanes)
+        failed = np.zeros(size, dtype=bool)
+        errors: Dict[str, List[int]] = {}
+        results = []
+        for lane in range(size):
+            try:
+                values = intrinsic.apply([column[lane] for column in columns])
+                results.append([wrap_int64(value) for value in values])
+            except RuntimeError as e:
+                failed[lane] = True
+                errors.setdefault(str(e), []).append(lane)
+        for message, lanes in errors.items():
+            selected = np.zeros(size, dtype=bool)
+            selected[lanes] = True
+            self.finish(group.select(selected), error=self.error(pc, message))
+        if failed.all():
+            return None
+        if failed.any():
+            group = group.select(~failed)
+        for index in range(intrinsic.results):
+            group.stack.append(np.array([values[index] for values in results], dtype=np.int64))
+        return group
+
+    def transfer(self, group: _Group, pc: int, target: int) -> List[_Group]:
+        """
+        Moves group to target after the control transfer at pc; a backward transfer is a
+        checkpoint, where lanes past max_instructions stop, as in BytecodeInterpreter.run().
+        """
+        group.pc = target
+        limit = self.interpreter.max_instructions
+        if limit is not None and target <= pc:
+            group = self.split(group, group.executed > limit, self.error(target, InstructionLimitExceeded(limit)))
+            if group is None:
+                return []
+        return [group]
+
+    def run(self, time_limit: Optional[float]) -> None:
+        deadline = time.time() + time_limit if time_limit is not None else float("inf")
+        steps = 0
+        while self.groups:
+            pc = min(group.pc for group in self.groups)
+            ready = [group for group in self.groups if group.pc == pc]
+            waiting = [group for group in self.groups if group.pc != pc]
+            if len(ready) > 1:
+                by_key: Dict[Tuple, List[_Group]] = {}
+                for group in ready:
+                    by_key.setdefault(group.key(), []).append(group)
+                ready = [_Group.merge(groups) if len(groups) > 1 else groups[0] for groups in by_key.values()]
+            self.groups = waiting + ready[1:] + self.step(ready[0])
+            steps += 1
+            if steps % TIME_CHECK_INTERVAL == 0 and time.time() > deadline:
+                for group in self.groups:
+                    line_pc = min(group.pc, len(self.code) - 1)
+                    self.finish(group, error=self.error(line_pc, TimeLimitExceeded(time_limit)))
+                self.groups = []
+
+    def results(self, size: int) -> List[LaneResult]:
+        outputs: List[List[int]] = [[] for _ in range(size)]
+        for lanes, values in self.printed:
+            for lane, value in zip(lanes.tolist(), values.tolist()):
+                outputs[lane].append(value)
+        results: List[Optional[LaneResult]] = [None] * size
+        for group, halted, error in self.finished:
+            stacks = list(zip(*(values.tolist() for values in group.stack))) if group.stack else None
+            defined = [(name, values.tolist()) for name, values in zip(self.slot_names, group.slots) if values is not None]
+            for j, (lane, executed) in enumerate(zip(group.lanes.tolist(), group.executed.tolist())):
+                results[lane] = LaneResult(
+                    outputs[lane],
+                    list(stacks[j]) if stacks else [],
+                    {name: values[j] for name, values in defined},
+                    halted,
+                    error,
+                    executed,
+                )
+        return results
+
+
+def run_batch(
+    interpreter: BytecodeInterpreter,
+    inputs: Optional[Sequence[Sequence[int]]] = None,
+    variables: Optional[Dict[str, Union[int, Sequence[int]]]] = None,
+    size: Optional[int] = None,
+) -> List[LaneResult]:
+    """
+    Runs the program loaded into interpreter once per lane, with its max_instructions,
+    time_limit and max_call_depth, and returns the result of each lane. The interpreter's
+    own state is not used or changed.
+
+    Args:
+        interpreter (BytecodeInterpreter): The interpreter the program was loaded into.
+        inputs (Optional[Sequence[Sequence[int]]]): The values READ takes in each lane; READ
+            reads 0 once a lane's values run out.
+        variables (Optional[Dict[str, Union[int, Sequence[int]]]]): Variables to define before
+            the run, each with one value per lane or one value for all lanes.
+        size (Optional[int]): The number of lanes; by default the length of inputs or of the
+            variables' sequences.
+    Returns:
+        List[LaneResult]: One result per lane.
+    Raises:
+        ValueError: If the number of lanes is not given or the arguments disagree on it, or if
+            the program uses heap arrays, which lanes cannot share.
+    """
+    if any(opcode in ARRAY_OPS for opcode, _ in interpreter.code):
+        raise ValueError("programs that use heap arrays cannot run as a batch")
+    lengths = set()
+    if size is not None:
+        lengths.add(size)
+    if inputs is not None:
+        lengths.add(len(inputs))
+    for values in (variables or {}).values():
+        if not isinstance(values, int):
+            lengths.add(len(values))
+    if len(lengths) != 1:
+        raise ValueError("the number of lanes must be given by size, inputs or variables, consistently")
+    size = lengths.pop()
+
+    width = max((len(values) for values in inputs), default=0) if inputs is not None else 0
+    # One more column than the longest input, of zeros, for lanes whose values ran out.
+    table = np.zeros((size, width + 1), dtype=np.int64)
+    for lane, values in enumerate(inputs or []):
+        table[lane, : len(values)] = [wrap_int64(value) for value in values]
+
+    slot_names = list(interpreter.slot_names)
+    slots: List[Optional[np.ndarray]] = [None] * len(slot_names)
+    for name, values in (variables or {}).items():
+        if name not in slot_names:
+            slot_names.append(name)
+            slots.append(None)
+        if isinstance(values, int):
+            values = [values] * size
+        slots[slot_names.index(name)] = np.array([wrap_int64(value) for value in values], dtype=np.int64)
+
+    batch = _Batch(interpreter, table, slot_names)
+    if size:
+        batch.groups.append(
+            _Group(
+                np.arange(size),
+                0,
+                [],
+                slots,
+                (),
+                np.zeros(size, dtype=np.int64),
+                np.zeros(size, dtype=np.int64),
+            )
+        )
+    with np.errstate(over="ignore"):
+        batch.run(interpreter.time_limit)
+    return batch.results(size)
+
+
+def main():
+    """
+    Command line interface: runs a bytecode file once per line of an input file, which holds the
+    whitespace-separated values READ takes in that lane, and prints one JSON result per lane.
+        python bytecode_batch.py <input_file> <lanes_file> [--max-instructions N] [--time-limit S]
+    """
+    parser = argparse.ArgumentParser(description="Run a bytecode program over many inputs.")
+    parser.add_argument("filename", help="bytecode file")
+    parser.add_argument("lanes", help="file with the READ values of one lane per line")
+    parser.add_argument(
+        "--max-instructions", type=int, default=None, help="maximum number of instructions per lane"
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=DEFAULT_TIME_LIMIT,
+        help=f"maximum run time of the batch in seconds, 0 for none (default: {DEFAULT_TIME_LIMIT:g})",
+    )
+    parser.add_argument("--max-call-depth", type=int, default=None, help="maximum number of nested calls")
+    options = parser.parse_args()
+    try:
+        with open(options.filename, "r", encoding="utf-8") as f:
+            bytecode = f.read()
+        with open(options.lanes, "r", encoding="utf-8") as f:
+            inputs = [[int(value) for value in line.split()] for line in f]
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    interpreter = BytecodeInterpreter(
+        max_instructions=options.max_instructions,
+        time_limit=options.time_limit or None,
+        max_call_depth=options.max_call_depth,
+    )
+    try:
+        interpreter.load_program(bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    for lane, result in enumerate(run_batch(interpreter, inputs)):
+        print(json.dumps({"lane": lane, **result.to_dict()}))
+
+
+if __name__ == "__main__":
+    main()
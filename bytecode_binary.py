@@ -0,0 +1,350 @@
+"""
+Compact binary format for bytecode programs.
+
+The assembler turns bytecode source into a binary image that holds the program exactly as
+load_program decodes it, so loading it needs no text parsing: BytecodeInterpreter.load_binary
+builds the decoded instruction stream straight from the arrays. The image is read with mmap,
+and the disassembler turns it back into source that assembles to the same image.
+
+Layout (all integers little-endian):
+
+    header        magic b"BCX1", format version (u16), reserved (u16), then u32 counts of
+                  instructions, constants, names, labels and texts, and the source line count
+    opcodes       one byte per instruction, padded to a multiple of 4 bytes
+    operands      one i32 per instruction: an index into the constant pool (PUSH), the name
+                  table (LOAD, STORE) or the text table (INVALID, NATIVE), or the resolved jump
+                  or call target (JMP, JZ, JNZ, CALL); 0 for the other opcodes
+    lines         one u32 per instruction: its source line number
+    constants     PUSH literals: u32 byte length, then the value in two's complement
+    names         variable names: u32 byte length, then UTF-8
+    labels        u32 target index, u32 line number, u32 byte length, then the UTF-8 name
+    texts         source text of the instructions that could not be decoded, and the intrinsic
+                  names NATIVE calls: u32 byte length, then UTF-8
+
+Undecodable lines are kept as text so they fail with the same message, and at the same
+moment, as when the source is run. Intrinsics are stored by name and resolved against the
+loading interpreter's registry, like the source does.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Union
+
+from bytecode_interpreter import (
+    BRANCH_OPS,
+    OPCODE_NAMES,
+    OP_INVALID,
+    OP_LOAD,
+    OP_NATIVE,
+    OP_NOP,
+    OP_PUSH,
+    OP_STORE,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+)
+
+MAGIC = b"BCX1"
+FORMAT_VERSION = 3
+
+_HEADER = struct.Struct("<4sHHIIIIII")
+_U32 = struct.Struct("<I")
+_LABEL = struct.Struct("<III")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class BinaryProgram:
+    """
+    A program read from the binary format, as arrays indexed by instruction:
+    - opcodes: The opcode number of each instruction (bytes).
+    - operands: The raw operand of each instruction, see the module docstring (array of int).
+    - line_numbers: The source line of each instruction (array of int).
+    - constants, names, texts: The constant pool, name table and text table.
+    - labels: Label names mapped to the instruction index they precede.
+    - label_lines: Label names mapped to the source line that defines them.
+    - line_count: The number of source lines.
+    """
+
+    def __init__(
+        self,
+        opcodes: bytes,
+        operands: array,
+        line_numbers: array,
+        constants: List[int],
+        names: List[str],
+        texts: List[str],
+        labels: Dict[str, int],
+        label_lines: Dict[str, int],
+        line_count: int,
+    ):
+        self.opcodes = opcodes
+        self.operands = operands
+        self.line_numbers = line_numbers
+        self.constants = constants
+        self.names = names
+        self.texts = texts
+        self.labels = labels
+        self.label_lines = label_lines
+        self.line_count = line_count
+
+
+def _sized(data: bytes) -> bytes:
+    return _U32.pack(len(data)) + data
+
+
+def _int_bytes(value: int) -> bytes:
+    return value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+
+
+def _array_bytes(typecode: str, values) -> bytes:
+    items = array(typecode, values)
+    if sys.byteorder == "big":
+        items.byteswap()
+    return items.tobytes()
+
+
+def assemble(source: str, interpreter: Optional[BytecodeInterpreter] = None) -> bytes:
+    """
+    Assembles bytecode source into the binary format.
+
+    Args:
+        source (str): The bytecode program, as accepted by load_program.
+        interpreter (Optional[BytecodeInterpreter]): An interpreter that has just loaded source,
+            to reuse its decoded program instead of loading source again.
+    Returns:
+        bytes: The binary image.
+    Raises:
+        BytecodeLoadError: If the program cannot be loaded (e.g. a jump to an undefined label).
+    """
+    if interpreter is None:
+        interpreter = BytecodeInterpreter(superinstructions=False, verify_stack=False)
+        interpreter.load_program(source)
+    lines = source.strip().split("\n")
+
+    label_lines: Dict[str, int] = {}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line.endswith(":") and not line.startswith("#"):
+            label_lines[line[:-1].strip()] = number
+
+    constants: Dict[int, int] = {}
+    names: Dict[str, int] = {}
+    texts: List[str] = []
+    opcodes = bytearray()
+    operands = []
+    for (op, arg), line in zip(interpreter.code, interpreter.line_numbers):
+        opcodes.append(op)
+        if op == OP_PUSH:
+            operands.append(constants.setdefault(arg, len(constants)))
+        elif op == OP_LOAD or op == OP_STORE:
+            operands.append(names.setdefault(interpreter.slot_names[arg], len(names)))
+        elif op in BRANCH_OPS:
+            operands.append(arg)
+        elif op == OP_INVALID:
+            operands.append(len(texts))
+            texts.append(interpreter.instructions[line - 1])
+        elif op == OP_NATIVE:
+            operands.append(len(texts))
+            texts.append(arg.name)
+        else:
+            operands.append(0)
+    opcodes.extend(bytes(-len(opcodes) % 4))
+
+    parts = [
+        _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            0,
+            len(interpreter.code),
+            len(constants),
+            len(names),
+            len(interpreter.labels),
+            len(texts),
+            len(lines),
+        ),
+        bytes(opcodes),
+        _array_bytes("i", operands),
+        _array_bytes("I", interpreter.line_numbers),
+    ]
+    parts.extend(_sized(_int_bytes(value)) for value in constants)
+    parts.extend(_sized(name.encode("utf-8")) for name in names)
+    for name, index in interpreter.labels.items():
+        encoded = name.encode("utf-8")
+        parts.append(_LABEL.pack(index, label_lines[name], len(encoded)) + encoded)
+    parts.extend(_sized(text.encode("utf-8")) for text in texts)
+    return b"".join(parts)
+
+
+def is_binary(data: Buffer) -> bool:
+    """Returns True if data starts like a binary program."""
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def read_program(data: Buffer) -> BinaryProgram:
+    """
+    Reads a binary image. Only the constant, name, label and text tables are parsed one
+    entry at a time; the per-instruction arrays are copied out in one piece each.
+
+    Args:
+        data (Buffer): The binary image, e.g. bytes or an mmap.
+    Returns:
+        BinaryProgram: The program's arrays and tables.
+    Raises:
+        BytecodeLoadError: If data is not a valid binary program.
+    """
+    view = memoryview(data)
+    try:
+        magic, version, _, count, constant_count, name_count, label_count, text_count, line_count = (
+            _HEADER.unpack_from(view, 0)
+        )
+        if magic != MAGIC:
+            raise ValueError("not a binary bytecode program")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported format version {version}")
+        offset = _HEADER.size
+        opcodes = bytes(view[offset : offset + count])
+        offset += count + (-count % 4)
+        operands = array("i")
+        operands.frombytes(view[offset : offset + 4 * count])
+        offset += 4 * count
+        line_numbers = array("I")
+        line_numbers.frombytes(view[offset : offset + 4 * count])
+        offset += 4 * count
+        if len(opcodes) != count or len(line_numbers) != count:
+            raise ValueError("truncated instruction arrays")
+        if sys.byteorder == "big":
+            operands.byteswap()
+            line_numbers.byteswap()
+
+        def sized() -> bytes:
+            nonlocal offset
+            (size,) = _U32.unpack_from(view, offset)
+            offset += _U32.size + size
+            if offset > len(view):
+                raise ValueError("truncated table")
+            return bytes(view[offset - size : offset])
+
+        constants = [int.from_bytes(sized(), "little", signed=True) for _ in range(constant_count)]
+        names = [sized().decode("utf-8") for _ in range(name_count)]
+        labels: Dict[str, int] = {}
+        label_lines: Dict[str, int] = {}
+        for _ in range(label_count):
+            index, line, _size = _LABEL.unpack_from(view, offset)
+            offset += _LABEL.size - _U32.size
+            name = sized().decode("utf-8")
+            labels[name] = index
+            label_lines[name] = line
+        texts = [sized().decode("utf-8") for _ in range(text_count)]
+    except (ValueError, struct.error, UnicodeDecodeError) as e:
+        raise BytecodeLoadError([f"Load error: invalid binary program: {e}"]) from None
+    finally:
+        view.release()
+    return BinaryProgram(
+        opcodes, operands, line_numbers, constants, names, texts, labels, label_lines, line_count
+    )
+
+
+def read_file(path: str) -> BinaryProgram:
+    """
+    Reads a binary program file by mapping it into memory.
+
+    Args:
+        path (str): The file to read.
+    Returns:
+        BinaryProgram: The program's arrays and tables.
+    Raises:
+        BytecodeLoadError: If the file is not a valid binary program.
+        OSError: If the file cannot be read.
+    """
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            raise BytecodeLoadError(["Load error: invalid binary program: empty file"])
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return read_program(mapped)
+
+
+def disassemble(program: BinaryProgram) -> str:
+    """
+    Turns a binary program back into bytecode source. Instructions and labels keep their
+    line numbers, so error messages are unchanged and the source assembles to the same
+    image; comments are not kept. Jumps and calls name a label at their target if there
+    is one, and the 0-based line index of the target otherwise.
+
+    Args:
+        program (BinaryProgram): The program, as returned by read_program or read_file.
+    Returns:
+        str: The bytecode source.
+    """
+    lines = [""] * program.line_count
+    label_at: Dict[int, str] = {}
+    for name, index in program.labels.items():
+        lines[program.label_lines[name] - 1] = f"{name}:"
+        label_at.setdefault(index, name)
+    count = len(program.opcodes)
+    for op, arg, line in zip(program.opcodes, program.operands, program.line_numbers):
+        name = OPCODE_NAMES[op]
+        if op == OP_PUSH:
+            text = f"PUSH {program.constants[arg]}"
+        elif op == OP_LOAD or op == OP_STORE:
+            text = f"{name} {program.names[arg]}"
+        elif op in BRANCH_OPS:
+            if arg in label_at:
+                target = label_at[arg]
+            else:
+                target = str(program.line_numbers[arg] - 1 if arg < count else program.line_count)
+            text = f"{name} {target}"
+        elif op == OP_INVALID:
+            text = program.texts[arg]
+        elif op == OP_NATIVE:
+            text = f"NATIVE {program.texts[arg]}"
+        elif op == OP_NOP:
+            text = "LOAD"
+        else:
+            text = name
+        lines[line - 1] = text
+    # load_program strips blank lines at either end, which would shift every line number
+    # (or drop lines a jump past the end counts on).
+    if lines and not lines[0]:
+        lines[0] = "# disassembled"
+    if lines and not lines[-1]:
+        lines[-1] = "# end"
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """
+    Command line interface:
+        python bytecode_binary.py assemble <input.bc> <output.bcx>
+        python bytecode_binary.py disassemble <input.bcx>
+    """
+    if len(sys.argv) < 3 or sys.argv[1] not in ("assemble", "disassemble"):
+        print(
+            "Usage: python bytecode_binary.py assemble <input_file> <output_file>\n"
+            "       python bytecode_binary.py disassemble <input_file>",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    command, input_file = sys.argv[1], sys.argv[2]
+    try:
+        if command == "assemble":
+            if len(sys.argv) < 4:
+                print("Usage: python bytecode_binary.py assemble <input_file> <output_file>", file=sys.stderr)
+                sys.exit(1)
+            with open(input_file, "r", encoding="utf-8") as f:
+                image = assemble(f.read())
+            with open(sys.argv[3], "wb") as f:
+                f.write(image)
+        else:
+            print(disassemble(read_file(input_file)), end="")
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found", file=sys.stderr)
+        sys.exit(1)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
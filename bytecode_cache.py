@@ -0,0 +1,171 @@
+"""
+Persistent on-disk cache of assembled programs for the command line interpreter.
+
+Like __pycache__, the cache saves later runs of the same program from parsing it again:
+the first run writes the program in the binary format (see bytecode_binary) to
+<directory>/<key>.bcx, and later runs map that file and load it with load_binary. The
+key is the SHA-256 of the source and the interpreter version, a hash of the modules that
+decode and assemble programs, so editing either invalidates every entry.
+
+Processes may share a cache directory:
+- Entries are written to a temporary file in the directory and renamed into place, so a
+  reader sees either no entry or a complete one. Entries that still fail to load are
+  treated as missing and rewritten.
+- A hit updates the entry's modification time, and after each write the least recently
+  used entries are deleted until the directory holds at most max_bytes. An entry deleted
+  while another process loads it is a miss for that process.
+"""
+
+import functools
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import bytecode_binary
+from bytecode_interpreter import BytecodeInterpreter
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SUFFIX = ".bcx"
+
+# Modules whose code determines what a cached image contains and how it is loaded.
+_VERSIONED_MODULES = ("bytecode_interpreter.py", "bytecode_binary.py")
+
+
+def default_directory() -> str:
+    """Returns $BYTECODE_CACHE_DIR, or bytecode_interpreter under $XDG_CACHE_HOME (default ~/.cache)."""
+    directory = os.environ.get("BYTECODE_CACHE_DIR")
+    if directory:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "bytecode_interpreter")
+
+
+@functools.lru_cache(maxsize=None)
+def interpreter_version() -> str:
+    """Returns a hash of the binary format version and of the decoding and assembling modules."""
+    digest = hashlib.sha256(str(bytecode_binary.FORMAT_VERSION).encode("ascii"))
+    here = os.path.dirname(os.path.abspath(bytecode_binary.__file__))
+    for name in _VERSIONED_MODULES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class BytecodeCache:
+    """
+    A directory of assembled programs keyed by source hash and interpreter version.
+
+    Attributes:
+    - directory: The cache directory; it is created on the first write.
+    - max_bytes: The total size of the entries above which the least recently used are deleted.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+
+    def path(self, source: str) -> str:
+        """Returns the file that holds the entry for source."""
+        digest = hashlib.sha256(interpreter_version().encode("ascii"))
+        digest.update(source.encode("utf-8"))
+        return os.path.join(self.directory, digest.hexdigest() + SUFFIX)
+
+    def load(self, interpreter: BytecodeInterpreter, source: str) -> bool:
+        """
+        Loads source into interpreter, from the cache if it holds the program, and writes
+        the entry otherwise. Cache files that cannot be read or written are skipped.
+
+        Args:
+            interpreter (BytecodeInterpreter): The interpreter to load the program into.
+            source (str): The bytecode program.
+        Returns:
+            bool: True if the program came from the cache.
+        Raises:
+            BytecodeLoadError: If the program cannot be loaded, as raised by load_program.
+        """
+        path = self.path(source)
+        try:
+            interpreter.load_binary(bytecode_binary.read_file(path))
+        except Exception:
+            # Missing, or damaged in a way the hash did not catch: load the source instead.
+            pass
+        else:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return True
+        interpreter.load_program(source)
+        try:
+            self._write(path, bytecode_binary.assemble(source, interpreter))
+            self.evict()
+        except OSError:
+            pass
+        return False
+
+    def _write(self, path: str, image: bytes) -> None:
+        """Writes image to path atomically."""
+        # Only writes need tempfile, so a cache hit does not pay for importing it.
+        import tempfile
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+            raise
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """Returns (modification time, size, path) of each entry, least recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used entries until the total size is at most max_bytes.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return deleted
+
+    def clear(self) -> None:
+        """Deletes every entry."""
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,771 @@
+"""
+Whole-program transpiler from decoded bytecode to a native Python function.
+
+The decoded instruction stream of a BytecodeInterpreter is split into basic blocks and
+translated into the source of a single Python function: a `while True` loop that
+dispatches on a block index, with one branch per block. Inside a block the operand
+stack is simulated at translation time, so values pushed and consumed within the block
+live in Python locals and expressions instead of going through the stack list; only
+values still on the stack when control leaves the block are pushed onto the real list.
+Program variables become Python locals too, read from the interpreter's variable slots
+on entry and written back to them when the function returns.
+
+The function is compiled once with compile() and reproduces the interpreter exactly:
+same output, same error messages and line numbers, and the same final stack,
+variables, call stack, halted flag and program counter.
+
+A region of the program (such as a hot loop and the subroutines it calls) can be
+compiled the same way; control that leaves the region returns the program counter to
+continue from, so the caller can keep interpreting from there.
+"""
+
+import operator
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from bytecode_intrinsics import Intrinsic
+from bytecode_interpreter import (
+    ARRAY_OPS,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    ExecutionLimitExceeded,
+    Instruction,
+    OP_NEWARRAY,
+    OP_PUSH,
+    OP_POP,
+    OP_DUP,
+    OP_ADD,
+    OP_SUB,
+    OP_MUL,
+    OP_DIV,
+    OP_MOD,
+    OP_NEG,
+    OP_STORE,
+    OP_LOAD,
+    OP_JMP,
+    OP_JZ,
+    OP_JNZ,
+    OP_HALT,
+    OP_EQ,
+    OP_NEQ,
+    OP_LT,
+    OP_GT,
+    OP_LE,
+    OP_GE,
+    OP_CALL,
+    OP_RET,
+    OP_PRINT,
+    OP_READ,
+    OP_NATIVE,
+    OP_NOP,
+    OP_INVALID,
+    UNDEFINED,
+)
+
+# Python operators for the arithmetic and comparison opcodes.
+ARITHMETIC_OPERATORS = {OP_ADD: "+", OP_SUB: "-", OP_MUL: "*", OP_DIV: "//", OP_MOD: "%"}
+COMPARISON_OPERATORS = {OP_EQ: "==", OP_NEQ: "!=", OP_LT: "<", OP_GT: ">", OP_LE: "<=", OP_GE: ">="}
+
+# Operations folded at translation time when both operands are constants. DIV and MOD
+# are left to run time so that division by zero is reported where it happens.
+FOLDABLE = {
+    OP_ADD: operator.add,
+    OP_SUB: operator.sub,
+    OP_MUL: operator.mul,
+    OP_EQ: operator.eq,
+    OP_NEQ: operator.ne,
+    OP_LT: operator.lt,
+    OP_GT: operator.gt,
+    OP_LE: operator.le,
+    OP_GE: operator.ge,
+}
+
+# Opcodes that end a basic block.
+BLOCK_TERMINATORS = frozenset({OP_JMP, OP_JZ, OP_JNZ, OP_CALL, OP_RET, OP_HALT, OP_INVALID})
+
+# Expressions nested deeper than this are stored in a temporary, so long straight-line
+# sequences do not produce expressions too deep for the Python compiler.
+MAX_EXPRESSION_DEPTH = 16
+
+# Kinds of symbolic stack values.
+CONST, ATOM, EXPR, BOOL = range(4)
+
+
+class ProgramFault(Exception):
+    """Raised by compiled code for a runtime error; `pc` is the failing instruction."""
+
+    def __init__(self, pc: int, message: str):
+        super().__init__(message)
+        self.pc = pc
+
+
+class _Value:
+    """
+    A value on the symbolic stack: the Python source text that computes it, its kind
+    (CONST, ATOM, EXPR or BOOL), the variable locals it reads and its nesting depth.
+    BOOL values are Python booleans that still have to be turned into 1/0.
+    """
+
+    __slots__ = ("text", "kind", "names", "depth", "const")
+
+    def __init__(self, text: str, kind: int, names: frozenset = frozenset(), depth: int = 0, const: Any = None):
+        self.text = text
+        self.kind = kind
+        self.names = names
+        self.depth = depth
+        self.const = const
+
+    def as_int(self) -> str:
+        """Returns source text that evaluates to the integer value."""
+        if self.kind == BOOL:
+            return f"(1 if {self.text} else 0)"
+        return self.text
+
+
+def _constant(value: int) -> _Value:
+    return _Value(repr(value), CONST, const=value)
+
+
+class CompiledProgram:
+    """
+    A program (or region of one) translated to Python. `source` is the generated code and
+    `function` the compiled entry point, called as function(interpreter) and returning the
+    final (program_counter, halted) pair; for a region the program counter is where
+    execution left it. The interpreter's stack, variable slots, call stack and
+    instructions_executed are updated in place. Runtime errors raise ProgramFault; the
+    execution limits are checked at the same checkpoints as the interpreter's own loops
+    and raise its ExecutionLimitExceeded errors; so do the quotas, at the instruction that
+    exceeds them.
+    """
+
+    def __init__(self, source: str, function: Callable[..., Tuple[int, bool]]):
+        self.source = source
+        self.function = function
+
+
+class _Translator:
+    """
+    Translates the instructions of a decoded instruction stream whose indices are in
+    `region` into the source of one Python function, which starts executing at `start`.
+    `slot_names` names the variable slots used by LOAD and STORE, for error messages.
+    Without `stack_checks`, operations on the real stack assume it holds enough values.
+    With `max_int_bits`, the values computed by the arithmetic instructions, READ and NATIVE
+    are checked against it, and with `max_stack_size` the number of values on the real and
+    symbolic stacks after the instructions that push values.
+    """
+
+    def __init__(
+        self,
+        code: List[Instruction],
+        slot_names: List[str],
+        start: int,
+        region: Set[int],
+        stack_checks: bool = True,
+        max_int_bits: Optional[int] = None,
+        max_stack_size: Optional[int] = None,
+    ):
+        self.code = code
+        self.slot_names = slot_names
+        self.start = start
+        self.region = region
+        self.stack_checks = stack_checks
+        self.max_int_bits = max_int_bits
+        self.max_stack_size = max_stack_size
+        self.used_slots: Set[int] = set()
+        self.stored_slots: Set[int] = set()
+        self.temp_count = 0
+        self.intrinsics: List[Intrinsic] = []
+        self.leaders = self._find_leaders()
+        self.block_of: Dict[int, int] = {pc: index for index, pc in enumerate(self.leaders)}
+
+    def _find_leaders(self) -> List[int]:
+        """Returns the sorted start indices of the basic blocks in the region."""
+        region = self.region
+        leaders = {self.start} if self.start in region else set()
+        for pc in sorted(region):
+            op, arg = self.code[pc]
+            if pc - 1 not in region:
+                leaders.add(pc)
+            if op in BLOCK_TERMINATORS:
+                if pc + 1 in region:
+                    leaders.add(pc + 1)
+                if op in (OP_JMP, OP_JZ, OP_JNZ, OP_CALL) and arg in region:
+                    leaders.add(arg)
+        return sorted(leaders)
+
+    def translate(self) -> str:
+        """Returns the source of the run_program function."""
+        blocks = [self._translate_block(index) for index in range(len(self.leaders))]
+        if not blocks:
+            blocks.append([f"return ({self.start}, False)"])
+
+        lines = [
+            "def run_program(vm):",
+            "    stack = vm.stack",
+            "    slots = vm.slots",
+            "    call_stack = vm.call_stack",
+            "    push = stack.append",
+            "    pop = stack.pop",
+            "    write = vm.output.write",
+            "    read_input = vm.read_input",
+            "    executed = vm.instructions_executed",
+            "    next_check = vm._next_check",
+            "    checkpoint = vm._checkpoint",
+            "    max_call_depth = vm._max_call_depth",
+        ]
+        for slot in sorted(self.used_slots):
+            lines.append(f"    v{slot} = slots[{slot}]")
+        lines.append(f"    blk = {self.block_of.get(self.start, 0)}")
+        lines.append("    try:")
+        lines.append("        while True:")
+        self._emit_dispatch(lines, blocks, 0, len(blocks), "            ")
+        lines.append("    finally:")
+        lines.append("        vm.instructions_executed = executed")
+        lines.append("        vm._next_check = next_check")
+        for slot in sorted(self.stored_slots):
+            lines.append(f"        slots[{slot}] = v{slot}")
+        return "\n".join(lines) + "\n"
+
+    def _emit_dispatch(self, lines: List[str], blocks: List[List[str]], lo: int, hi: int, indent: str) -> None:
+        """Emits a binary search on blk over blocks[lo:hi], with a short if/elif chain at the leaves."""
+        if hi - lo > 4:
+            mid = (lo + hi) // 2
+            lines.append(f"{indent}if blk < {mid}:")
+            self._emit_dispatch(lines, blocks, lo, mid, indent + "    ")
+            lines.append(f"{indent}else:")
+            self._emit_dispatch(lines, blocks, mid, hi, indent + "    ")
+            return
+        for index in range(lo, hi):
+            if index == lo:
+                lines.append(f"{indent}if blk == {index}:")
+            elif index == hi - 1:
+                lines.append(f"{indent}else:")
+            else:
+                lines.append(f"{indent}elif blk == {index}:")
+            lines.extend(indent + "    " + line for line in blocks[index])
+
+    # -- block translation ---------------------------------------------------------
+
+    def _new_temp(self) -> str:
+        self.temp_count += 1
+        return f"t{self.temp_count}"
+
+    def _slot(self, slot: int) -> str:
+        self.used_slots.add(slot)
+        return f"v{slot}"
+
+    def _translate_block(self, index: int) -> List[str]:
+        start = self.leaders[index]
+        end = start + 1
+        while end in self.region and end not in self.block_of:
+            end += 1
+        self.block_end = end
+        self.out: List[str] = [f"executed += {end - start}"]
+        self.sym: List[_Value] = []
+        self.defined: Set[str] = set()
+
+        for pc in range(start, end):
+            op, arg = self.code[pc]
+            if self._translate_instruction(pc, op, arg):
+                return self.out
+        self._flush_all()
+        self._goto(end, end - 1)
+        return self.out
+
+    def _emit(self, line: str) -> None:
+        self.out.append(line)
+
+    def _materialize(self, value: _Value) -> _Value:
+        """Stores a computed value in a temporary so it can be read more than once."""
+        if value.kind in (CONST, ATOM):
+            return value
+        temp = self._new_temp()
+        self._emit(f"{temp} = {value.as_int()}")
+        return _Value(temp, ATOM)
+
+    def _push_code(self, values: List[_Value], indent: str = "") -> List[str]:
+        """Returns the lines that push symbolic values onto the real stack."""
+        if not values:
+            return []
+        if len(values) == 1:
+            return [f"{indent}push({values[0].as_int()})"]
+        return [f"{indent}stack.extend(({', '.join(v.as_int() for v in values)}))"]
+
+    def _flush_all(self) -> None:
+        self.out.extend(self._push_code(self.sym))
+        self.sym = []
+
+    def _fail(self, pc: int, message: str, remaining: List[_Value], indent: str = "    ") -> None:
+        """Emits the (indented) body of a failing branch: restore the stack, then raise."""
+        self.out.extend(self._push_code(remaining, indent))
+        self._raise_fault(pc, message, indent)
+
+    def _raise_fault(self, pc: int, message: str, indent: str) -> None:
+        """
+        Emits the raise of a runtime error at pc. The block's instructions were counted
+        when it was entered, so the ones after pc are taken back first.
+        """
+        if self.block_end - pc - 1:
+            self._emit(f"{indent}executed -= {self.block_end - pc - 1}")
+        self._emit(f"{indent}raise ProgramFault({pc}, {message!r})")
+
+    def _emit_limit_handler(self, pc: int, restored: Iterable[_Value] = ()) -> None:
+        """
+        Emits the except clause for a quota error raised by the line in the try block before it,
+        which runs the instruction at pc: the stack is restored (with the `restored` operands it
+        keeps) and the instructions after pc are taken back before the error goes on.
+        """
+        self._emit("except ExecutionLimitExceeded:")
+        self.out.extend(self._push_code(self.sym + list(restored), "    "))
+        if self.block_end - pc - 1:
+            self._emit(f"    executed -= {self.block_end - pc - 1}")
+        self._emit(f"    vm.program_counter = {pc}")
+        self._emit("    raise")
+
+    def _emit_int_bits_check(self, pc: int, text: str, indent: str = "", guard: str = "") -> None:
+        """
+        With max_int_bits, emits the check of the value text, which the instruction at pc has just
+        computed and put on the stack (symbolic or real), if the condition guard holds.
+        """
+        if self.max_int_bits is None:
+            return
+        self._emit(f"{indent}if {guard}{text}.bit_length() > {self.max_int_bits}:")
+        self.out.extend(self._push_code(self.sym, indent + "    "))
+        if self.block_end - pc - 1:
+            self._emit(f"{indent}    executed -= {self.block_end - pc - 1}")
+        self._emit(f"{indent}    vm._int_bits_exceeded({pc})")
+
+    def _emit_stack_check(self, pc: int) -> None:
+        """
+        With max_stack_size, emits the check of the stack length after the instruction at pc,
+        which can have pushed values, counting the ones still on the symbolic stack.
+        """
+        if self.max_stack_size is None:
+            return
+        self._emit(f"if len(stack) > {self.max_stack_size - len(self.sym)}:")
+        self.out.extend(self._push_code(self.sym, "    "))
+        if self.block_end - pc - 1:
+            self._emit(f"    executed -= {self.block_end - pc - 1}")
+        self._emit(f"    vm._stack_limit_exceeded({pc})")
+
+    def _fits(self, value: int) -> bool:
+        """Whether a constant computed at translation time passes the max_int_bits check."""
+        return self.max_int_bits is None or value.bit_length() <= self.max_int_bits
+
+    def _intrinsic(self, intrinsic: Intrinsic) -> str:
+        """Returns the global name the generated code calls intrinsic by."""
+        for index, known in enumerate(self.intrinsics):
+            if known is intrinsic:
+                return f"native{index}"
+        self.intrinsics.append(intrinsic)
+        return f"native{len(self.intrinsics) - 1}"
+
+    def _goto(self, target: int, pc: int) -> None:
+        """
+        Emits a transfer to the block starting at target. Backward jumps are checkpoints
+        where the execution limits are checked. Targets outside the region return the
+        program counter to continue from.
+        """
+        if target <= pc:
+            self._emit("if executed >= next_check:")
+            self._emit(f"    next_check = checkpoint(executed, {target})")
+        if target not in self.block_of:
+            self._emit(f"return ({target}, False)")
+        else:
+            self._emit(f"blk = {self.block_of[target]}")
+
+    def _translate_instruction(self, pc: int, op: int, arg: Any) -> bool:
+        """Translates one instruction; returns True if it ends the block."""
+        sym = self.sym
+        if op == OP_PUSH:
+            sym.append(_constant(arg))
+            self._emit_stack_check(pc)
+        elif op == OP_POP:
+            if sym:
+                sym.pop()
+            else:
+                if self.stack_checks:
+                    self._emit("if not stack:")
+                    self._fail(pc, "Stack Underflow.", [])
+                self._emit("pop()")
+        elif op == OP_DUP:
+            if sym:
+                top = self._materialize(sym[-1])
+                sym[-1] = top
+                sym.append(top)
+            elif self.stack_checks:
+                self._emit("if stack:")
+                self._emit("    push(stack[-1])")
+            else:
+                self._emit("push(stack[-1])")
+            self._emit_stack_check(pc)
+        elif op in ARITHMETIC_OPERATORS or op in COMPARISON_OPERATORS:
+            self._translate_binary(pc, op)
+        elif op == OP_NEG:
+            if sym:
+                value = sym.pop()
+                if value.kind == CONST and self._fits(-value.const):
+                    sym.append(_constant(-value.const))
+                elif self.max_int_bits is None:
+                    sym.append(_Value(f"(-{value.as_int()})", EXPR, value.names, value.depth + 1))
+                else:
+                    temp = self._new_temp()
+                    self._emit(f"{temp} = -{value.as_int()}")
+                    sym.append(_Value(temp, ATOM))
+                    self._emit_int_bits_check(pc, temp)
+            elif self.stack_checks:
+                self._emit("if stack:")
+                self._emit("    stack[-1] = -stack[-1]")
+                self._emit_int_bits_check(pc, "stack[-1]", "    ")
+            else:
+                self._emit("stack[-1] = -stack[-1]")
+                self._emit_int_bits_check(pc, "stack[-1]")
+        elif op == OP_STORE:
+            local = self._slot(arg)
+            self.stored_slots.add(arg)
+            if sym:
+                value = sym.pop()
+                for i, entry in enumerate(sym):
+                    if local in entry.names:
+                        sym[i] = self._materialize(entry) if entry.kind != ATOM else self._copy(entry)
+                self._emit(f"{local} = {value.as_int()}")
+            elif self.stack_checks:
+                self._emit("if stack:")
+                self._emit(f"    {local} = pop()")
+                self.defined.discard(local)
+                return False
+            else:
+                self._emit(f"{local} = pop()")
+            self.defined.add(local)
+        elif op == OP_LOAD:
+            local = self._slot(arg)
+            if local not in self.defined:
+                self._emit(f"if {local} is UNDEFINED:")
+                self._fail(pc, f"Undefined variable: {self.slot_names[arg]}", sym)
+                self.defined.add(local)
+            sym.append(_Value(local, ATOM, frozenset((local,))))
+            self._emit_stack_check(pc)
+        elif op == OP_JMP:
+            self._flush_all()
+            self._goto(arg, pc)
+            return True
+        elif op == OP_JZ or op == OP_JNZ:
+            self._translate_conditional(pc, op, arg)
+            return True
+        elif op == OP_HALT:
+            self._flush_all()
+            self._emit(f"return ({pc + 1}, True)")
+            return True
+        elif op == OP_CALL:
+            self._flush_all()
+            self._emit("if len(call_stack) >= max_call_depth:")
+            self._emit(f"    vm._call_depth_exceeded({pc})")
+            self._emit(f"call_stack.append({pc + 1})")
+            self._goto(arg, pc)
+            return True
+        elif op == OP_RET:
+            self._flush_all()
+            self._emit("if call_stack:")
+            self._emit("    ret = call_stack.pop()")
+            self._emit(f"    if ret <= {pc} and executed >= next_check:")
+            self._emit("        next_check = checkpoint(executed, ret)")
+            self._emit("    blk = BLOCK_OF.get(ret, -1)")
+            self._emit("    if blk < 0:")
+            self._emit("        return (ret, False)")
+            self._emit("else:")
+            self._emit(f"    return ({pc}, True)")
+            return True
+        elif op == OP_PRINT:
+            self._translate_print(pc)
+        elif op == OP_READ:
+            temp = self._new_temp()
+            self._emit(f"{temp} = read_input()")
+            sym.append(_Value(temp, ATOM))
+            self._emit_int_bits_check(pc, temp)
+            self._emit_stack_check(pc)
+        elif op == OP_NATIVE:
+            self._translate_native(pc, arg)
+        elif op in ARRAY_OPS:
+            self._translate_array(pc, op)
+        elif op == OP_INVALID:
+            self._fail(pc, arg, sym, indent="")
+            self.sym = []
+            return True
+        elif op != OP_NOP:
+            raise ValueError(f"Cannot compile opcode {op}")
+        return False
+
+    def _copy(self, value: _Value) -> _Value:
+        """Copies a variable read into a temporary before the variable is overwritten."""
+        temp = self._new_temp()
+        self._emit(f"{temp} = {value.text}")
+        return _Value(temp, ATOM)
+
+    def _translate_binary(self, pc: int, op: int) -> None:
+        sym = self.sym
+        if len(sym) < 2:
+            # Not enough known values: fall back to operating on the real stack.
+            self._flush_all()
+            indent = ""
+            if self.stack_checks:
+                self._emit("if len(stack) >= 2:")
+                indent = "    "
+            self._emit(f"{indent}b = pop()")
+            if op in COMPARISON_OPERATORS:
+                self._emit(f"{indent}stack[-1] = 1 if stack[-1] {COMPARISON_OPERATORS[op]} b else 0")
+            else:
+                if op in (OP_DIV, OP_MOD):
+                    message = "Division by zero" if op == OP_DIV else "Modulo by zero"
+                    self._emit(f"{indent}if b == 0:")
+                    self._emit(f"{indent}    pop()")
+                    self._raise_fault(pc, message, indent + "    ")
+                self._emit(f"{indent}stack[-1] = stack[-1] {ARITHMETIC_OPERATORS[op]} b")
+                # Like the interpreter, check the top value even if too few were there to compute it.
+                self._emit_int_bits_check(pc, "stack[-1]", guard="stack and " if self.stack_checks else "")
+            return
+
+        b = sym.pop()
+        a = sym.pop()
+        names = a.names | b.names
+        depth = max(a.depth, b.depth) + 1
+        if a.kind == CONST and b.kind == CONST and op in FOLDABLE:
+            value = int(FOLDABLE[op](a.const, b.const))
+            if self._fits(value):
+                sym.append(_constant(value))
+                return
+        if op in COMPARISON_OPERATORS:
+            symbol = COMPARISON_OPERATORS[op]
+            sym.append(_Value(f"{a.as_int()} {symbol} {b.as_int()}", BOOL, names, depth))
+        elif op in (OP_DIV, OP_MOD):
+            message = "Division by zero" if op == OP_DIV else "Modulo by zero"
+            b = self._materialize(b)
+            self._emit(f"if {b.text} == 0:")
+            self._fail(pc, message, sym)
+            temp = self._new_temp()
+            self._emit(f"{temp} = {a.as_int()} {ARITHMETIC_OPERATORS[op]} {b.text}")
+            sym.append(_Value(temp, ATOM))
+            self._emit_int_bits_check(pc, temp)
+            return
+        else:
+            sym.append(_Value(f"({a.as_int()} {ARITHMETIC_OPERATORS[op]} {b.as_int()})", EXPR, names, depth))
+            if self.max_int_bits is not None:
+                sym[-1] = self._materialize(sym[-1])
+                self._emit_int_bits_check(pc, sym[-1].text)
+        if depth > MAX_EXPRESSION_DEPTH:
+            sym[-1] = self._materialize(sym[-1])
+
+    def _emit_guarded(self, pc: int, line: str, restored: Optional[List[_Value]] = None) -> None:
+        """
+        Emits line, which runs the instruction at pc, so that a RuntimeError it raises becomes the
+        runtime error of that instruction; its operands have been taken off the symbolic stack.
+        If it can exceed a quota, `restored` are the operands the stack keeps when it does.
+        """
+        self._emit("try:")
+        self._emit(f"    {line}")
+        if restored is not None:
+            self._emit_limit_handler(pc, restored)
+        self._emit("except RuntimeError as e:")
+        self.out.extend(self._push_code(self.sym, "    "))
+        if self.block_end - pc - 1:
+            self._emit(f"    executed -= {self.block_end - pc - 1}")
+        self._emit(f"    raise ProgramFault({pc}, str(e))")
+
+    def _pop_arguments(self, count: int) -> Optional[List[_Value]]:
+        """
+        Takes count values off the symbolic stack and returns them, or returns None after
+        flushing it if it holds fewer (some are on the real stack).
+        """
+        sym = self.sym
+        if len(sym) < count:
+            self._flush_all()
+            return None
+        args = sym[len(sym) - count :]
+        del sym[len(sym) - count :]
+        return args
+
+    def _translate_native(self, pc: int, intrinsic: Intrinsic) -> None:
+        name = self._intrinsic(intrinsic)
+        values = self._pop_arguments(intrinsic.arguments)
+        if values is None:
+            self._emit_guarded(pc, f"vm.op_native({name})")
+            if self.max_int_bits is not None and intrinsic.results:
+                self._emit_guarded(pc, f"vm._check_int_bits({intrinsic.results})", [])
+            self._emit_stack_check(pc)
+            return
+        args = ", ".join(value.as_int() for value in values)
+        temps = [self._new_temp() for _ in range(intrinsic.results)]
+        call = f"{name}.apply(({args}{',' if args else ''}))"
+        self._emit_guarded(pc, f"{', '.join(temps)}, = {call}" if temps else call)
+        self.sym.extend(_Value(temp, ATOM) for temp in temps)
+        for temp in temps:
+            self._emit_int_bits_check(pc, temp)
+        self._emit_stack_check(pc)
+
+    def _translate_array(self, pc: int, op: int) -> None:
+        method, count, results = ARRAY_OPS[op]
+        values = self._pop_arguments(count)
+        # NEWARRAY can exceed max_heap_size, which leaves its size on the stack.
+        restored = (values or []) if op == OP_NEWARRAY else None
+        if values is None:
+            self._emit_guarded(pc, f"vm._handlers[{op}](None)", restored)
+            return
+        args = ", ".join(value.as_int() for value in values)
+        if results:
+            temp = self._new_temp()
+            self._emit_guarded(pc, f"{temp} = vm.{method}({args})", restored)
+            self.sym.append(_Value(temp, ATOM))
+        else:
+            self._emit_guarded(pc, f"vm.{method}({args})", restored)
+
+    def _translate_conditional(self, pc: int, op: int, target: int) -> None:
+        sym = self.sym
+        if sym:
+            condition = sym.pop()
+            self._flush_all()
+            if condition.kind == BOOL:
+                test = f"not ({condition.text})" if op == OP_JZ else condition.text
+            else:
+                test = f"{condition.text} {'==' if op == OP_JZ else '!='} 0"
+        elif self.stack_checks:
+            test = f"stack and pop() {'==' if op == OP_JZ else '!='} 0"
+        else:
+            test = f"pop() {'==' if op == OP_JZ else '!='} 0"
+        self._emit(f"if {test}:")
+        start = len(self.out)
+        self._goto(target, pc)
+        self.out[start:] = ["    " + line for line in self.out[start:]]
+        self._emit("else:")
+        start = len(self.out)
+        self._goto(pc + 1, pc)
+        self.out[start:] = ["    " + line for line in self.out[start:]]
+
+    def _translate_print(self, pc: int) -> None:
+        sym = self.sym
+        if sym:
+            top = self._materialize(sym[-1])
+            sym[-1] = top
+            self._emit(f"if {top.text} > 2147483647:")
+            self._fail(pc, "OVERFLOW!", sym)
+            self._emit_write(pc, top.text)
+        elif not self.stack_checks:
+            self._emit("top = stack[-1]")
+            self._emit("if top > 2147483647:")
+            self._raise_fault(pc, "OVERFLOW!", "    ")
+            self._emit_write(pc, "top")
+        else:
+            self._emit("top = stack[-1] if stack else 0")
+            self._emit("if top > 2147483647:")
+            self._raise_fault(pc, "OVERFLOW!", "    ")
+            self._emit_write(pc, "top")
+
+    def _emit_write(self, pc: int, text: str) -> None:
+        """Emits the write of the value text by the PRINT at pc, which max_output_bytes can stop."""
+        self._emit("try:")
+        self._emit(f"    write({text})")
+        self._emit_limit_handler(pc)
+
+
+def compile_program(
+    code: List[Instruction],
+    slot_names: List[str],
+    start: int = 0,
+    region: Optional[Iterable[int]] = None,
+    stack_checks: bool = True,
+    max_int_bits: Optional[int] = None,
+    max_stack_size: Optional[int] = None,
+) -> CompiledProgram:
+    """
+    Translates a decoded instruction stream (BytecodeInterpreter.code), or a region of
+    it, into a Python function and compiles it once.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+        slot_names (List[str]): The variable name of each slot (BytecodeInterpreter.slot_names).
+        start (int): The instruction where execution starts.
+        region (Optional[Iterable[int]]): The indices of the instructions to compile;
+            defaults to the whole program.
+        stack_checks (bool): Whether the generated code checks that the stack holds the values
+            an instruction consumes; pass False only for a program that passed stack verification.
+        max_int_bits (Optional[int]): The bit length the values computed by the arithmetic
+            instructions, READ and NATIVE are checked against, or None for no check.
+        max_stack_size (Optional[int]): The stack length checked after the instructions that
+            push values, or None for no check.
+    Returns:
+        CompiledProgram: The generated source and the compiled function.
+    """
+    translator = _Translator(
+        code,
+        slot_names,
+        start,
+        set(range(len(code)) if region is None else region),
+        stack_checks,
+        max_int_bits,
+        max_stack_size,
+    )
+    source = translator.translate()
+    namespace: Dict[str, Any] = {
+        "UNDEFINED": UNDEFINED,
+        "ProgramFault": ProgramFault,
+        "ExecutionLimitExceeded": ExecutionLimitExceeded,
+        "BLOCK_OF": translator.block_of,
+    }
+    for index, intrinsic in enumerate(translator.intrinsics):
+        namespace[f"native{index}"] = intrinsic
+    exec(compile(source, "<bytecode>", "exec"), namespace)
+    return CompiledProgram(source, namespace["run_program"])
+
+
+def loop_region(code: List[Instruction], header: int, back_edge: int) -> Set[int]:
+    """
+    Returns the instructions of the loop from header to back_edge (inclusive), plus every
+    instruction reachable from the subroutines it calls, so calls made by the loop body
+    do not leave compiled code.
+
+    Args:
+        code (List[Instruction]): The decoded instructions.
+        header (int): The loop header, the target of the backward jump.
+        back_edge (int): The instruction that jumps back to the header.
+    Returns:
+        Set[int]: The instruction indices to compile.
+    """
+    region = set(range(header, back_edge + 1))
+    pending = [arg for pc in sorted(region) for op, arg in [code[pc]] if op == OP_CALL]
+    while pending:
+        pc = pending.pop()
+        if pc >= len(code) or pc in region:
+            continue
+        region.add(pc)
+        op, arg = code[pc]
+        if op in (OP_JMP, OP_JZ, OP_JNZ, OP_CALL):
+            pending.append(arg)
+        if op not in (OP_JMP, OP_RET, OP_HALT, OP_INVALID):
+            pending.append(pc + 1)
+    return region
+
+
+def main():
+    """Prints the Python source generated for a bytecode file."""
+    if len(sys.argv) < 2:
+        print("Usage: python bytecode_compiler.py <input_file>", file=sys.stderr)
+        sys.exit(1)
+    input_file = sys.argv[1]
+    try:
+        with open(input_file, "r", encoding="utf-8") as f:
+            bytecode = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    interpreter = BytecodeInterpreter()
+    try:
+        interpreter.load_program(bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(compile_program(interpreter.code, interpreter.slot_names).source, end="")
+
+
+if __name__ == "__main__":
+    main()
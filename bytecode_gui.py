@@ -271,7 +271,8 @@ class BytecodeGUI:
             program_type (str): A label indicating the type of program (e.g., "Main", "Test") for display purposes.
         Behavior:
             - Retrieves user input from the input_entry widget.
-            - Runs 'bytecode_interpreter.py' with the given filename, passing user input if provided.
+            - Runs 'bytecode_interpreter.py' with the given filename, passing user input if provided
+              as an input file of whitespace-separated numbers.
             - Captures and displays standard output and error in the text_output widget.
             - Updates the status label with execution results or errors.
             - Handles timeouts and unexpected exceptions gracefully.
@@ -279,21 +280,20 @@ class BytecodeGUI:
         user_input = self.input_entry.get()
 
         try:
+            command = ["python", "bytecode_interpreter.py", filename]
             if user_input:
-                result = subprocess.run(
-                    ["python", "bytecode_interpreter.py", filename],
-                    input=user_input,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                )
-            else:
-                result = subprocess.run(
-                    ["python", "bytecode_interpreter.py", filename],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                )
+                # READ takes the whitespace-separated numbers of the input field, one per READ.
+                input_file = os.path.join("outputs", "temp_input.txt")
+                with open(input_file, "w", encoding="utf-8") as f:
+                    f.write(user_input)
+                command += ["--input-file", input_file]
+            result = subprocess.run(
+                command,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=10,
+            )
 
             self.text_output.config(state=tk.NORMAL)
             self.text_output.insert(tk.END, f"\n--- {program_type} Execution ---\n")
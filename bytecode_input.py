@@ -0,0 +1,120 @@
+"""
+Input sources for READ.
+
+Every BytecodeInterpreter takes the values READ pushes from its own source
+(BytecodeInterpreter.inputs). A source returns the next integer from read(), and 0
+once it is exhausted or when the next item is not an integer, the same as READ does
+for a line of standard input that is empty or not a number.
+
+- StdinSource reads a line of standard input per READ, the default.
+- IterableSource takes the values of any iterable, e.g. the `inputs` of a web request.
+- TextSource splits a string into whitespace-separated numbers.
+- MappedFileSource does the same for a file mapped into memory, a token at a time.
+- ArraySource takes the items of a binary array of machine integers.
+
+Only StdinSource is interactive: the interpreter flushes its output before each READ
+from an interactive source, so prompts are shown before it waits.
+"""
+
+import mmap
+import re
+import sys
+from array import array
+from typing import Iterable, Iterator, Union
+
+_TOKEN = re.compile(rb"\S+")
+
+
+class InputSource:
+    """Base class of the input sources."""
+
+    # Whether read() may block waiting for a user; see the module docstring.
+    interactive = False
+
+    def read(self) -> int:
+        """Returns the next input value, or 0 if there is none or it is not an integer."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Releases any file or mapping the source holds."""
+
+
+class StdinSource(InputSource):
+    """Reads one integer per line of standard input, with input()."""
+
+    interactive = True
+
+    def read(self) -> int:
+        try:
+            return int(input())
+        except (ValueError, EOFError):
+            return 0
+
+
+class IterableSource(InputSource):
+    """Takes values from an iterable; items that are not integers read as 0."""
+
+    def __init__(self, values: Iterable[Union[int, str, bytes]]):
+        self._values: Iterator = iter(values)
+
+    def read(self) -> int:
+        value = next(self._values, 0)
+        if type(value) is int:
+            return value
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+
+class TextSource(IterableSource):
+    """Takes the whitespace-separated numbers of a string."""
+
+    def __init__(self, text: str):
+        super().__init__(text.split())
+
+
+class MappedFileSource(IterableSource):
+    """
+    Takes the whitespace-separated numbers of a text file. The file is mapped into memory
+    and only the token being read is copied out of it.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.seek(0, 2):
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                tokens = (match.group() for match in _TOKEN.finditer(self._map))
+            else:
+                # An empty file cannot be mapped.
+                self._map = None
+                tokens = iter(())
+        super().__init__(tokens)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._values = iter(())
+            self._map.close()
+            self._map = None
+
+
+class ArraySource(IterableSource):
+    """
+    Takes the items of a binary array of integers, e.g. array("q") or bytes holding
+    little-endian 64-bit values.
+    """
+
+    def __init__(self, data: Union[array, bytes, bytearray, memoryview], typecode: str = "q"):
+        if not isinstance(data, array):
+            items = array(typecode)
+            items.frombytes(data)
+            if sys.byteorder == "big":
+                items.byteswap()
+            data = items
+        super().__init__(data)
+
+    @classmethod
+    def from_file(cls, path: str, typecode: str = "q") -> "ArraySource":
+        """Reads a file of little-endian integers of the array typecode's size."""
+        with open(path, "rb") as f:
+            return cls(f.read(), typecode)
@@ -1,28 +1,641 @@
+import argparse
+import itertools
+import operator
 import sys
-from typing import List, Dict, Tuple, Optional
+from typing import Any, Callable, FrozenSet, Generator, List, Dict, Set, TextIO, Tuple, Optional
 import time
+from array import array
+
+from bytecode_input import ArraySource, InputSource, MappedFileSource, StdinSource
+from bytecode_intrinsics import Intrinsic, IntrinsicRegistry, standard_registry
+from bytecode_memo import MEMO_SIZE, MemoTable
+from bytecode_output import FileSink, OutputSink
+
+
+# Opcode numbers used by the decoded instruction stream built in load_program.
+# NOP and INVALID are internal: NOP stands in for operand-less LOAD/STORE lines,
+# INVALID carries the error message of a line that could not be decoded so it
+# is still reported at the moment it is executed. The opcodes after INVALID are
+# superinstructions, see SUPERINSTRUCTIONS.
+OPCODE_NAMES: List[str] = [
+    "PUSH",
+    "POP",
+    "DUP",
+    "ADD",
+    "SUB",
+    "MUL",
+    "DIV",
+    "MOD",
+    "NEG",
+    "STORE",
+    "LOAD",
+    "JMP",
+    "JZ",
+    "JNZ",
+    "HALT",
+    "EQ",
+    "NEQ",
+    "LT",
+    "GT",
+    "LE",
+    "GE",
+    "CALL",
+    "RET",
+    "PRINT",
+    "READ",
+    "NATIVE",
+    "NEWARRAY",
+    "ALOAD",
+    "ASTORE",
+    "ALEN",
+    "AFILL",
+    "ACOPY",
+    "NOP",
+    "INVALID",
+    "PUSH_BINARY",
+    "LOAD_JZ",
+    "LOAD_JNZ",
+    "LOAD_PUSH_BINARY",
+    "LOAD_PUSH_BINARY_STORE",
+    "LOAD_PUSH_BINARY_JZ",
+    "LOAD_PUSH_BINARY_JNZ",
+]
+(
+    OP_PUSH,
+    OP_POP,
+    OP_DUP,
+    OP_ADD,
+    OP_SUB,
+    OP_MUL,
+    OP_DIV,
+    OP_MOD,
+    OP_NEG,
+    OP_STORE,
+    OP_LOAD,
+    OP_JMP,
+    OP_JZ,
+    OP_JNZ,
+    OP_HALT,
+    OP_EQ,
+    OP_NEQ,
+    OP_LT,
+    OP_GT,
+    OP_LE,
+    OP_GE,
+    OP_CALL,
+    OP_RET,
+    OP_PRINT,
+    OP_READ,
+    OP_NATIVE,
+    OP_NEWARRAY,
+    OP_ALOAD,
+    OP_ASTORE,
+    OP_ALEN,
+    OP_AFILL,
+    OP_ACOPY,
+    OP_NOP,
+    OP_INVALID,
+    OP_PUSH_BINARY,
+    OP_LOAD_JZ,
+    OP_LOAD_JNZ,
+    OP_LOAD_PUSH_BINARY,
+    OP_LOAD_PUSH_BINARY_STORE,
+    OP_LOAD_PUSH_BINARY_JZ,
+    OP_LOAD_PUSH_BINARY_JNZ,
+) = range(len(OPCODE_NAMES))
+
+# Source mnemonics accepted by the loader (the internal opcodes are excluded).
+OPCODES: Dict[str, int] = {name: op for op, name in enumerate(OPCODE_NAMES[:OP_NOP])}
+
+# Opcodes whose handler sets the program counter itself. Superinstructions do too, since
+# they advance it past all the instructions they stand for.
+CONTROL_FLOW_OPS = frozenset({OP_JMP, OP_JZ, OP_JNZ, OP_CALL, OP_RET}) | frozenset(
+    range(OP_PUSH_BINARY, len(OPCODE_NAMES))
+)
+
+# Opcodes whose operand is a jump or call target.
+BRANCH_OPS = frozenset({OP_JMP, OP_JZ, OP_JNZ, OP_CALL})
+
+# Opcodes that compute new values, whose results max_int_bits is checked against (the others
+# only move, compare or store values, or push booleans, handles and lengths).
+INT_RESULT_OPS = frozenset({OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_MOD, OP_NEG, OP_READ, OP_NATIVE})
+
+# Opcodes that can leave more values on the stack than they found, after which max_stack_size
+# is checked (CALL when memoization replaces the arguments of a call by its remembered results).
+STACK_GROWTH_OPS = frozenset({OP_PUSH, OP_DUP, OP_LOAD, OP_READ, OP_NATIVE, OP_CALL})
+
+# Heap array opcodes: the BytecodeInterpreter method that performs each one on the values it
+# pops (the deepest one being the first argument), and the numbers of values it pops and pushes.
+ARRAY_OPS: Dict[int, Tuple[str, int, int]] = {
+    OP_NEWARRAY: ("array_new", 1, 1),
+    OP_ALOAD: ("array_load", 2, 1),
+    OP_ASTORE: ("array_store", 3, 0),
+    OP_ALEN: ("array_length", 1, 1),
+    OP_AFILL: ("array_fill", 4, 0),
+    OP_ACOPY: ("array_copy", 5, 0),
+}
+
+# A decoded instruction: integer opcode and its pre-converted operand.
+Instruction = Tuple[int, Any]
+
+# An event yielded by BytecodeInterpreter.events(): its kind ("print", "read", "halt" or
+# "error") and value.
+Event = Tuple[str, Any]
+
+# A threaded instruction: a closure with its operand captured that executes the
+# instruction against an interpreter and returns the next program counter.
+ThreadedInstruction = Callable[["BytecodeInterpreter"], int]
+
+# Binary opcodes that a superinstruction applies to a PUSH constant, mapped to a function
+# computing the value the opcode leaves on the stack. DIV and MOD are only fused when the
+# constant is not zero, so they cannot fail.
+FUSABLE_BINARY_OPS: Dict[int, Callable[[int, int], int]] = {
+    OP_ADD: operator.add,
+    OP_SUB: operator.sub,
+    OP_MUL: operator.mul,
+    OP_DIV: operator.floordiv,
+    OP_MOD: operator.mod,
+    OP_EQ: lambda a, b: 1 if a == b else 0,
+    OP_NEQ: lambda a, b: 1 if a != b else 0,
+    OP_LT: lambda a, b: 1 if a < b else 0,
+    OP_GT: lambda a, b: 1 if a > b else 0,
+    OP_LE: lambda a, b: 1 if a <= b else 0,
+    OP_GE: lambda a, b: 1 if a >= b else 0,
+}
+
+_BINARY = frozenset(FUSABLE_BINARY_OPS)
+
+# Error messages of the binary opcodes that fail on a zero divisor.
+_ZERO_DIVISION_ERRORS: Dict[int, str] = {OP_DIV: "Division by zero", OP_MOD: "Modulo by zero"}
+
+# Superinstructions recognised by fuse_superinstructions, longest first: the opcodes
+# accepted at each position of the sequence and the opcode of the fused instruction. The
+# operand of a fused instruction is the tuple of its components' operands, with binary
+# opcodes replaced by their FUSABLE_BINARY_OPS function.
+#
+# The catalogue follows the executed-sequence counts printed by opcode_frequencies.py for
+# tests/*.bc and the benchmark workloads; the most frequent were
+#   pairs:   LOAD PUSH 414, PUSH SUB 305, LOAD JZ 202, PUSH GT 109
+#   triples: LOAD PUSH SUB 305, LOAD PUSH GT 108, LOAD LOAD ADD 102
+#   quads:   LOAD PUSH SUB STORE 305, LOAD PUSH GT JZ 108
+# Only sequences that can fail in their first instruction (an undefined LOAD), before
+# changing any state, are fused, so runtime errors keep their line numbers. LOAD LOAD ADD
+# is left out because its second LOAD can fail after the first has pushed.
+SUPERINSTRUCTIONS: List[Tuple[Tuple[FrozenSet[int], ...], int]] = [
+    (
+        (frozenset({OP_LOAD}), frozenset({OP_PUSH}), _BINARY, frozenset({OP_STORE})),
+        OP_LOAD_PUSH_BINARY_STORE,
+    ),
+    (
+        (frozenset({OP_LOAD}), frozenset({OP_PUSH}), _BINARY, frozenset({OP_JZ})),
+        OP_LOAD_PUSH_BINARY_JZ,
+    ),
+    (
+        (frozenset({OP_LOAD}), frozenset({OP_PUSH}), _BINARY, frozenset({OP_JNZ})),
+        OP_LOAD_PUSH_BINARY_JNZ,
+    ),
+    ((frozenset({OP_LOAD}), frozenset({OP_PUSH}), _BINARY), OP_LOAD_PUSH_BINARY),
+    ((frozenset({OP_LOAD}), frozenset({OP_JZ})), OP_LOAD_JZ),
+    ((frozenset({OP_LOAD}), frozenset({OP_JNZ})), OP_LOAD_JNZ),
+    ((frozenset({OP_PUSH}), _BINARY), OP_PUSH_BINARY),
+]
+
+# Every opcode sequence SUPERINSTRUCTIONS accepts, mapped to its fused opcode, and the
+# sequence lengths longest first. Entries earlier in SUPERINSTRUCTIONS win.
+_FUSION_TABLE: Dict[Tuple[int, ...], int] = {}
+for _pattern, _op in reversed(SUPERINSTRUCTIONS):
+    for _ops in itertools.product(*_pattern):
+        _FUSION_TABLE[_ops] = _op
+_FUSION_LENGTHS = sorted({len(_pattern) for _pattern, _ in SUPERINSTRUCTIONS}, reverse=True)
+_FUSION_STARTS = frozenset(_ops[0] for _ops in _FUSION_TABLE)
+
+# Number of decoded instructions each opcode executes: 1, or the length of a superinstruction.
+OPCODE_WIDTHS: List[int] = [1] * len(OPCODE_NAMES)
+for _pattern, _op in SUPERINSTRUCTIONS:
+    OPCODE_WIDTHS[_op] = len(_pattern)
+
+# Formats of the CLI's --input-file: whitespace-separated text, or the array typecode of the
+# binary integers it holds.
+INPUT_FORMATS: Dict[str, Optional[str]] = {"text": None, "int32": "i", "int64": "q"}
+
+# Bit widths of the fixed-width integer mode, BytecodeInterpreter(int_width=...), and what
+# it does with a result that does not fit: wrap around in two's complement, or stop the
+# program with a runtime error.
+INT_WIDTHS = (32, 64)
+OVERFLOW_MODES = ("wrap", "trap")
+
+# Execution engines selectable with BytecodeInterpreter(engine=...).
+#   dispatch: looks up a bound handler method by opcode number on every step.
+#   threaded: runs pre-built closures, see build_threaded_code.
+#   compiled: runs the whole program translated to a Python function, see bytecode_compiler.
+#   tiered: runs threaded code and compiles loops that become hot, see _run_tiered.
+#   register: runs the program translated to register instructions, see bytecode_register.
+ENGINES = ("dispatch", "threaded", "compiled", "tiered", "register")
+
+# Number of times the tiered engine has to jump back to a loop header before it
+# compiles the loop.
+HOT_LOOP_THRESHOLD = 50
+
+# Returned by threaded HALT/RET to leave the run loop.
+HALT_PC = sys.maxsize
+
+# Default wall-clock limit of run(), in seconds.
+DEFAULT_TIME_LIMIT = 2.0
+
+# Instructions executed between two wall-clock checks.
+TIME_CHECK_INTERVAL = 1000
+
+
+class _Undefined:
+    """Value of a variable slot before the variable is first stored."""
+
+    def __repr__(self) -> str:
+        return "<undefined>"
+
+
+UNDEFINED = _Undefined()
+
+
+class BytecodeLoadError(RuntimeError):
+    """
+    Raised by load_program when a program cannot be loaded, e.g. because a jump or
+    call refers to a label that is not defined. All problems found are reported at
+    once: `errors` holds one message per offending line.
+    """
 
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class ExecutionLimitExceeded(RuntimeError):
+    """
+    Base class of the errors run() raises when a program exceeds one of the interpreter's
+    execution limits (max_instructions, time_limit, max_call_depth) or quotas (max_stack_size,
+    max_int_bits, max_output_bytes, max_heap_size). Execution stops with program_counter at the next
+    instruction that would have run, or for a quota checked by an instruction at that instruction.
+    """
+
+
+class InstructionLimitExceeded(ExecutionLimitExceeded):
+    """Raised when a program executes more than max_instructions instructions."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Instruction limit exceeded: executed more than {limit} instructions.")
+        self.limit = limit
+
+
+class TimeLimitExceeded(ExecutionLimitExceeded):
+    """Raised when a program runs for longer than time_limit seconds."""
+
+    def __init__(self, limit: float):
+        super().__init__(f"Infinite loop detected: execution exceeded {limit:g} seconds.")
+        self.limit = limit
+
+
+class CallDepthExceeded(ExecutionLimitExceeded):
+    """Raised by a CALL that would nest more than max_call_depth calls."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Call depth limit exceeded: more than {limit} nested calls.")
+        self.limit = limit
+
+
+class StackLimitExceeded(ExecutionLimitExceeded):
+    """
+    Raised by an instruction in STACK_GROWTH_OPS that leaves more than max_stack_size values on the
+    stack. run() skips the check for a program whose verified maximum stack depth stays within it.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(f"Stack limit exceeded: more than {limit} values on the stack.")
+        self.limit = limit
+
+
+class IntegerSizeExceeded(ExecutionLimitExceeded):
+    """Raised by an arithmetic instruction, READ or NATIVE that produces an integer longer than max_int_bits bits."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Integer size limit exceeded: a value needs more than {limit} bits.")
+        self.limit = limit
+
+
+class OutputLimitExceeded(ExecutionLimitExceeded):
+    """Raised by a PRINT that would take the output of a run past max_output_bytes."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Output limit exceeded: more than {limit} bytes printed.")
+        self.limit = limit
+
+
+class HeapLimitExceeded(ExecutionLimitExceeded):
+    """Raised by a NEWARRAY that would take the heap past max_heap_size array elements."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Heap limit exceeded: more than {limit} array elements.")
+        self.limit = limit
 
-class BytecodeInterpreter:
+
+class DecodedProgram:
+    """
+    A loaded program without any run state, as returned by BytecodeInterpreter.decoded_program:
+    - instructions, code, line_numbers, labels, fused_code: As on the interpreter that loaded it.
+    - slot_names: The variable names, indexed by the slots LOAD and STORE operands refer to.
+    - widths: The number of instructions each entry of fused_code executes.
+    - stack_analysis: The StackAnalysis of the program, or None if it was not verified.
+    - options: The (superinstructions, verify_stack, strict_stack) settings it was loaded with.
+    - intrinsics: The intrinsics its NATIVE instructions call, by name.
+
+    The lists are shared by every interpreter that loads the program and must not be modified.
+    """
+
+    def __init__(
+        self,
+        instructions: List[str],
+        code: List[Instruction],
+        line_numbers: List[int],
+        labels: Dict[str, int],
+        slot_names: List[str],
+        fused_code: List[Instruction],
+        widths: List[int],
+        stack_analysis: Optional[Any],
+        options: Tuple[bool, bool, bool],
+        intrinsics: Dict[str, Intrinsic],
+    ):
+        self.instructions = instructions
+        self.code = code
+        self.line_numbers = line_numbers
+        self.labels = labels
+        self.slot_names = slot_names
+        self.fused_code = fused_code
+        self.widths = widths
+        self.stack_analysis = stack_analysis
+        self.options = options
+        self.intrinsics = intrinsics
+
+
+class RunMetrics:
+    """
+    Resource use of one run, filled in by BytecodeInterpreter.run(metrics=...):
+    - instructions_executed: The instructions the run executed.
+    - wall_time, cpu_time: The seconds the run took, and the CPU seconds of the process during it.
+    - peak_stack_depth: The most values that were on the stack after any instruction.
+    - peak_call_depth: The most calls that were active at once.
+    - live_variables: The variables defined when the run ended.
+    - max_int_bits: The bit length of the largest value (in magnitude) on the stack or in a variable.
+    - heap_size: The array elements on the heap when the run ended.
+
+    A run that starts with values on the stack, variables or active calls left by an earlier
+    run counts them as well.
+    """
 
     def __init__(self):
+        self.instructions_executed = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_stack_depth = 0
+        self.peak_call_depth = 0
+        self.live_variables = 0
+        self.max_int_bits = 0
+        self.heap_size = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the metrics as JSON-serialisable data."""
+        return dict(vars(self))
+
+    def report(self) -> str:
+        """Returns the metrics as lines of text, e.g. for --stats."""
+        return "\n".join(
+            [
+                f"Instructions executed: {self.instructions_executed}",
+                f"Wall time: {self.wall_time * 1000:.3f} ms",
+                f"CPU time: {self.cpu_time * 1000:.3f} ms",
+                f"Peak stack depth: {self.peak_stack_depth}",
+                f"Peak call depth: {self.peak_call_depth}",
+                f"Live variables: {self.live_variables}",
+                f"Max integer bit length: {self.max_int_bits}",
+                f"Heap elements: {self.heap_size}",
+            ]
+        )
+
+
+class BytecodeInterpreter:
+
+    def __init__(
+        self,
+        engine: str = "dispatch",
+        superinstructions: bool = True,
+        max_instructions: Optional[int] = None,
+        time_limit: Optional[float] = DEFAULT_TIME_LIMIT,
+        max_call_depth: Optional[int] = None,
+        verify_stack: bool = True,
+        strict_stack: bool = False,
+        output: Optional[OutputSink] = None,
+        errors: Optional[TextIO] = None,
+        inputs: Optional[InputSource] = None,
+        max_stack_size: Optional[int] = None,
+        max_int_bits: Optional[int] = None,
+        max_output_bytes: Optional[int] = None,
+        max_heap_size: Optional[int] = None,
+        int_width: Optional[int] = None,
+        overflow: str = "wrap",
+        intrinsics: Optional[IntrinsicRegistry] = None,
+        memoize: bool = False,
+        memo_size: int = MEMO_SIZE,
+    ):
         """
         Initializes the bytecode interpreter with the following attributes:
         - stack: A list used as the operand stack for integer values.
-        - variables: A dictionary mapping variable names (str) to their integer values.
-        - instructions: A list of instructions (as strings) to be executed.
+        - variables: A dictionary mapping variable names (str) to their integer values, built from
+          slots on demand (see the variables property).
+        - slot_names: The variable names, indexed by the slot load_program assigned to them.
+        - slots: The variable values, indexed by slot; UNDEFINED until the variable is stored.
+        - instructions: A list of source instructions (as strings), one per line.
+        - code: The decoded instruction stream executed by run(), one (opcode, operand) pair per instruction.
+        - line_numbers: The source line number (1-based) of each entry in code, used in error messages.
+        - fused_code: code with superinstructions fused in (see fuse_superinstructions), run by the
+          dispatch, threaded and tiered engines; code itself if superinstructions is False.
         - program_counter: An integer indicating the current instruction index.
         - labels: A dictionary mapping label names (str) to their corresponding instruction indices.
         - call_stack: A list used to manage return addresses for function calls.
+        - heap: The arrays allocated by NEWARRAY, indexed by their handles. Each one is an
+          array("q") of signed 64-bit integers; like the stack, the heap is kept between runs.
         - halted: A boolean flag indicating whether the interpreter has halted execution.
+        - engine: The execution engine used by run(), one of ENGINES.
+        - superinstructions: Whether load_program fuses frequent instruction sequences.
+        - hot_loop_threshold: Backward jumps to a loop header after which the tiered engine compiles the loop.
+        - traces_compiled: Number of loops the tiered engine has compiled for the loaded program.
+        - traces_entered: Number of times the tiered engine has entered a compiled loop.
+        - max_instructions: Maximum number of instructions run() may execute, or None for no limit.
+        - time_limit: Maximum wall-clock time of run() in seconds, or None for no limit.
+        - max_call_depth: Maximum number of nested CALLs, or None for no limit.
+        - max_stack_size: Maximum number of values on the stack, or None for no quota.
+        - max_int_bits: Maximum bit length of the magnitude of any value, or None for no quota.
+        - max_output_bytes: Maximum output of a run, in bytes of text, or None for no quota.
+        - max_heap_size: Maximum number of array elements on the heap, or None for no quota.
+        - int_width: The bit width of the fixed-width integer mode, one of INT_WIDTHS, or None for
+          unbounded Python integers. Every value a PUSH, READ or arithmetic instruction produces
+          is then a signed int_width-bit integer.
+        - overflow: What the fixed-width mode does with a value that does not fit, one of
+          OVERFLOW_MODES: "wrap" reduces it modulo 2**int_width, "trap" stops the program with
+          an "Integer overflow" runtime error.
+        - time_check_interval: Instructions executed between two checks of time_limit.
+        - instructions_executed: Number of instructions executed by the last run().
+        - error: The message of the runtime error that stopped the last run, or None.
+        - verify_stack: Whether load_program verifies the stack depths of the program (see
+          bytecode_verifier); a verified program runs without checking the stack length per instruction.
+        - strict_stack: Whether load_program rejects programs that fail verification.
+        - stack_analysis: The StackAnalysis of the loaded program, or None if it was not verified.
+        - output: The OutputSink PRINT writes to (see bytecode_output); by default a FileSink
+          that writes to sys.stdout in batches.
+        - errors: The text file runtime errors are reported to, or None for sys.stderr.
+        - inputs: The InputSource READ takes its values from (see bytecode_input); by default a
+          StdinSource that reads a line of standard input per READ.
+        - intrinsics: The IntrinsicRegistry NATIVE instructions are resolved in when a program is
+          loaded (see bytecode_intrinsics); by default a new registry of the standard intrinsics.
+        - memoize: Whether CALLs of pure subroutines are memoized (see bytecode_memo). A call
+          whose results are remembered skips the subroutine, with its instructions and nested
+          calls, so instructions_executed and the call depth limit only count the calls that run.
+        - memo: The MemoTable of the remembered calls, with their hit and miss counts; cleared
+          when a program is loaded.
+        - pure_subroutines: The PureSubroutine of each pure CALL target of the loaded program by
+          entry index, found by the first run with memoize set, or None.
+
+        Limits are enforced by run(), see ExecutionLimitExceeded. The quotas and the fixed-width
+        mode are applied after every instruction, so with either the program runs in the
+        instrumented loop (see run()).
+
+        Raises:
+            ValueError: If engine, int_width or overflow is not one of the values above.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine} (expected one of {', '.join(ENGINES)})")
+        if int_width is not None and int_width not in INT_WIDTHS:
+            raise ValueError(f"Unknown int_width: {int_width} (expected one of {', '.join(map(str, INT_WIDTHS))})")
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode: {overflow} (expected one of {', '.join(OVERFLOW_MODES)})")
         self.stack: List[int] = []
-        self.variables: Dict[str, int] = {}
+        self.slot_names: List[str] = []
+        self.slots: List[Any] = []
+        self._slot_of: Dict[str, int] = {}
         self.instructions: List[str] = []
+        self.code: List[Instruction] = []
+        self.line_numbers: List[int] = []
+        self.fused_code: List[Instruction] = []
         self.program_counter: int = 0
         self.labels: Dict[str, int] = {}
         self.call_stack: List[int] = []
+        self.heap: List[array] = []
         self.halted: bool = False
+        self.engine: str = engine
+        self.superinstructions: bool = superinstructions
+        self._threaded_code: Optional[List[ThreadedInstruction]] = None
+        self._compiled: Optional[Any] = None
+        self._register_code: Optional[Any] = None
+        self.hot_loop_threshold: int = HOT_LOOP_THRESHOLD
+        self.traces_compiled: int = 0
+        self.traces_entered: int = 0
+        self._tiered_code: Optional[List[ThreadedInstruction]] = None
+        self._traces: List[Optional[Callable[["BytecodeInterpreter"], Tuple[int, bool]]]] = []
+        self._loop_counts: List[int] = []
+        self._trace_regions: Dict[int, Set[int]] = {}
+        self.max_instructions: Optional[int] = max_instructions
+        self.time_limit: Optional[float] = time_limit
+        self.max_call_depth: Optional[int] = max_call_depth
+        self.max_stack_size: Optional[int] = max_stack_size
+        self.max_int_bits: Optional[int] = max_int_bits
+        self.max_output_bytes: Optional[int] = max_output_bytes
+        self.max_heap_size: Optional[int] = max_heap_size
+        self.int_width: Optional[int] = int_width
+        self.overflow: str = overflow
+        self.time_check_interval: int = TIME_CHECK_INTERVAL
+        self.instructions_executed: int = 0
+        self.error: Optional[str] = None
+        self._widths: List[int] = []
+        self._deadline: float = 0.0
+        self._next_check: int = 0
+        self._max_call_depth: int = sys.maxsize
+        self._max_stack_size: int = sys.maxsize
+        # Whether step, run_for and events check the stack after every instruction, for
+        # max_stack_size or max_int_bits.
+        self._quotas: bool = False
+        # The max_stack_size run() checks after STACK_GROWTH_OPS, or None if there is none or
+        # stack verification has proven the program stays within it.
+        self._stack_limit: Optional[int] = None
+        # Whether run(), step, run_for and events check values after every instruction, for the
+        # fixed-width mode.
+        self._instrumented: bool = False
+        # The range of values in the fixed-width mode.
+        self._int_min: int = 0
+        self._int_max: int = 0
+        self._heap_used: int = 0
+        # The instructions the dispatch, threaded and tiered engines run, and how many
+        # instructions each entry executes: fused_code, or code with max_int_bits.
+        self._run_code: List[Instruction] = []
+        self._run_widths: List[int] = []
+        self.verify_stack: bool = verify_stack
+        self.strict_stack: bool = strict_stack
+        self.stack_analysis: Optional[Any] = None
+        self.output: OutputSink = output if output is not None else FileSink()
+        self.errors: Optional[TextIO] = errors
+        self.inputs: InputSource = inputs if inputs is not None else StdinSource()
+        self.intrinsics: IntrinsicRegistry = intrinsics if intrinsics is not None else standard_registry()
+        self.memoize: bool = memoize
+        self.memo: MemoTable = MemoTable(memo_size)
+        self.pure_subroutines: Optional[Dict[int, Any]] = None
+        # The pure subroutines CALL looks up while memoizing (empty otherwise), the
+        # (call depth, key, base, results) of each memoized call that has not returned yet,
+        # and the settings the remembered results were computed with.
+        self._memo_targets: Dict[int, Any] = {}
+        self._memo_frames: List[Tuple[int, Tuple[int, Tuple[int, ...]], int, int]] = []
+        self._memo_settings: Optional[Tuple[Optional[int], str]] = None
+        # Whether the loaded program passed verification, and whether the current run (and
+        # the code built for the engines) checks the stack length.
+        self._verified: bool = False
+        self._checked: bool = True
+        # The max_int_bits and stack limit the code built for the engines checks.
+        self._engine_int_bits: Optional[int] = None
+        self._engine_stack_limit: Optional[int] = None
+        # Handlers indexed by opcode number, bound once instead of on every step.
+        self._handlers: List[Callable[[Any], None]] = [
+            getattr(self, "op_" + name.lower()) for name in OPCODE_NAMES
+        ]
+        self._unchecked_handlers: List[Callable[[Any], None]] = build_unchecked_handlers(self)
+
+    @property
+    def variables(self) -> Dict[str, int]:
+        """
+        The defined variables mapped to their values. The interpreter keeps variables in
+        slots, so this is a new dictionary built on every access; assign a dictionary to
+        replace all variables.
+        """
+        return {
+            name: value
+            for name, value in zip(self.slot_names, self.slots)
+            if value is not UNDEFINED
+        }
+
+    @variables.setter
+    def variables(self, values: Dict[str, int]) -> None:
+        self.slots = [UNDEFINED] * len(self.slot_names)
+        for name, value in values.items():
+            self.slots[self.slot_for(name)] = value
+
+    def slot_for(self, name: str) -> int:
+        """
+        Returns the slot of a variable, assigning the next free one to a new name.
+
+        Args:
+            name (str): The variable name.
+        Returns:
+            int: The index of the variable in self.slots and self.slot_names.
+        """
+        slot = self._slot_of.get(name)
+        if slot is None:
+            slot = self._slot_of[name] = len(self.slot_names)
+            self.slot_names.append(name)
+            self.slots.append(UNDEFINED)
+        return slot
 
     def load_program(self, bytecode: str) -> None:
         """
@@ -31,17 +644,37 @@ class BytecodeInterpreter:
             bytecode (str): The bytecode program as a string, with each instruction or label on a separate line.
         Side Effects:
             - Populates self.instructions with the parsed instructions, preserving line positions.
-            - Populates self.labels with label names mapped to their corresponding line indices.
+            - Populates self.code with the decoded instructions only (see decode_instruction) and
+              self.line_numbers with the source line of each of them.
+            - Populates self.labels with label names mapped to the index in self.code of the instruction they precede.
+            - Populates self.fused_code with self.code after superinstruction fusion.
+            - Assigns a slot to every variable name (see slot_for); LOAD and STORE operands are slots.
+              Variables set before loading keep their slots and values.
+            - Sets self.stack_analysis to the result of bytecode_verifier.analyze_stack if verify_stack
+              or strict_stack is set.
         Notes:
             - Lines that are empty or start with '#' (comments) are ignored in execution but preserved as empty strings in instructions.
             - Labels (lines ending with ':') are recorded in self.labels and also stored as empty strings in instructions to maintain line alignment.
+            - Jump and call targets are resolved to indices in self.code here, once. A numeric target
+              is a 0-based line index and resolves to the first instruction at or after that line.
+            - NATIVE operands are resolved to the Intrinsic registered under their name in self.intrinsics.
+        Raises:
+            BytecodeLoadError: If any jump or call target is neither a defined label nor a valid line index,
+                               if a NATIVE names no registered intrinsic, or if strict_stack is set and
+                               the stack depths cannot be verified.
         """
         lines = bytecode.strip().split("\n")
         self.instructions = []
+        self.code = []
+        self.line_numbers = []
         self.labels = {}
+        self._discard_engine_code()
+        # first_index[i] is the index in self.code of the first instruction at or after line i.
+        first_index: List[int] = []
 
         for i, line in enumerate(lines):
             line = line.strip()
+            first_index.append(len(self.code))
 
             if not line or line.startswith("#"):
                 self.instructions.append("")
@@ -49,10 +682,223 @@ class BytecodeInterpreter:
 
             if line.endswith(":"):
                 label_name = line[:-1].strip()
-                self.labels[label_name] = i
+                self.labels[label_name] = len(self.code)
                 self.instructions.append("")
             else:
                 self.instructions.append(line)
+                self.code.append(self.decode_instruction(line))
+                self.line_numbers.append(i + 1)
+        first_index.append(len(self.code))
+
+        errors = []
+        for index, (op, arg) in enumerate(self.code):
+            if op == OP_LOAD or op == OP_STORE:
+                self.code[index] = (op, self.slot_for(arg))
+                continue
+            if op == OP_NATIVE:
+                intrinsic = self.intrinsics.get(arg)
+                if intrinsic is None:
+                    errors.append(f"Load error at line {self.line_numbers[index]}: Unknown intrinsic: {arg}")
+                else:
+                    self.code[index] = (op, intrinsic)
+                continue
+            if op not in BRANCH_OPS:
+                continue
+            target = self.resolve_target(arg, first_index)
+            if target is None:
+                kind = "call" if op == OP_CALL else "jump"
+                errors.append(
+                    f"Load error at line {self.line_numbers[index]}: Invalid {kind} target: {arg}"
+                )
+            else:
+                self.code[index] = (op, target)
+        if errors:
+            raise BytecodeLoadError(errors)
+        self._finish_load()
+
+    def load_binary(self, program) -> None:
+        """
+        Loads a program read from the binary format (see bytecode_binary). The image already
+        holds the decoded instruction stream with resolved targets, so only the operands are
+        mapped: constants and names are looked up in their tables and names get slots.
+
+        Args:
+            program (BinaryProgram): The program, as returned by bytecode_binary.read_program or read_file.
+        Side Effects:
+            - Same as load_program. self.instructions holds "" for every line, except the text of
+              instructions that could not be decoded.
+        Raises:
+            BytecodeLoadError: If an opcode or operand is out of range, if a NATIVE names no
+                               registered intrinsic, or if strict_stack is set and the stack depths
+                               cannot be verified.
+        """
+        self._discard_engine_code()
+        count = len(program.opcodes)
+        line_count = program.line_count
+        constants = program.constants
+        texts = program.texts
+        slots = [self.slot_for(name) for name in program.names]
+        instructions = [""] * line_count
+        code: List[Instruction] = []
+        try:
+            for op, arg, line in zip(program.opcodes, program.operands, program.line_numbers):
+                if arg < 0 or not 0 < line <= line_count:
+                    raise IndexError(f"operand {arg} or line {line}")
+                if op == OP_PUSH:
+                    code.append((op, constants[arg]))
+                elif op == OP_LOAD or op == OP_STORE:
+                    code.append((op, slots[arg]))
+                elif op in BRANCH_OPS:
+                    if arg > count:
+                        raise IndexError(f"target {arg}")
+                    code.append((op, arg))
+                elif op == OP_INVALID:
+                    instructions[line - 1] = texts[arg]
+                    code.append(self.decode_instruction(texts[arg]))
+                elif op == OP_NATIVE:
+                    intrinsic = self.intrinsics.get(texts[arg])
+                    if intrinsic is None:
+                        raise BytecodeLoadError([f"Load error at line {line}: Unknown intrinsic: {texts[arg]}"])
+                    code.append((op, intrinsic))
+                elif op < OP_INVALID:
+                    code.append((op, None))
+                else:
+                    raise IndexError(f"opcode {op}")
+        except IndexError as e:
+            raise BytecodeLoadError(
+                [f"Load error at instruction {len(code)}: invalid binary program: {e} out of range"]
+            ) from None
+        self.instructions = instructions
+        self.code = code
+        self.line_numbers = list(program.line_numbers)
+        self.labels = dict(program.labels)
+        self._finish_load()
+
+    def decoded_program(self) -> "DecodedProgram":
+        """
+        Returns the loaded program as a DecodedProgram, which load_decoded installs in another
+        interpreter without decoding, fusing or verifying it again.
+        """
+        return DecodedProgram(
+            self.instructions,
+            self.code,
+            self.line_numbers,
+            self.labels,
+            list(self.slot_names),
+            self.fused_code,
+            self._widths,
+            self.stack_analysis,
+            (self.superinstructions, self.verify_stack, self.strict_stack),
+            {arg.name: arg for op, arg in self.code if op == OP_NATIVE},
+        )
+
+    def load_decoded(self, program: "DecodedProgram") -> None:
+        """
+        Loads a program decoded by another interpreter (see decoded_program). The decoded
+        instructions are shared, not copied; only the mutable run state belongs to this interpreter.
+
+        If this interpreter already has variables, was created with other superinstructions,
+        verify_stack or strict_stack settings, or has other intrinsics under the names the program
+        calls, the slots are remapped, NATIVE instructions are resolved in self.intrinsics and the
+        program is fused and verified again.
+
+        Args:
+            program (DecodedProgram): The program, as returned by decoded_program.
+        Raises:
+            BytecodeLoadError: If a NATIVE names no intrinsic registered here, or if strict_stack is
+                               set here but not for program, and the stack depths cannot be verified.
+        """
+        self._discard_engine_code()
+        self.instructions = program.instructions
+        self.labels = program.labels
+        self.line_numbers = program.line_numbers
+        slots = [self.slot_for(name) for name in program.slot_names]
+        options = (self.superinstructions, self.verify_stack, self.strict_stack)
+        linked = all(self.intrinsics.get(name) is intrinsic for name, intrinsic in program.intrinsics.items())
+        if slots == list(range(len(slots))) and options == program.options and linked:
+            self.code = program.code
+            self.fused_code = program.fused_code
+            self._widths = program.widths
+            self.stack_analysis = program.stack_analysis
+            self._verified = self.stack_analysis is not None and self.stack_analysis.verified
+            self._checked = not self._verified
+            self.reset()
+            return
+        code = [(op, slots[arg]) if op == OP_LOAD or op == OP_STORE else (op, arg) for op, arg in program.code]
+        errors = []
+        for index, (op, arg) in enumerate(code):
+            if op == OP_NATIVE:
+                intrinsic = self.intrinsics.get(arg.name)
+                if intrinsic is None:
+                    errors.append(f"Load error at line {self.line_numbers[index]}: Unknown intrinsic: {arg.name}")
+                code[index] = (op, intrinsic)
+        if errors:
+            raise BytecodeLoadError(errors)
+        self.code = code
+        self._finish_load()
+
+    def _discard_engine_code(self) -> None:
+        """Drops the code the engines built for the previously loaded program."""
+        self._threaded_code = None
+        self._compiled = None
+        self._register_code = None
+        self._tiered_code = None
+        self.traces_compiled = 0
+        self.traces_entered = 0
+        self.pure_subroutines = None
+        self.memo.clear()
+
+    def _finish_load(self) -> None:
+        """Fuses, verifies and resets a freshly decoded program; shared by load_program and load_binary."""
+        self.fused_code = fuse_superinstructions(self.code) if self.superinstructions else self.code
+        self._widths = [OPCODE_WIDTHS[op] for op, _ in self.fused_code]
+        self.stack_analysis = None
+        if self.verify_stack or self.strict_stack:
+            self._analyze_stack()
+        self._verified = self.stack_analysis is not None and self.stack_analysis.verified
+        self._checked = not self._verified
+        self.reset()
+
+    def _analyze_stack(self) -> None:
+        """
+        Runs the stack-depth verifier on the loaded program.
+
+        Raises:
+            BytecodeLoadError: If strict_stack is set and the program may underflow the stack or
+                               reaches an instruction with different stack depths.
+        """
+        from bytecode_verifier import analyze_stack
+
+        analysis = self.stack_analysis = analyze_stack(self.code)
+        if self.strict_stack and not analysis.verified:
+            problems = sorted(
+                analysis.underflows
+                + [(pc, f"Stack depth cannot be verified: {message}") for pc, message in analysis.conflicts]
+            )
+            raise BytecodeLoadError(
+                [f"Load error at line {self.line_numbers[pc]}: {message}" for pc, message in problems]
+            )
+
+    def resolve_target(self, target: str, first_index: List[int]) -> Optional[int]:
+        """
+        Resolves a jump or call target to an index in self.code.
+
+        Args:
+            target (str): A label name or a 0-based line index, as written in the source.
+            first_index (List[int]): For each line, the index of the first instruction at or after it.
+        Returns:
+            Optional[int]: The resolved instruction index, or None if the target is invalid.
+                           Line indices past the end resolve to len(self.code), which ends the program.
+        """
+        if target in self.labels:
+            return self.labels[target]
+        try:
+            line_index = int(target)
+        except ValueError:
+            return None
+        if line_index < 0:
+            return None
+        return first_index[min(line_index, len(first_index) - 1)]
 
     def parse_instruction(self, instruction: str) -> Tuple[Optional[str], List[str]]:
         """
@@ -71,91 +917,93 @@ class BytecodeInterpreter:
         args = parts[1:] if len(parts) > 1 else []
         return opcode, args
 
-    def execute_instruction(self, opcode: str, args: List[str]) -> None:
+    def decode_instruction(self, instruction: str) -> Instruction:
         """
-        Executes a single bytecode instruction based on the provided opcode and arguments.
+        Decodes a single instruction string into an integer opcode and a ready-to-use operand.
 
-        This method uses a dispatch table to map opcodes to their corresponding handler methods.
-        If the opcode is recognized, the associated handler is called with the given arguments.
-        If the opcode is not recognized, a RuntimeError is raised.
+        PUSH operands are converted to int, variable names are interned and jump/call
+        targets are kept as written (load_program replaces names by slots and resolves
+        targets afterwards). Instructions that cannot be decoded are not rejected
+        here: they become an INVALID instruction carrying the error message, so the error
+        is still reported with its line number when (and only if) it is executed.
+
+        Args:
+            instruction (str): The instruction string to decode.
+        Returns:
+            Instruction: A tuple of the opcode number and its operand (None if it takes none).
+        """
+        opcode, args = self.parse_instruction(instruction)
+        op = OPCODES.get(opcode)
+        if op is None:
+            return OP_INVALID, f"Unknown instruction: {opcode}"
+        if op == OP_PUSH:
+            try:
+                return op, int(args[0])
+            except IndexError:
+                return OP_INVALID, "PUSH requires an operand"
+            except ValueError as e:
+                return OP_INVALID, str(e)
+        if op == OP_STORE or op == OP_LOAD:
+            if not args:
+                return OP_NOP, None
+            return op, sys.intern(args[0])
+        if op in BRANCH_OPS:
+            if not args:
+                return OP_INVALID, f"{opcode} requires a target"
+            return op, args[0]
+        if op == OP_NATIVE:
+            if not args:
+                return OP_INVALID, "NATIVE requires an intrinsic name"
+            return op, args[0]
+        return op, None
+
+    def execute_instruction(self, opcode: int, arg: Any) -> None:
+        """
+        Executes a single decoded bytecode instruction.
 
+        The handler is looked up by opcode number in the table built in __init__.
         After executing the instruction, the program counter is incremented unless the instruction
         is a control flow operation (JMP, JZ, JNZ, CALL, RET), in which case the handler is responsible
         for updating the program counter as needed.
 
         Args:
-            opcode (str): The operation code representing the instruction to execute.
-            args (List[str]): A list of arguments for the instruction.
-
-        Raises:
-            RuntimeError: If the opcode is not recognized.
-        """
-        dispatch = {
-            "PUSH": self.op_push,
-            "POP": self.op_pop,
-            "DUP": self.op_dup,
-            "ADD": self.op_add,
-            "SUB": self.op_sub,
-            "MUL": self.op_mul,
-            "DIV": self.op_div,
-            "MOD": self.op_mod,
-            "NEG": self.op_neg,
-            "STORE": self.op_store,
-            "LOAD": self.op_load,
-            "JMP": self.op_jmp,
-            "JZ": self.op_jz,
-            "JNZ": self.op_jnz,
-            "HALT": self.op_halt,
-            "EQ": self.op_eq,
-            "NEQ": self.op_neq,
-            "LT": self.op_lt,
-            "GT": self.op_gt,
-            "LE": self.op_le,
-            "GE": self.op_ge,
-            "CALL": self.op_call,
-            "RET": self.op_ret,
-            "PRINT": self.op_print,
-            "READ": self.op_read,
-        }
-        handler = dispatch.get(opcode)
-        if handler:
-            handler(args)
-        else:
-            raise RuntimeError(f"Unknown instruction: {opcode}")
-        if opcode not in {"JMP", "JZ", "JNZ", "CALL", "RET"}:
+            opcode (int): The opcode number of the instruction to execute.
+            arg: The decoded operand of the instruction.
+        """
+        self._handlers[opcode](arg)
+        if opcode not in CONTROL_FLOW_OPS:
             self.program_counter += 1
 
-    def op_push(self, args: List[str]) -> None:
+    def op_push(self, arg: Any) -> None:
         """
         Pushes an integer value onto the stack.
 
         Args:
-            args (list): A list where the first element is the value to be pushed onto the stack as a string.
+            arg (int): The value to push, already converted to an integer by load_program.
 
         Side Effects:
             Appends the integer value to the instance's stack.
         """
-        value = int(args[0])
-        self.stack.append(value)
+        self.stack.append(arg)
 
-    def op_pop(self, args: List[str]) -> None:
+    def op_pop(self, arg: Any) -> None:
         """
         Removes the top element from the stack if the stack is not empty.
 
         Args:
-            args: Arguments for the operation (not used in this method).
+            arg: Unused operand, present for interface consistency.
         """
         if self.stack:
             self.stack.pop()
         else:
             raise RuntimeError("Stack Underflow.")
 
-    def op_dup(self, args: List[str]) -> None:
+    def op_dup(self, arg: Any) -> None:
         """
         Duplicates the top value on the stack.
 
         Args:
-            args: Unused argument, present for interface consistency.
+            arg: Unused operand, present for interface consistency.
 
         Side Effects:
             If the stack is not empty, appends a copy of the top element to the stack.
@@ -163,7 +1011,7 @@ class BytecodeInterpreter:
         if self.stack:
             self.stack.append(self.stack[-1])
 
-    def op_add(self, args: List[str]) -> None:
+    def op_add(self, arg: Any) -> None:
         """
         Performs addition on the top two values of the stack.
 
@@ -171,14 +1019,14 @@ class BytecodeInterpreter:
         Assumes that the stack contains at least two elements.
 
         Args:
-            args: Unused argument, present for interface compatibility.
+            arg: Unused operand, present for interface compatibility.
         """
         if len(self.stack) >= 2:
             b = self.stack.pop()
             a = self.stack.pop()
             self.stack.append(a + b)
 
-    def op_sub(self, args: List[str]) -> None:
+    def op_sub(self, arg: Any) -> None:
         """
         Performs subtraction on the top two values of the stack.
 
@@ -186,7 +1034,7 @@ class BytecodeInterpreter:
         and pushes the result back onto the stack.
 
         Args:
-            args: Unused argument, included for opcode interface compatibility.
+            arg: Unused operand, included for opcode interface compatibility.
 
         Raises:
             IndexError: If there are fewer than two elements on the stack.
@@ -196,7 +1044,7 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(a - b)
 
-    def op_mul(self, args: List[str]) -> None:
+    def op_mul(self, arg: Any) -> None:
         """
         Performs multiplication on the top two values of the stack.
 
@@ -204,7 +1052,7 @@ class BytecodeInterpreter:
         If there are fewer than two elements on the stack, the operation is not performed.
 
         Args:
-            args: Unused argument, included for interface consistency.
+            arg: Unused operand, included for interface consistency.
 
         Raises:
             IndexError: If there are fewer than two elements on the stack.
@@ -214,7 +1062,7 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(a * b)
 
-    def op_div(self, args: List[str]) -> None:
+    def op_div(self, arg: Any) -> None:
         """
         Performs integer division on the top two values of the stack.
 
@@ -223,7 +1071,7 @@ class BytecodeInterpreter:
         Raises a RuntimeError if division by zero is attempted.
 
         Args:
-            args: Unused argument, present for opcode interface compatibility.
+            arg: Unused operand, present for opcode interface compatibility.
 
         Raises:
             RuntimeError: If there are fewer than two elements on the stack or if division by zero is attempted.
@@ -236,7 +1084,7 @@ class BytecodeInterpreter:
             else:
                 raise RuntimeError("Division by zero")
 
-    def op_mod(self, args: List[str]) -> None:
+    def op_mod(self, arg: Any) -> None:
         """
         Performs the modulo operation on the top two values of the stack.
 
@@ -244,7 +1092,7 @@ class BytecodeInterpreter:
         and pushes the result back onto the stack. Raises a RuntimeError if the divisor is zero.
 
         Args:
-            args: Unused argument, present for interface compatibility.
+            arg: Unused operand, present for interface compatibility.
 
         Raises:
             RuntimeError: If there are fewer than two elements on the stack or if modulo by zero is attempted.
@@ -257,7 +1105,7 @@ class BytecodeInterpreter:
             else:
                 raise RuntimeError("Modulo by zero")
 
-    def op_neg(self, args: List[str]) -> None:
+    def op_neg(self, arg: Any) -> None:
         """
         Negates the top value on the stack.
 
@@ -265,137 +1113,98 @@ class BytecodeInterpreter:
         If the stack is empty, the operation does nothing.
 
         Args:
-            args: Unused argument, included for opcode interface consistency.
+            arg: Unused operand, included for opcode interface consistency.
         """
         if self.stack:
             a = self.stack.pop()
             self.stack.append(-a)
 
-    def op_store(self, args: List[str]) -> None:
+    def op_store(self, arg: Any) -> None:
         """
         Stores the top value from the stack into a variable.
 
         Args:
-            args (list): A list where the first element is the variable name (str) to store the value in.
+            arg (int): The slot of the variable to store the value in.
 
         Side Effects:
-            Pops the top value from the stack and assigns it to the specified variable in self.variables.
+            Pops the top value from the stack and assigns it to the variable's slot in self.slots.
 
         Notes:
-            - If the stack is empty or args is empty, the method does nothing.
+            - If the stack is empty, the method does nothing.
         """
-        if self.stack and args:
-            var_name = args[0]
-            value = self.stack.pop()
-            self.variables[var_name] = value
+        if self.stack:
+            self.slots[arg] = self.stack.pop()
 
-    def op_load(self, args: List[str]) -> None:
+    def op_load(self, arg: Any) -> None:
         """
         Loads the value of a variable onto the stack.
 
         Args:
-            args (list): A list where the first element is the name of the variable to load.
+            arg (int): The slot of the variable to load.
 
         Raises:
-            RuntimeError: If the specified variable name does not exist in the current variables dictionary.
+            RuntimeError: If the variable has not been stored yet.
 
         Side Effects:
             Appends the value of the specified variable to the stack.
         """
-        if args:
-            var_name = args[0]
-            if var_name in self.variables:
-                self.stack.append(self.variables[var_name])
-            else:
-                raise RuntimeError(f"Undefined variable: {var_name}")
+        value = self.slots[arg]
+        if value is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[arg]}")
+        self.stack.append(value)
 
-    def op_jmp(self, args: List[str]) -> None:
+    def op_jmp(self, arg: Any) -> None:
         """
         Handles the 'jmp' (jump) operation in the bytecode interpreter.
 
         Args:
-            args (list): A list where the first element is the jump target. The target can be a label name or an integer index.
+            arg (int): The jump target, resolved to an instruction index by load_program.
 
         Behavior:
-            - If the target is a label present in self.labels, sets the program counter to the corresponding instruction index.
-            - If the target is not a label, attempts to convert it to an integer and sets the program counter to that value.
-            - Raises a RuntimeError if the target is neither a valid label nor an integer.
-
-        Raises:
-            RuntimeError: If the jump target is invalid (not a known label or integer).
+            - Sets the program counter to the target instruction index.
         """
-        target = args[0]
-        if target in self.labels:
-            self.program_counter = self.labels[target]
-        else:
-            try:
-                self.program_counter = int(target)
-            except ValueError:
-                raise RuntimeError(f"Invalid jump target: {target}")
+        self.program_counter = arg
 
-    def op_jz(self, args: List[str]) -> None:
+    def op_jz(self, arg: Any) -> None:
         """
         Implements the 'jump if zero' (JZ) operation for the bytecode interpreter.
 
         Pops the top value from the stack and checks if it is zero.
-        - If the value is zero, sets the program counter to the target label or address specified in `args[0]`.
-          - If the target is a known label, jumps to the corresponding instruction.
-          - If the target is an integer, jumps to that instruction index.
-          - Raises a RuntimeError if the target is invalid.
+        - If the value is zero, sets the program counter to the target instruction index in `arg`.
         - If the value is not zero, increments the program counter to proceed to the next instruction.
         - If the stack is empty, simply increments the program counter.
 
         Args:
-            args (list): A list containing the jump target as the first element.
+            arg (int): The jump target, resolved to an instruction index by load_program.
         """
         if self.stack:
-            condition = self.stack.pop()
-            if condition == 0:
-                target = args[0]
-                if target in self.labels:
-                    self.program_counter = self.labels[target]
-                else:
-                    try:
-                        self.program_counter = int(target)
-                    except ValueError:
-                        raise RuntimeError(f"Invalid jump target: {target}")
+            if self.stack.pop() == 0:
+                self.program_counter = arg
             else:
                 self.program_counter += 1
         else:
             self.program_counter += 1
 
-    def op_jnz(self, args: List[str]) -> None:
+    def op_jnz(self, arg: Any) -> None:
         """
         Implements the 'jnz' (jump if not zero) operation for the bytecode interpreter.
 
         Pops the top value from the stack and checks if it is not zero. If the value is not zero,
-        sets the program counter to the target label or instruction index specified in `args[0]`.
-        If the target is not a valid label, attempts to interpret it as an integer index.
+        sets the program counter to the target instruction index specified in `arg`.
         If the value is zero or the stack is empty, increments the program counter to proceed to the next instruction.
 
         Args:
-            args (list): A list containing the jump target, which can be a label or an instruction index.
-
-        Raises:
-            RuntimeError: If the jump target is neither a valid label nor an integer.
+            arg (int): The jump target, resolved to an instruction index by load_program.
         """
         if self.stack:
-            condition = self.stack.pop()
-            if condition != 0:
-                target = args[0]
-                if target in self.labels:
-                    self.program_counter = self.labels[target]
-                else:
-                    try:
-                        self.program_counter = int(target)
-                    except ValueError:
-                        raise RuntimeError(f"Invalid jump target: {target}")
+            if self.stack.pop() != 0:
+                self.program_counter = arg
             else:
                 self.program_counter += 1
         else:
             self.program_counter += 1
 
-    def op_halt(self, args: List[str]) -> None:
+    def op_halt(self, arg: Any) -> None:
         """
         Halts the execution of the bytecode interpreter.
 
@@ -403,11 +1212,11 @@ class BytecodeInterpreter:
         to stop processing further instructions.
 
         Args:
-            args: Arguments for the halt operation (typically unused).
+            arg: Unused operand, present for interface consistency.
         """
         self.halted = True
 
-    def op_eq(self, args: List[str]) -> None:
+    def op_eq(self, arg: Any) -> None:
         """
         Compares the top two values on the stack for equality.
 
@@ -415,7 +1224,7 @@ class BytecodeInterpreter:
         and pushes 1 onto the stack if they are equal, or 0 otherwise.
 
         Args:
-            args: Unused argument, present for opcode interface compatibility.
+            arg: Unused operand, present for opcode interface compatibility.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -426,7 +1235,7 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a == b else 0)
 
-    def op_neq(self, args: List[str]) -> None:
+    def op_neq(self, arg: Any) -> None:
         """
         Implements the 'not equal' (NEQ) operation for the bytecode interpreter.
 
@@ -434,7 +1243,7 @@ class BytecodeInterpreter:
         and pushes 1 onto the stack if they are not equal, or 0 if they are equal.
 
         Args:
-            args: Unused argument, present for interface compatibility.
+            arg: Unused operand, present for interface compatibility.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -445,14 +1254,14 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a != b else 0)
 
-    def op_lt(self, args: List[str]) -> None:
+    def op_lt(self, arg: Any) -> None:
         """
         Implements the 'less than' (<) operation for the bytecode interpreter.
 
         Pops the top two values from the stack, compares them, and pushes 1 onto the stack if the first popped value is less than the second; otherwise, pushes 0.
 
         Args:
-            args: Unused argument, included for interface consistency.
+            arg: Unused operand, included for interface consistency.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -463,14 +1272,14 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a < b else 0)
 
-    def op_gt(self, args: List[str]) -> None:
+    def op_gt(self, arg: Any) -> None:
         """
         Implements the 'greater than' (>) operation for the interpreter.
 
         Pops the top two values from the stack, compares them, and pushes 1 onto the stack if the first popped value is greater than the second; otherwise, pushes 0.
 
         Args:
-            args: Unused argument, included for opcode interface consistency.
+            arg: Unused operand, included for opcode interface consistency.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -481,14 +1290,14 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a > b else 0)
 
-    def op_le(self, args: List[str]) -> None:
+    def op_le(self, arg: Any) -> None:
         """
         Implements the 'less than or equal to' (<=) operation for the interpreter.
 
         Pops the top two values from the stack, compares them, and pushes 1 onto the stack if the first value is less than or equal to the second value, otherwise pushes 0.
 
         Args:
-            args: Unused argument, included for opcode interface consistency.
+            arg: Unused operand, included for opcode interface consistency.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -499,14 +1308,14 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a <= b else 0)
 
-    def op_ge(self, args: List[str]) -> None:
+    def op_ge(self, arg: Any) -> None:
         """
         Implements the 'greater than or equal to' (>=) operation for the interpreter.
 
         Pops the top two values from the stack, compares them, and pushes 1 onto the stack if the first value is greater than or equal to the second value, otherwise pushes 0.
 
         Args:
-            args: Unused argument, present for opcode interface compatibility.
+            arg: Unused operand, present for opcode interface compatibility.
 
         Stack Behavior:
             Before: [..., a, b]
@@ -517,31 +1326,50 @@ class BytecodeInterpreter:
             a = self.stack.pop()
             self.stack.append(1 if a >= b else 0)
 
-    def op_call(self, args: List[str]) -> None:
+    def op_call(self, arg: Any) -> None:
         """
         Handles the 'call' operation in the bytecode interpreter.
 
         This method saves the current program counter to the call stack and jumps to the target instruction.
-        The target can be either a label defined in the program or a direct instruction index.
-        If the target is not a valid label or integer, a RuntimeError is raised.
 
         Args:
-            args (list): A list where the first element is the call target (label name or instruction index).
+            arg (int): The call target, resolved to an instruction index by load_program.
 
         Raises:
-            RuntimeError: If the call target is neither a valid label nor an integer.
+            CallDepthExceeded: If max_call_depth calls are already active.
         """
-        target = args[0]
+        if len(self.call_stack) >= self._max_call_depth:
+            raise CallDepthExceeded(self.max_call_depth)
+        if self._memo_targets:
+            subroutine = self._memo_targets.get(arg)
+            if subroutine is not None and self._memo_lookup(subroutine):
+                return
         self.call_stack.append(self.program_counter + 1)
-        if target in self.labels:
-            self.program_counter = self.labels[target]
-        else:
-            try:
-                self.program_counter = int(target)
-            except ValueError:
-                raise RuntimeError(f"Invalid call target: {target}")
+        self.program_counter = arg
+
+    def _memo_lookup(self, subroutine: Any) -> bool:
+        """
+        Looks up a CALL of a pure subroutine with the values on top of the stack in self.memo.
+        On a hit replaces them with the remembered results and moves past the CALL; on a miss
+        records the call, so the RET that ends it remembers its results.
+
+        Returns:
+            bool: True on a hit, when the call must not be made.
+        """
+        stack = self.stack
+        base = len(stack) - subroutine.arguments
+        if base < 0:
+            return False
+        key = (subroutine.entry, tuple(stack[base:]))
+        results = self.memo.get(key)
+        if results is not None:
+            stack[base:] = results
+            self.program_counter += 1
+            return True
+        self._memo_frames.append((len(self.call_stack) + 1, key, base, subroutine.results))
+        return False
 
-    def op_ret(self, args: List[str]) -> None:
+    def op_ret(self, arg: Any) -> None:
         """
         Handles the 'ret' (return) operation in the bytecode interpreter.
 
@@ -550,79 +1378,1098 @@ class BytecodeInterpreter:
         flag to True, indicating that the program should stop execution.
 
         Args:
-            args: Arguments for the 'ret' operation (not used in this implementation).
+            arg: Unused operand, present for interface consistency.
         """
         if self.call_stack:
+            frames = self._memo_frames
+            if frames and frames[-1][0] == len(self.call_stack):
+                _, key, base, results = frames.pop()
+                if len(self.stack) - base == results:
+                    self.memo.put(key, tuple(self.stack[base:]))
             self.program_counter = self.call_stack.pop()
         else:
             self.halted = True
 
-    def op_print(self, args: List[str]) -> None:
+    def op_print(self, arg: Any) -> None:
         """
-        Prints the top value of the stack without removing it.
+        Prints the top value of the stack without removing it, to self.output.
 
         If the stack is not empty, prints the value at the top of the stack.
         If the stack is empty, prints 0.
 
         Args:
-            args: Arguments for the print operation (not used).
+            arg: Unused operand, present for interface consistency.
         """
         if self.stack:
             value = self.stack[-1]
             if value > 2147483647:
                 raise RuntimeError("OVERFLOW!")
-            print(value)
+            self.output.write(value)
         else:
-            print(0)
+            self.output.write(0)
 
-    def op_read(self, args: List[str]) -> None:
+    def op_read(self, arg: Any) -> None:
         """
-        Reads an integer value from standard input and pushes it onto the stack.
+        Reads an integer value from self.inputs (standard input by default) and pushes it onto the stack.
 
-        If the input is not a valid integer or if an EOFError occurs, pushes 0 onto the stack instead.
+        If the input is not a valid integer or there is no more input, pushes 0 onto the stack instead.
 
         Args:
-            args: Unused argument, present for interface compatibility.
+            arg: Unused operand, present for interface compatibility.
         """
+        self.stack.append(self.read_input())
+
+    def op_native(self, arg: Intrinsic) -> None:
+        """
+        Calls an intrinsic: pops the values it takes, the deepest one being its first argument,
+        and pushes its results.
+
+        Args:
+            arg (Intrinsic): The intrinsic, resolved by load_program.
+
+        Raises:
+            RuntimeError: If the stack holds fewer values than the intrinsic takes, or if the
+                intrinsic fails (see Intrinsic.apply).
+        """
+        stack = self.stack
+        count = arg.arguments
+        if len(stack) < count:
+            raise RuntimeError("Stack Underflow.")
+        if count:
+            args = stack[-count:]
+            del stack[-count:]
+        else:
+            args = []
+        stack.extend(arg.apply(args))
+
+    def _pop_operands(self, count: int) -> List[int]:
+        """Pops count values, the deepest one first, or raises a stack underflow."""
+        stack = self.stack
+        if len(stack) < count:
+            raise RuntimeError("Stack Underflow.")
+        values = stack[-count:]
+        del stack[-count:]
+        return values
+
+    def op_newarray(self, arg: Any) -> None:
+        """
+        Allocates an array of zeros on the heap.
+
+        Before: [..., size]
+        After:  [..., handle]
+
+        Raises:
+            RuntimeError: If the stack is empty or size is negative.
+            HeapLimitExceeded: If the array would take the heap past max_heap_size elements; the
+                size stays on the stack.
+        """
+        (size,) = self._pop_operands(1)
+        try:
+            handle = self.array_new(size)
+        except HeapLimitExceeded:
+            self.stack.append(size)
+            raise
+        self.stack.append(handle)
+
+    def op_aload(self, arg: Any) -> None:
+        """
+        Pushes an element of an array.
+
+        Before: [..., handle, index]
+        After:  [..., array[index]]
+
+        Raises:
+            RuntimeError: If the stack holds fewer than 2 values, or handle or index is invalid.
+        """
+        handle, index = self._pop_operands(2)
+        self.stack.append(self.array_load(handle, index))
+
+    def op_astore(self, arg: Any) -> None:
+        """
+        Stores a value in an array.
+
+        Before: [..., handle, index, value]
+        After:  [...]
+
+        Raises:
+            RuntimeError: If the stack holds fewer than 3 values, handle or index is invalid, or
+                value does not fit in 64 bits.
+        """
+        self.array_store(*self._pop_operands(3))
+
+    def op_alen(self, arg: Any) -> None:
+        """
+        Pushes the length of an array.
+
+        Before: [..., handle]
+        After:  [..., len(array)]
+
+        Raises:
+            RuntimeError: If the stack is empty or handle is invalid.
+        """
+        (handle,) = self._pop_operands(1)
+        self.stack.append(self.array_length(handle))
+
+    def op_afill(self, arg: Any) -> None:
+        """
+        Sets count elements of an array, from index start on, to value.
+
+        Before: [..., handle, start, count, value]
+        After:  [...]
+
+        Raises:
+            RuntimeError: If the stack holds fewer than 4 values, handle is invalid, the range is
+                not inside the array, or value does not fit in 64 bits.
+        """
+        self.array_fill(*self._pop_operands(4))
+
+    def op_acopy(self, arg: Any) -> None:
+        """
+        Copies count elements from one array to another (or the same one; the ranges may overlap).
+
+        Before: [..., source, source_start, target, target_start, count]
+        After:  [...]
+
+        Raises:
+            RuntimeError: If the stack holds fewer than 5 values, a handle is invalid, or a range
+                is not inside its array.
+        """
+        self.array_copy(*self._pop_operands(5))
+
+    def _array(self, handle: int) -> array:
+        """Returns the array with the given handle, or raises a runtime error."""
+        if not 0 <= handle < len(self.heap):
+            raise RuntimeError(f"Invalid array handle: {handle}")
+        return self.heap[handle]
+
+    @staticmethod
+    def _check_range(values: array, start: int, count: int) -> None:
+        if count < 0 or start < 0 or start + count > len(values):
+            raise RuntimeError(f"Array range out of bounds: {count} elements from {start} (length {len(values)})")
+
+    def array_new(self, size: int) -> int:
+        """
+        Allocates an array of size zeros on the heap and returns its handle, the number of arrays
+        allocated before it. The operations of the array opcodes are methods like this one, which
+        the compiled and register engines call on values they hold in locals or registers.
+        """
+        if size < 0:
+            raise RuntimeError(f"Invalid array size: {size}")
+        if self.max_heap_size is not None and size > 0 and self._heap_used + size > self.max_heap_size:
+            raise HeapLimitExceeded(self.max_heap_size)
         try:
-            value = int(input())
+            self.heap.append(array("q", [0]) * size)
+        except (MemoryError, OverflowError):
+            raise RuntimeError(f"Out of memory for an array of {size} elements") from None
+        self._heap_used += size
+        return len(self.heap) - 1
+
+    def array_load(self, handle: int, index: int) -> int:
+        """Returns the element at index of the array handle."""
+        values = self._array(handle)
+        if not 0 <= index < len(values):
+            raise RuntimeError(f"Array index out of range: {index} (length {len(values)})")
+        return values[index]
+
+    def array_store(self, handle: int, index: int, value: int) -> None:
+        """Sets the element at index of the array handle to value."""
+        values = self._array(handle)
+        if not 0 <= index < len(values):
+            raise RuntimeError(f"Array index out of range: {index} (length {len(values)})")
+        try:
+            values[index] = value
+        except OverflowError:
+            raise RuntimeError(f"Array value out of range: {value}") from None
+
+    def array_length(self, handle: int) -> int:
+        """Returns the length of the array handle."""
+        return len(self._array(handle))
+
+    def array_fill(self, handle: int, start: int, count: int, value: int) -> None:
+        """Sets count elements of the array handle, from index start on, to value."""
+        values = self._array(handle)
+        self._check_range(values, start, count)
+        try:
+            values[start : start + count] = array("q", [value]) * count
+        except OverflowError:
+            raise RuntimeError(f"Array value out of range: {value}") from None
+
+    def array_copy(self, source: int, source_start: int, target: int, target_start: int, count: int) -> None:
+        """Copies count elements of the array source, from source_start on, to target from target_start on."""
+        source_values = self._array(source)
+        target_values = self._array(target)
+        self._check_range(source_values, source_start, count)
+        self._check_range(target_values, target_start, count)
+        target_values[target_start : target_start + count] = source_values[source_start : source_start + count]
+
+    def read_input(self) -> int:
+        """
+        Returns the next value of self.inputs, flushing the output first if the source is
+        interactive. Used by READ in every engine.
+        """
+        inputs = self.inputs
+        if inputs.interactive:
+            self.output.flush()
+        return inputs.read()
+
+    def op_nop(self, arg: Any) -> None:
+        """
+        Does nothing. Stands in for LOAD and STORE lines written without a variable name.
+
+        Args:
+            arg: Unused operand, present for interface consistency.
+        """
+
+    def op_invalid(self, arg: Any) -> None:
+        """
+        Reports an instruction that could not be decoded by load_program.
+
+        Args:
+            arg (str): The error message recorded when the line was decoded.
+
+        Raises:
+            RuntimeError: Always, with the recorded message.
+        """
+        raise RuntimeError(arg)
+
+    def op_push_binary(self, arg: Any) -> None:
+        """
+        Superinstruction for PUSH value followed by a binary opcode.
+
+        Args:
+            arg (tuple): The pushed value and the FUSABLE_BINARY_OPS function of the opcode.
+        """
+        value, function = arg
+        if self.stack:
+            self.stack[-1] = function(self.stack[-1], value)
+        else:
             self.stack.append(value)
-        except (ValueError, EOFError):
-            self.stack.append(0)
+        self.program_counter += 2
+
+    def op_load_jz(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name followed by JZ target.
+
+        Args:
+            arg (tuple): The variable's slot and the jump target.
+
+        Raises:
+            RuntimeError: If the variable is not defined, like LOAD.
+        """
+        slot, target = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        if current == 0:
+            self.program_counter = target
+        else:
+            self.program_counter += 2
+
+    def op_load_jnz(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name followed by JNZ target.
+
+        Args:
+            arg (tuple): The variable's slot and the jump target.
+
+        Raises:
+            RuntimeError: If the variable is not defined, like LOAD.
+        """
+        slot, target = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        if current != 0:
+            self.program_counter = target
+        else:
+            self.program_counter += 2
+
+    def op_load_push_binary(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name, PUSH value and a binary opcode.
+
+        Args:
+            arg (tuple): The variable's slot, the pushed value and the opcode's function.
+
+        Raises:
+            RuntimeError: If the variable is not defined, like LOAD.
+        """
+        slot, value, function = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        self.stack.append(function(current, value))
+        self.program_counter += 3
+
+    def op_load_push_binary_store(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name, PUSH value, a binary opcode and STORE, such as
+        the `LOAD n / PUSH 1 / SUB / STORE n` of a counting loop.
+
+        Args:
+            arg (tuple): The loaded variable's slot, the pushed value, the opcode's function
+                         and the stored variable's slot.
+
+        Raises:
+            RuntimeError: If the loaded variable is not defined, like LOAD.
+        """
+        slot, value, function, target = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        self.slots[target] = function(current, value)
+        self.program_counter += 4
+
+    def op_load_push_binary_jz(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name, PUSH value, a binary opcode and JZ target,
+        such as the `LOAD x / PUSH 0 / GT / JZ end` test of a loop.
+
+        Args:
+            arg (tuple): The variable's slot, the pushed value, the opcode's function and the jump target.
+
+        Raises:
+            RuntimeError: If the variable is not defined, like LOAD.
+        """
+        slot, value, function, target = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        if function(current, value) == 0:
+            self.program_counter = target
+        else:
+            self.program_counter += 4
+
+    def op_load_push_binary_jnz(self, arg: Any) -> None:
+        """
+        Superinstruction for LOAD name, PUSH value, a binary opcode and JNZ target.
+
+        Args:
+            arg (tuple): The variable's slot, the pushed value, the opcode's function and the jump target.
+
+        Raises:
+            RuntimeError: If the variable is not defined, like LOAD.
+        """
+        slot, value, function, target = arg
+        current = self.slots[slot]
+        if current is UNDEFINED:
+            raise RuntimeError(f"Undefined variable: {self.slot_names[slot]}")
+        if function(current, value) != 0:
+            self.program_counter = target
+        else:
+            self.program_counter += 4
 
-    def run(self) -> None:
+    def run(self, profile: Optional[Any] = None, metrics: Optional[RunMetrics] = None) -> None:
         """
-        Executes the loaded bytecode instructions sequentially.
-        Initializes the program counter and halted flag, then iterates through the instruction list.
-        For each instruction, it parses and executes the opcode and its arguments.
+        Executes the loaded bytecode instructions sequentially with the selected engine.
+        Initializes the program counter and halted flag, then iterates through the decoded instruction stream.
         Handles runtime errors by printing an error message with the current line number and halts execution.
-        Skips empty instructions by advancing the program counter.
-        Raises a RuntimeError if execution takes more than 2 seconds (infinite loop protection).
+
+        A program that passed stack verification runs without checking the stack length before
+        each instruction, unless the call stack is not empty when the run starts.
+
+        The instruction and time limits are checked at checkpoints, the backward jumps and
+        returns every loop or recursion has to go through: once the instruction budget is
+        spent, and every time_check_interval instructions for the wall-clock deadline. All
+        engines check at the same points, so they stop at the same instruction.
+
+        Args:
+            profile (Optional[Profile]): A bytecode_profiler.Profile to record execution counts,
+                sampled times and the call graph in.
+            metrics (Optional[RunMetrics]): RunMetrics to fill in with the resource use of the run.
+            With a profile, metrics or int_width the program runs in an instrumented loop instead of
+            the engine, so the run is slower than without.
+        Raises:
+            InstructionLimitExceeded: If more than max_instructions instructions are executed.
+            TimeLimitExceeded: If execution takes more than time_limit seconds (infinite loop protection).
+            CallDepthExceeded: If a CALL would nest more than max_call_depth calls.
+            StackLimitExceeded: If an instruction leaves more than max_stack_size values on the stack.
+            IntegerSizeExceeded, OutputLimitExceeded, HeapLimitExceeded: If an instruction exceeds
+                max_int_bits, max_output_bytes or max_heap_size.
+
+        Each quota is enforced where it can be exceeded, so the engines keep running at full
+        speed: the stack size by the instructions that push values, the integer size by the
+        arithmetic instructions, READ and NATIVE (with either the engines run without
+        superinstructions), the output by the sink (see OutputSink.set_quota) and the heap by
+        NEWARRAY. The stack size is not checked at all when stack verification has proven the
+        program never holds more than max_stack_size values.
+
+        With memoize set and pure subroutines in the program, the threaded, compiled, tiered and
+        register engines run it in the dispatch loop, which looks calls up in self.memo.
+        """
+        self.reset()
+        try:
+            if profile is not None or metrics is not None or self._instrumented:
+                if profile is not None:
+                    profile.bind(self)
+                self._run_instrumented(profile, metrics)
+            elif self._memo_targets:
+                self._run_dispatch()
+            elif self.engine == "threaded":
+                self._run_threaded()
+            elif self.engine == "compiled":
+                self._run_compiled()
+            elif self.engine == "tiered":
+                self._run_tiered()
+            elif self.engine == "register":
+                self._run_register()
+            else:
+                self._run_dispatch()
+        finally:
+            self.output.flush()
+
+    def reset(self) -> None:
+        """
+        Prepares a new run of the loaded program from its first instruction: resets the
+        program counter, halted flag, error and instruction count and starts the time limit.
+        The stack, variables and call stack are kept. run() and load_program call this; call
+        it before step, run_for or events to run the program again.
         """
         self.program_counter = 0
         self.halted = False
-        start_time = time.time()
+        self.error = None
+        self.instructions_executed = 0
+        self._deadline = time.time() + self.time_limit if self.time_limit is not None else float("inf")
+        self._max_call_depth = self.max_call_depth if self.max_call_depth is not None else sys.maxsize
+        self._max_stack_size = self.max_stack_size if self.max_stack_size is not None else sys.maxsize
+        self._quotas = self.max_stack_size is not None or self.max_int_bits is not None
+        self.output.set_quota(self.max_output_bytes, OutputLimitExceeded)
+        self._heap_used = sum(len(values) for values in self.heap)
+        self._instrumented = self.int_width is not None
+        # A verified program relies on every RET returning to a call made by the program, which
+        # a call stack left over from an earlier run breaks.
+        checked = not self._verified or bool(self.call_stack)
+        self._stack_limit = self.max_stack_size
+        if self.max_stack_size is not None and not checked:
+            max_depth = self.stack_analysis.max_depth
+            if max_depth is not None and len(self.stack) + max_depth <= self.max_stack_size:
+                self._stack_limit = None
+        if self.max_int_bits is None and self._stack_limit is None:
+            self._run_code = self.fused_code
+            self._run_widths = self._widths
+        else:
+            # A superinstruction would hide the results max_int_bits checks and the values
+            # max_stack_size counts.
+            self._run_code = self.code
+            self._run_widths = [1] * len(self.code)
+        self._memo_frames = []
+        self._memo_targets = {}
+        if self.memoize and self.code:
+            if self.pure_subroutines is None:
+                from bytecode_verifier import find_pure_subroutines
+
+                self.pure_subroutines = find_pure_subroutines(self.code, self.stack_analysis)
+            # Results computed with another integer mode may be wrong now.
+            settings = (self.int_width, self.overflow)
+            if settings != self._memo_settings:
+                self.memo.clear()
+                self._memo_settings = settings
+            self._memo_targets = self.pure_subroutines
+        if self.int_width is not None:
+            self._int_min = -(1 << (self.int_width - 1))
+            self._int_max = (1 << (self.int_width - 1)) - 1
+        self._next_check = self._following_check(0)
+        if (
+            checked != self._checked
+            or self.max_int_bits != self._engine_int_bits
+            or self._stack_limit != self._engine_stack_limit
+        ):
+            self._checked = checked
+            self._engine_int_bits = self.max_int_bits
+            self._engine_stack_limit = self._stack_limit
+            self._threaded_code = None
+            self._compiled = None
+            self._register_code = None
+            self._tiered_code = None
+
+    @property
+    def finished(self) -> bool:
+        """True once the program has halted, failed with a runtime error or run past its last instruction."""
+        return self.halted or self.error is not None or self.program_counter >= len(self.code)
+
+    def step(self, n: int = 1) -> int:
+        """
+        Executes the next n instructions (fewer if the program finishes first) and returns
+        with the interpreter state intact, so execution can be resumed by calling step,
+        run_for or events again. Superinstructions count as the instructions they stand for.
 
-        while not self.halted and self.program_counter < len(self.instructions):
-            if time.time() - start_time > 2:
-                raise RuntimeError(
-                    "Infinite loop detected: execution exceeded 2 seconds."
-                )
-            instruction = self.instructions[self.program_counter]
+        Args:
+            n (int): The number of instructions to execute.
+        Returns:
+            int: The number of instructions executed.
+        Raises:
+            InstructionLimitExceeded, CallDepthExceeded, and the quota errors: As for run(); time_limit is not applied,
+                since a paused program is not running.
+        """
+        return self.run_for(n)
+
+    def run_for(self, max_instructions: int) -> int:
+        """
+        Executes at most max_instructions instructions from the current program counter, e.g. one
+        time slice of a program that shares a worker with others. See step.
 
-            if instruction:
-                opcode, args = self.parse_instruction(instruction)
-                if opcode:
+        Args:
+            max_instructions (int): The number of instructions the slice may execute.
+        Returns:
+            int: The number of instructions executed; fewer than max_instructions only if the
+                 program finished.
+        """
+        start = self.instructions_executed
+        try:
+            self._advance(start + max_instructions, False)
+        finally:
+            self.output.flush()
+        return self.instructions_executed - start
+
+    def events(self) -> Generator[Event, Optional[Any], None]:
+        """
+        Runs the program from the current state as a generator that hands its input and output
+        to the caller instead of using stdin and stdout. It yields:
+        - ("print", value) for each PRINT, instead of printing value;
+        - ("read", None) for each READ; the value sent back with generator.send() is pushed
+          (converted like input, 0 if it is not an integer), or self.inputs is read if None is sent;
+        - ("halt", None) when the program halts;
+        - ("error", message) when a runtime error stops it; the message is not printed.
+        The generator ends when the program finishes. Execution can be paused between events and
+        continued with step or run_for.
+
+        Raises:
+            InstructionLimitExceeded, CallDepthExceeded, and the quota errors: As for step.
+        """
+        if self.finished:
+            return
+        while True:
+            self._advance(sys.maxsize, True)
+            if self.error is not None:
+                yield ("error", self.error)
+                return
+            if self.halted:
+                yield ("halt", None)
+                return
+            if self.program_counter >= len(self.code):
+                return
+            pc = self.program_counter
+            opcode = self.code[pc][0]
+            if opcode == OP_PRINT:
+                self.instructions_executed += 1
+                value = self.stack[-1] if self.stack else 0
+                if value > 2147483647:
+                    self.error = f"Runtime error at line {self.line_numbers[pc]}: OVERFLOW!"
+                    continue
+                self.output.charge(len(str(value)) + 1)
+                self.program_counter += 1
+                yield ("print", value)
+            else:
+                sent = yield ("read", None)
+                if sent is None:
+                    self.op_read(None)
+                else:
+                    try:
+                        self.stack.append(int(sent))
+                    except (TypeError, ValueError):
+                        self.stack.append(0)
+                self.instructions_executed += 1
+                if self.int_width is not None and not self._int_min <= self.stack[-1] <= self._int_max:
                     try:
-                        self.execute_instruction(opcode, args)
-                    except Exception as e:
-                        print(
-                            f"Runtime error at line {self.program_counter + 1}: {e}",
-                            file=sys.stderr,
-                        )
-                        break
+                        self._fit_top()
+                    except RuntimeError as e:
+                        self.error = f"Runtime error at line {self.line_numbers[pc]}: {e}"
+                        continue
+                if len(self.stack) > self._max_stack_size:
+                    raise StackLimitExceeded(self.max_stack_size)
+                if self.max_int_bits is not None and self.stack[-1].bit_length() > self.max_int_bits:
+                    raise IntegerSizeExceeded(self.max_int_bits)
+                self.program_counter += 1
+
+    def _advance(self, stop_at: int, pause_at_io: bool) -> None:
+        """
+        The resumable run loop behind step, run_for and events: executes instructions from the
+        program counter with the checked handlers until instructions_executed reaches stop_at or
+        the program finishes. A superinstruction that would go past stop_at is executed as its
+        first instruction only. With pause_at_io, stops before a PRINT or READ and records
+        runtime errors in self.error without printing them. With max_stack_size, max_int_bits or
+        int_width, runs the unfused instructions and checks the stack and the integer range after
+        each one.
+        """
+        quotas = self._quotas
+        instrumented = quotas or self._instrumented
+        fixed_width = self.int_width is not None
+        int_min = self._int_min
+        int_max = self._int_max
+        code = self.code if instrumented else self.fused_code
+        unfused = self.code
+        widths = self._widths
+        handlers = self._handlers
+        limit = self.max_instructions
+        stack = self.stack
+        max_stack = self._max_stack_size
+        int_bits = self.max_int_bits is not None
+        executed = self.instructions_executed
+        try:
+            while executed < stop_at and not self.halted and self.error is None and self.program_counter < len(code):
+                pc = self.program_counter
+                opcode, arg = code[pc]
+                width = 1 if instrumented else widths[pc]
+                if executed + width > stop_at:
+                    opcode, arg = unfused[pc]
+                    width = 1
+                if pause_at_io and (opcode == OP_PRINT or opcode == OP_READ):
+                    break
+                executed += width
+                try:
+                    handlers[opcode](arg)
+                    if opcode == OP_NATIVE and arg.results > 1:
+                        self._fit_results(arg.results)
+                    if fixed_width and stack and not int_min <= stack[-1] <= int_max:
+                        self._fit_top()
+                    if int_bits and opcode in INT_RESULT_OPS:
+                        self._check_int_bits(arg.results if opcode == OP_NATIVE else 1)
+                except ExecutionLimitExceeded:
+                    raise
+                except Exception as e:
+                    executed -= width - 1
+                    if pause_at_io:
+                        self.error = f"Runtime error at line {self.line_numbers[pc]}: {e}"
+                    else:
+                        self._report_error(pc, e)
+                    break
+                if quotas and opcode in STACK_GROWTH_OPS and len(stack) > max_stack:
+                    self._stack_limit_exceeded(pc)
+                if opcode in CONTROL_FLOW_OPS:
+                    # The same checkpoints as run(), see _checkpoint.
+                    if (
+                        limit is not None
+                        and executed > limit
+                        and self.program_counter < pc + width
+                        and not self.halted
+                    ):
+                        raise InstructionLimitExceeded(limit)
+                else:
+                    self.program_counter += 1
+        finally:
+            self.instructions_executed = executed
+
+    def _fit_top(self) -> None:
+        """
+        Brings the value on top of the stack, which is outside the int_width-bit range, back into
+        it by wrapping around, or raises the overflow.
+
+        Raises:
+            RuntimeError: If overflow is "trap".
+        """
+        value = self.stack[-1]
+        if self.overflow == "trap":
+            raise RuntimeError(f"Integer overflow: {value} does not fit in {self.int_width} bits")
+        self.stack[-1] = (value - self._int_min) % (1 << self.int_width) + self._int_min
+
+    def _fit_results(self, count: int) -> int:
+        """
+        Applies the fixed-width mode and the max_int_bits quota to the values below the top of the
+        stack that a NATIVE with count results pushed; the run loops check the top one.
+
+        Returns:
+            int: The largest bit length among those values.
+        Raises:
+            RuntimeError: If one does not fit in int_width bits and overflow is "trap".
+            IntegerSizeExceeded: If one is longer than max_int_bits.
+        """
+        stack = self.stack
+        bits = 0
+        for index in range(len(stack) - count, len(stack) - 1):
+            value = stack[index]
+            if self.int_width is not None and not self._int_min <= value <= self._int_max:
+                if self.overflow == "trap":
+                    raise RuntimeError(f"Integer overflow: {value} does not fit in {self.int_width} bits")
+                value = stack[index] = (value - self._int_min) % (1 << self.int_width) + self._int_min
+            bits = max(bits, value.bit_length())
+        if self.max_int_bits is not None and bits > self.max_int_bits:
+            self._int_bits_exceeded(self.program_counter)
+        return bits
+
+    def _check_int_bits(self, count: int) -> None:
+        """
+        Checks the top count values of the stack, which an instruction has just pushed, against
+        max_int_bits; used by the engines after the instructions that compute new values.
+
+        Raises:
+            IntegerSizeExceeded: If one is longer than max_int_bits.
+        """
+        stack = self.stack
+        for index in range(max(len(stack) - count, 0), len(stack)):
+            if stack[index].bit_length() > self.max_int_bits:
+                raise IntegerSizeExceeded(self.max_int_bits)
+
+    def _int_bits_exceeded(self, pc: int) -> None:
+        """Raises IntegerSizeExceeded for the instruction at pc; used by compiled code."""
+        self.program_counter = pc
+        raise IntegerSizeExceeded(self.max_int_bits)
+
+    def _stack_limit_exceeded(self, pc: int) -> None:
+        """Raises StackLimitExceeded for the instruction at pc; used by the run loops and compiled code."""
+        self.program_counter = pc
+        raise StackLimitExceeded(self.max_stack_size)
+
+    def _report_error(self, pc: int, error: Exception) -> None:
+        """Records the runtime error that stopped the program at pc in self.error and prints it to self.errors."""
+        self.error = f"Runtime error at line {self.line_numbers[pc]}: {error}"
+        self.output.flush()
+        print(self.error, file=self.errors if self.errors is not None else sys.stderr)
+
+    def _following_check(self, executed: int) -> int:
+        """Returns the instruction count at which the next checkpoint has to check the limits."""
+        following = executed + self.time_check_interval
+        if self.max_instructions is not None:
+            following = min(following, self.max_instructions + 1)
+        return following
+
+    def _checkpoint(self, executed: int, pc: int) -> int:
+        """
+        Checks the instruction and time limits at a checkpoint that has reached the
+        instruction count of the next check; pc is the instruction execution continues at.
+
+        Returns:
+            int: The instruction count of the following check.
+        Raises:
+            InstructionLimitExceeded, TimeLimitExceeded: If a limit is exceeded.
+        """
+        self.program_counter = pc
+        self.instructions_executed = executed
+        if self.max_instructions is not None and executed > self.max_instructions:
+            raise InstructionLimitExceeded(self.max_instructions)
+        if time.time() > self._deadline:
+            raise TimeLimitExceeded(self.time_limit)
+        return self._following_check(executed)
+
+    def _run_dispatch(self) -> None:
+        """
+        Runs the program by dispatching each decoded instruction to its handler method by opcode number.
+        """
+        code = self._run_code
+        widths = self._run_widths
+        handlers = self._handlers if self._checked else self._unchecked_handlers
+        if self.max_int_bits is not None:
+            handlers = build_int_bits_handlers(self, handlers)
+        if self._stack_limit is not None:
+            handlers = build_stack_limit_handlers(self, handlers)
+        executed = 0
+        next_check = self._next_check
+
+        while not self.halted and self.program_counter < len(code):
+            pc = self.program_counter
+            opcode, arg = code[pc]
+            width = widths[pc]
+            executed += width
+            try:
+                handlers[opcode](arg)
+            except ExecutionLimitExceeded:
+                self.instructions_executed = executed
+                raise
+            except Exception as e:
+                # A superinstruction can only fail in its first instruction.
+                executed -= width - 1
+                self._report_error(pc, e)
+                break
+            if opcode in CONTROL_FLOW_OPS:
+                # RET without a caller halts and leaves the program counter in place.
+                if self.program_counter < pc + width and executed >= next_check and not self.halted:
+                    next_check = self._checkpoint(executed, self.program_counter)
             else:
                 self.program_counter += 1
+        self.instructions_executed = executed
+
+    def _run_instrumented(self, profile: Optional[Any], metrics: Optional[RunMetrics]) -> None:
+        """
+        The instrumented loop behind run(profile=..., metrics=...): runs the unfused instructions
+        with the checked handlers, like the dispatch engine.
+
+        With a profile it counts the executions of every instruction in profile.counts, times a
+        random sample of them in profile.times and profile.samples, and reports each CALL that is
+        made and each RET that returns to profile.enter and profile.leave, which attribute the
+        instructions in between to the active call stack.
+
+        With metrics it measures the run, and with metrics or int_width it checks the stack after
+        every instruction: every value is on top of the stack right after the instruction that
+        produced it, so checking the top value finds the largest one, and wrapping it around (see
+        _fit_top) gives every arithmetic instruction fixed-width semantics.
+        """
+        code = self.code
+        handlers = self._handlers
+        stack = self.stack
+        call_stack = self.call_stack
+        int_bits = self.max_int_bits is not None
+        stack_limited = self._stack_limit is not None
+        max_stack = self._max_stack_size
+        fixed_width = self.int_width is not None
+        int_min = self._int_min
+        int_max = self._int_max
+        profiled = profile is not None
+        if profiled:
+            counts = profile.counts
+            times = profile.times
+            samples = profile.samples
+            next_gap = profile.next_gap
+            countdown = next_gap()
+        metered = metrics is not None
+        if metered:
+            peak_stack = len(stack)
+            peak_calls = len(call_stack)
+            max_bits = max(
+                [value.bit_length() for value in stack]
+                + [value.bit_length() for value in self.slots if value is not UNDEFINED],
+                default=0,
+            )
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+        clock = time.perf_counter
+        memoized = bool(self._memo_targets)
+        calls = len(call_stack)
+        executed = 0
+        next_check = self._next_check
+
+        try:
+            while not self.halted and self.program_counter < len(code):
+                pc = self.program_counter
+                opcode, arg = code[pc]
+                executed += 1
+                try:
+                    if memoized and opcode == OP_CALL:
+                        calls = len(call_stack)
+                    if not profiled:
+                        handlers[opcode](arg)
+                    else:
+                        counts[pc] += 1
+                        countdown -= 1
+                        if countdown:
+                            handlers[opcode](arg)
+                        else:
+                            start = clock()
+                            handlers[opcode](arg)
+                            times[pc] += clock() - start
+                            samples[pc] += 1
+                            countdown = next_gap()
+                    if opcode == OP_NATIVE and arg.results > 1:
+                        bits = self._fit_results(arg.results)
+                        if metered and bits > max_bits:
+                            max_bits = bits
+                    if fixed_width and stack and not int_min <= stack[-1] <= int_max:
+                        self._fit_top()
+                    if int_bits and opcode in INT_RESULT_OPS:
+                        self._check_int_bits(arg.results if opcode == OP_NATIVE else 1)
+                    if stack_limited and opcode in STACK_GROWTH_OPS and len(stack) > max_stack:
+                        self._stack_limit_exceeded(pc)
+                except ExecutionLimitExceeded:
+                    raise
+                except Exception as e:
+                    self._report_error(pc, e)
+                    break
+                if metered and stack:
+                    if len(stack) > peak_stack:
+                        peak_stack = len(stack)
+                    bits = stack[-1].bit_length()
+                    if bits > max_bits:
+                        max_bits = bits
+                if opcode in CONTROL_FLOW_OPS:
+                    if opcode == OP_CALL:
+                        if metered and len(call_stack) > peak_calls:
+                            peak_calls = len(call_stack)
+                        # A memoized call that was looked up instead of made is not entered.
+                        if profiled and not (memoized and len(call_stack) == calls):
+                            profile.enter(executed, self.program_counter)
+                    elif opcode == OP_RET and profiled and not self.halted:
+                        profile.leave(executed)
+                    if self.program_counter <= pc and executed >= next_check and not self.halted:
+                        next_check = self._checkpoint(executed, self.program_counter)
+                else:
+                    self.program_counter += 1
+        finally:
+            self.instructions_executed = executed
+            if profiled:
+                profile.finish(executed)
+            if metered:
+                metrics.instructions_executed = executed
+                metrics.wall_time = time.perf_counter() - started
+                metrics.cpu_time = time.process_time() - cpu_started
+                metrics.peak_stack_depth = peak_stack
+                metrics.peak_call_depth = peak_calls
+                metrics.live_variables = sum(1 for value in self.slots if value is not UNDEFINED)
+                metrics.max_int_bits = max_bits
+                metrics.heap_size = sum(len(values) for values in self.heap)
+
+    def _run_threaded(self) -> None:
+        """
+        Runs the program as a chain of pre-built closures: each one executes its instruction
+        and returns the next program counter, so the loop body is a single call.
+        """
+        if self._threaded_code is None:
+            self._threaded_code = build_threaded_code(
+                self._run_code, self._checked, self.max_int_bits, self._stack_limit
+            )
+        code = self._threaded_code
+        widths = self._run_widths
+        end = len(code)
+        pc = 0
+        executed = 0
+        next_check = self._next_check
+
+        while pc < end:
+            width = widths[pc]
+            executed += width
+            try:
+                next_pc = code[pc](self)
+            except ExecutionLimitExceeded:
+                self.program_counter = pc
+                self.instructions_executed = executed
+                raise
+            except Exception as e:
+                executed -= width - 1
+                self._report_error(pc, e)
+                break
+            if next_pc < pc + width and executed >= next_check:
+                next_check = self._checkpoint(executed, next_pc)
+            pc = next_pc
+        if pc != HALT_PC:
+            self.program_counter = pc
+        self.instructions_executed = executed
+
+    def _run_compiled(self) -> None:
+        """
+        Runs the program as a single Python function generated by bytecode_compiler,
+        translating it on first use.
+        """
+        from bytecode_compiler import ProgramFault, compile_program
+
+        if self._compiled is None:
+            self._compiled = compile_program(
+                self.code,
+                self.slot_names,
+                stack_checks=self._checked,
+                max_int_bits=self.max_int_bits,
+                max_stack_size=self._stack_limit,
+            )
+        try:
+            self.program_counter, self.halted = self._compiled.function(self)
+        except ProgramFault as e:
+            self.program_counter = e.pc
+            self._report_error(e.pc, e)
+
+    def _run_register(self) -> None:
+        """
+        Runs the program translated by bytecode_register into three-address register
+        instructions, translating it on first use.
+        """
+        from bytecode_compiler import ProgramFault
+        from bytecode_register import translate_program
+
+        if self._register_code is None:
+            self._register_code = translate_program(
+                self.code,
+                self.slot_names,
+                stack_checks=self._checked,
+                max_int_bits=self.max_int_bits,
+                max_stack_size=self._stack_limit,
+            )
+        try:
+            self.program_counter, self.halted = self._register_code.run(self)
+        except ProgramFault as e:
+            self.program_counter = e.pc
+            self._report_error(e.pc, e)
+
+    def _call_depth_exceeded(self, pc: int) -> None:
+        """Raises CallDepthExceeded for the CALL at pc; used by compiled code."""
+        self.program_counter = pc
+        raise CallDepthExceeded(self.max_call_depth)
+
+    def _run_tiered(self) -> None:
+        """
+        Runs the program as threaded code while counting backward jumps per target. When a
+        target has been jumped back to hot_loop_threshold times, the instructions from it up
+        to the jump (and the subroutines they call) are compiled by bytecode_compiler, and
+        from then on reaching the target runs the compiled loop, so later iterations run at
+        compiled speed. Code that never loops stays interpreted and pays no compilation cost.
+        """
+        from bytecode_compiler import ProgramFault
+
+        if self._tiered_code is None:
+            self._tiered_code = build_threaded_code(
+                self._run_code, self._checked, self.max_int_bits, self._stack_limit
+            )
+            self._traces = [None] * len(self.code)
+            self._loop_counts = [0] * (len(self.code) + 1)
+            self._trace_regions = {}
+        code = self._tiered_code
+        traces = self._traces
+        widths = self._run_widths
+        counts = self._loop_counts
+        threshold = self.hot_loop_threshold
+        end = len(code)
+        pc = 0
+        executed = 0
+        next_check = self._next_check
+
+        while pc < end:
+            trace = traces[pc]
+            if trace is not None:
+                # Compiled code keeps its counters on the interpreter and checks the limits itself.
+                self.traces_entered += 1
+                self.instructions_executed = executed
+                self._next_check = next_check
+                try:
+                    next_pc, halted = trace(self)
+                except ProgramFault as e:
+                    pc = e.pc
+                    executed = self.instructions_executed
+                    self._report_error(pc, e)
+                    break
+                executed = self.instructions_executed
+                next_check = self._next_check
+                if halted:
+                    self.halted = True
+                    self.program_counter = next_pc
+                    pc = HALT_PC
+                    break
+                width = 1
+            else:
+                width = widths[pc]
+                executed += width
+                try:
+                    next_pc = code[pc](self)
+                except ExecutionLimitExceeded:
+                    self.program_counter = pc
+                    self.instructions_executed = executed
+                    raise
+                except Exception as e:
+                    executed -= width - 1
+                    self._report_error(pc, e)
+                    break
+                if next_pc < pc + width and executed >= next_check:
+                    next_check = self._checkpoint(executed, next_pc)
+            if next_pc < pc + width:
+                counts[next_pc] += 1
+                if counts[next_pc] == threshold:
+                    self._compile_trace(next_pc, pc)
+            pc = next_pc
+        if pc != HALT_PC:
+            self.program_counter = pc
+        self.instructions_executed = executed
+
+    def _compile_trace(self, header: int, back_edge: int) -> None:
+        """
+        Compiles the loop from header to back_edge, with the subroutines it calls, and makes
+        the tiered engine enter it whenever control reaches the header.
+
+        If back_edge is itself the entry of a compiled loop, the real backward jump happened
+        inside that compiled code, so its instructions become part of the new loop.
+        """
+        from bytecode_compiler import compile_program, loop_region
+
+        region = loop_region(self.code, header, back_edge)
+        region |= self._trace_regions.get(back_edge, set())
+        trace = compile_program(
+            self.code, self.slot_names, header, region, self._checked, self.max_int_bits, self._stack_limit
+        )
+        self._trace_regions[header] = region
+        self._traces[header] = trace.function
+        self.traces_compiled += 1
 
     def debug_state(self) -> None:
         """
@@ -638,6 +2485,800 @@ class BytecodeInterpreter:
         print("---")
 
 
+def build_unchecked_handlers(vm: BytecodeInterpreter) -> List[Callable[[Any], None]]:
+    """
+    Builds the dispatch table the dispatch engine uses for a program that passed stack
+    verification: the handlers of instructions that consume stack values are replaced by
+    versions that do not check the stack length first.
+
+    Args:
+        vm (BytecodeInterpreter): The interpreter the handlers operate on.
+    Returns:
+        List[Callable[[Any], None]]: The handlers, indexed by opcode number.
+    """
+    handlers = list(vm._handlers)
+
+    def pop(arg: Any) -> None:
+        vm.stack.pop()
+
+    def dup(arg: Any) -> None:
+        stack = vm.stack
+        stack.append(stack[-1])
+
+    def neg(arg: Any) -> None:
+        stack = vm.stack
+        stack[-1] = -stack[-1]
+
+    def store(arg: Any) -> None:
+        vm.slots[arg] = vm.stack.pop()
+
+    def jz(arg: Any) -> None:
+        if vm.stack.pop() == 0:
+            vm.program_counter = arg
+        else:
+            vm.program_counter += 1
+
+    def jnz(arg: Any) -> None:
+        if vm.stack.pop() != 0:
+            vm.program_counter = arg
+        else:
+            vm.program_counter += 1
+
+    def print_(arg: Any) -> None:
+        value = vm.stack[-1]
+        if value > 2147483647:
+            raise RuntimeError("OVERFLOW!")
+        vm.output.write(value)
+
+    def push_binary(arg: Any) -> None:
+        value, function = arg
+        stack = vm.stack
+        stack[-1] = function(stack[-1], value)
+        vm.program_counter += 2
+
+    def binary(function: Callable[[int, int], int], error: Optional[str]) -> Callable[[Any], None]:
+        if error is not None:
+
+            def handler(arg: Any) -> None:
+                stack = vm.stack
+                b = stack.pop()
+                if b == 0:
+                    stack.pop()
+                    raise RuntimeError(error)
+                stack[-1] = function(stack[-1], b)
+
+        else:
+
+            def handler(arg: Any) -> None:
+                stack = vm.stack
+                b = stack.pop()
+                stack[-1] = function(stack[-1], b)
+
+        return handler
+
+    handlers[OP_POP] = pop
+    handlers[OP_DUP] = dup
+    handlers[OP_NEG] = neg
+    handlers[OP_STORE] = store
+    handlers[OP_JZ] = jz
+    handlers[OP_JNZ] = jnz
+    handlers[OP_PRINT] = print_
+    handlers[OP_PUSH_BINARY] = push_binary
+    for op, function in FUSABLE_BINARY_OPS.items():
+        handlers[op] = binary(function, _ZERO_DIVISION_ERRORS.get(op))
+    return handlers
+
+
+def build_int_bits_handlers(
+    vm: BytecodeInterpreter, handlers: List[Callable[[Any], None]]
+) -> List[Callable[[Any], None]]:
+    """
+    Builds the dispatch table of a run with max_int_bits: the handlers of INT_RESULT_OPS are
+    replaced by versions that check the values they push. Only meant for the unfused
+    instructions, since superinstructions do not check their results.
+
+    Args:
+        vm (BytecodeInterpreter): The interpreter the handlers operate on.
+        handlers (List[Callable[[Any], None]]): The dispatch table to start from.
+    Returns:
+        List[Callable[[Any], None]]: The handlers, indexed by opcode number.
+    """
+    handlers = list(handlers)
+    max_int_bits = vm.max_int_bits
+
+    def checked(handler: Callable[[Any], None]) -> Callable[[Any], None]:
+        def run(arg: Any) -> None:
+            handler(arg)
+            stack = vm.stack
+            if stack and stack[-1].bit_length() > max_int_bits:
+                raise IntegerSizeExceeded(max_int_bits)
+
+        return run
+
+    def native(arg: Any) -> None:
+        handle_native(arg)
+        vm._check_int_bits(arg.results)
+
+    handle_native = handlers[OP_NATIVE]
+    for op in INT_RESULT_OPS:
+        handlers[op] = checked(handlers[op])
+    handlers[OP_NATIVE] = native
+    return handlers
+
+
+def build_stack_limit_handlers(
+    vm: BytecodeInterpreter, handlers: List[Callable[[Any], None]]
+) -> List[Callable[[Any], None]]:
+    """
+    Builds the dispatch table of a run that checks max_stack_size: the handlers of
+    STACK_GROWTH_OPS are replaced by versions that check the stack length after running.
+    Only meant for the unfused instructions, since superinstructions do not check it.
+
+    Args:
+        vm (BytecodeInterpreter): The interpreter the handlers operate on.
+        handlers (List[Callable[[Any], None]]): The dispatch table to start from.
+    Returns:
+        List[Callable[[Any], None]]: The handlers, indexed by opcode number.
+    """
+    handlers = list(handlers)
+    max_stack_size = vm.max_stack_size
+
+    def checked(handler: Callable[[Any], None]) -> Callable[[Any], None]:
+        def run(arg: Any) -> None:
+            handler(arg)
+            if len(vm.stack) > max_stack_size:
+                raise StackLimitExceeded(max_stack_size)
+
+        return run
+
+    def call(arg: Any) -> None:
+        # A memoized call that was looked up has moved the program counter past the CALL.
+        pc = vm.program_counter
+        handle_call(arg)
+        if len(vm.stack) > max_stack_size:
+            vm._stack_limit_exceeded(pc)
+
+    handle_call = handlers[OP_CALL]
+    for op in STACK_GROWTH_OPS:
+        handlers[op] = checked(handlers[op])
+    handlers[OP_CALL] = call
+    return handlers
+
+
+def _stack_limit_checked(instruction: ThreadedInstruction, max_stack_size: int) -> ThreadedInstruction:
+    def checked(vm: BytecodeInterpreter) -> int:
+        nxt = instruction(vm)
+        if len(vm.stack) > max_stack_size:
+            raise StackLimitExceeded(max_stack_size)
+        return nxt
+
+    return checked
+
+
+def _int_bits_checked(instruction: ThreadedInstruction, count: int, max_int_bits: int) -> ThreadedInstruction:
+    def checked(vm: BytecodeInterpreter) -> int:
+        nxt = instruction(vm)
+        stack = vm.stack
+        for index in range(max(len(stack) - count, 0), len(stack)):
+            if stack[index].bit_length() > max_int_bits:
+                raise IntegerSizeExceeded(max_int_bits)
+        return nxt
+
+    return checked
+
+
+def _threaded_push(value: int, nxt: int) -> ThreadedInstruction:
+    def push(vm: BytecodeInterpreter) -> int:
+        vm.stack.append(value)
+        return nxt
+
+    return push
+
+
+def _threaded_pop(arg: Any, nxt: int) -> ThreadedInstruction:
+    def pop(vm: BytecodeInterpreter) -> int:
+        if not vm.stack:
+            raise RuntimeError("Stack Underflow.")
+        vm.stack.pop()
+        return nxt
+
+    return pop
+
+
+def _threaded_dup(arg: Any, nxt: int) -> ThreadedInstruction:
+    def dup(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        if stack:
+            stack.append(stack[-1])
+        return nxt
+
+    return dup
+
+
+def _threaded_binary(opcode: int, nxt: int) -> ThreadedInstruction:
+    """Builds the closure for an arithmetic or comparison opcode; like the handler
+    methods, it does nothing when fewer than two values are on the stack."""
+    if opcode == OP_ADD:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = stack[-1] + b
+            return nxt
+
+    elif opcode == OP_SUB:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = stack[-1] - b
+            return nxt
+
+    elif opcode == OP_MUL:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = stack[-1] * b
+            return nxt
+
+    elif opcode == OP_DIV:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                if b == 0:
+                    stack.pop()
+                    raise RuntimeError("Division by zero")
+                stack[-1] = stack[-1] // b
+            return nxt
+
+    elif opcode == OP_MOD:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                if b == 0:
+                    stack.pop()
+                    raise RuntimeError("Modulo by zero")
+                stack[-1] = stack[-1] % b
+            return nxt
+
+    elif opcode == OP_EQ:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] == b else 0
+            return nxt
+
+    elif opcode == OP_NEQ:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] != b else 0
+            return nxt
+
+    elif opcode == OP_LT:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] < b else 0
+            return nxt
+
+    elif opcode == OP_GT:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] > b else 0
+            return nxt
+
+    elif opcode == OP_LE:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] <= b else 0
+            return nxt
+
+    else:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            if len(stack) >= 2:
+                b = stack.pop()
+                stack[-1] = 1 if stack[-1] >= b else 0
+            return nxt
+
+    return binary
+
+
+def _threaded_neg(arg: Any, nxt: int) -> ThreadedInstruction:
+    def neg(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        if stack:
+            stack[-1] = -stack[-1]
+        return nxt
+
+    return neg
+
+
+def _undefined_variable(vm: BytecodeInterpreter, slot: int) -> RuntimeError:
+    return RuntimeError(f"Undefined variable: {vm.slot_names[slot]}")
+
+
+def _threaded_store(slot: int, nxt: int) -> ThreadedInstruction:
+    def store(vm: BytecodeInterpreter) -> int:
+        if vm.stack:
+            vm.slots[slot] = vm.stack.pop()
+        return nxt
+
+    return store
+
+
+def _threaded_load(slot: int, nxt: int) -> ThreadedInstruction:
+    def load(vm: BytecodeInterpreter) -> int:
+        value = vm.slots[slot]
+        if value is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        vm.stack.append(value)
+        return nxt
+
+    return load
+
+
+def _threaded_jmp(target: int, nxt: int) -> ThreadedInstruction:
+    def jmp(vm: BytecodeInterpreter) -> int:
+        return target
+
+    return jmp
+
+
+def _threaded_jz(target: int, nxt: int) -> ThreadedInstruction:
+    def jz(vm: BytecodeInterpreter) -> int:
+        if vm.stack and vm.stack.pop() == 0:
+            return target
+        return nxt
+
+    return jz
+
+
+def _threaded_jnz(target: int, nxt: int) -> ThreadedInstruction:
+    def jnz(vm: BytecodeInterpreter) -> int:
+        if vm.stack and vm.stack.pop() != 0:
+            return target
+        return nxt
+
+    return jnz
+
+
+def _threaded_halt(arg: Any, nxt: int) -> ThreadedInstruction:
+    def halt(vm: BytecodeInterpreter) -> int:
+        vm.halted = True
+        vm.program_counter = nxt
+        return HALT_PC
+
+    return halt
+
+
+def _threaded_call(target: int, nxt: int) -> ThreadedInstruction:
+    def call(vm: BytecodeInterpreter) -> int:
+        if len(vm.call_stack) >= vm._max_call_depth:
+            raise CallDepthExceeded(vm.max_call_depth)
+        vm.call_stack.append(nxt)
+        return target
+
+    return call
+
+
+def _threaded_ret(arg: Any, nxt: int) -> ThreadedInstruction:
+    def ret(vm: BytecodeInterpreter) -> int:
+        if vm.call_stack:
+            return vm.call_stack.pop()
+        vm.halted = True
+        vm.program_counter = nxt - 1
+        return HALT_PC
+
+    return ret
+
+
+def _threaded_print(arg: Any, nxt: int) -> ThreadedInstruction:
+    def print_(vm: BytecodeInterpreter) -> int:
+        vm.op_print(None)
+        return nxt
+
+    return print_
+
+
+def _threaded_read(arg: Any, nxt: int) -> ThreadedInstruction:
+    def read(vm: BytecodeInterpreter) -> int:
+        vm.op_read(None)
+        return nxt
+
+    return read
+
+
+def _threaded_native(arg: Any, nxt: int) -> ThreadedInstruction:
+    def native(vm: BytecodeInterpreter) -> int:
+        vm.op_native(arg)
+        return nxt
+
+    return native
+
+
+def _threaded_array(op: int, nxt: int) -> ThreadedInstruction:
+    def array_op(vm: BytecodeInterpreter) -> int:
+        vm._handlers[op](None)
+        return nxt
+
+    return array_op
+
+
+def _threaded_nop(arg: Any, nxt: int) -> ThreadedInstruction:
+    def nop(vm: BytecodeInterpreter) -> int:
+        return nxt
+
+    return nop
+
+
+def _threaded_invalid(message: str, nxt: int) -> ThreadedInstruction:
+    def invalid(vm: BytecodeInterpreter) -> int:
+        raise RuntimeError(message)
+
+    return invalid
+
+
+def _threaded_push_binary(
+    arg: Tuple[int, Callable[[int, int], int]], nxt: int
+) -> ThreadedInstruction:
+    value, function = arg
+
+    def push_binary(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        if stack:
+            stack[-1] = function(stack[-1], value)
+        else:
+            stack.append(value)
+        return nxt
+
+    return push_binary
+
+
+def _threaded_load_jz(arg: Tuple[int, int], nxt: int) -> ThreadedInstruction:
+    slot, target = arg
+
+    def load_jz(vm: BytecodeInterpreter) -> int:
+        value = vm.slots[slot]
+        if value is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        return target if value == 0 else nxt
+
+    return load_jz
+
+
+def _threaded_load_jnz(arg: Tuple[int, int], nxt: int) -> ThreadedInstruction:
+    slot, target = arg
+
+    def load_jnz(vm: BytecodeInterpreter) -> int:
+        value = vm.slots[slot]
+        if value is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        return target if value != 0 else nxt
+
+    return load_jnz
+
+
+def _threaded_load_push_binary(
+    arg: Tuple[int, int, Callable[[int, int], int]], nxt: int
+) -> ThreadedInstruction:
+    slot, value, function = arg
+
+    def load_push_binary(vm: BytecodeInterpreter) -> int:
+        current = vm.slots[slot]
+        if current is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        vm.stack.append(function(current, value))
+        return nxt
+
+    return load_push_binary
+
+
+def _threaded_load_push_binary_store(
+    arg: Tuple[int, int, Callable[[int, int], int], int], nxt: int
+) -> ThreadedInstruction:
+    slot, value, function, target = arg
+
+    def load_push_binary_store(vm: BytecodeInterpreter) -> int:
+        slots = vm.slots
+        current = slots[slot]
+        if current is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        slots[target] = function(current, value)
+        return nxt
+
+    return load_push_binary_store
+
+
+def _threaded_load_push_binary_jz(
+    arg: Tuple[int, int, Callable[[int, int], int], int], nxt: int
+) -> ThreadedInstruction:
+    slot, value, function, target = arg
+
+    def load_push_binary_jz(vm: BytecodeInterpreter) -> int:
+        current = vm.slots[slot]
+        if current is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        return target if function(current, value) == 0 else nxt
+
+    return load_push_binary_jz
+
+
+def _threaded_load_push_binary_jnz(
+    arg: Tuple[int, int, Callable[[int, int], int], int], nxt: int
+) -> ThreadedInstruction:
+    slot, value, function, target = arg
+
+    def load_push_binary_jnz(vm: BytecodeInterpreter) -> int:
+        current = vm.slots[slot]
+        if current is UNDEFINED:
+            raise _undefined_variable(vm, slot)
+        return target if function(current, value) != 0 else nxt
+
+    return load_push_binary_jnz
+
+
+def _unchecked_pop(arg: Any, nxt: int) -> ThreadedInstruction:
+    def pop(vm: BytecodeInterpreter) -> int:
+        vm.stack.pop()
+        return nxt
+
+    return pop
+
+
+def _unchecked_dup(arg: Any, nxt: int) -> ThreadedInstruction:
+    def dup(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        stack.append(stack[-1])
+        return nxt
+
+    return dup
+
+
+def _unchecked_binary(opcode: int, nxt: int) -> ThreadedInstruction:
+    """Builds the closure for an arithmetic or comparison opcode that has its two operands."""
+    function = FUSABLE_BINARY_OPS[opcode]
+    error = _ZERO_DIVISION_ERRORS.get(opcode)
+    if error is not None:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            b = stack.pop()
+            if b == 0:
+                stack.pop()
+                raise RuntimeError(error)
+            stack[-1] = function(stack[-1], b)
+            return nxt
+
+    else:
+
+        def binary(vm: BytecodeInterpreter) -> int:
+            stack = vm.stack
+            b = stack.pop()
+            stack[-1] = function(stack[-1], b)
+            return nxt
+
+    return binary
+
+
+def _unchecked_neg(arg: Any, nxt: int) -> ThreadedInstruction:
+    def neg(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        stack[-1] = -stack[-1]
+        return nxt
+
+    return neg
+
+
+def _unchecked_store(slot: int, nxt: int) -> ThreadedInstruction:
+    def store(vm: BytecodeInterpreter) -> int:
+        vm.slots[slot] = vm.stack.pop()
+        return nxt
+
+    return store
+
+
+def _unchecked_jz(target: int, nxt: int) -> ThreadedInstruction:
+    def jz(vm: BytecodeInterpreter) -> int:
+        return target if vm.stack.pop() == 0 else nxt
+
+    return jz
+
+
+def _unchecked_jnz(target: int, nxt: int) -> ThreadedInstruction:
+    def jnz(vm: BytecodeInterpreter) -> int:
+        return target if vm.stack.pop() != 0 else nxt
+
+    return jnz
+
+
+def _unchecked_print(arg: Any, nxt: int) -> ThreadedInstruction:
+    def print_(vm: BytecodeInterpreter) -> int:
+        value = vm.stack[-1]
+        if value > 2147483647:
+            raise RuntimeError("OVERFLOW!")
+        vm.output.write(value)
+        return nxt
+
+    return print_
+
+
+def _unchecked_push_binary(
+    arg: Tuple[int, Callable[[int, int], int]], nxt: int
+) -> ThreadedInstruction:
+    value, function = arg
+
+    def push_binary(vm: BytecodeInterpreter) -> int:
+        stack = vm.stack
+        stack[-1] = function(stack[-1], value)
+        return nxt
+
+    return push_binary
+
+
+# Closure factories indexed by opcode number; each takes (operand, next_pc), where next_pc
+# is the instruction after the last one a superinstruction stands for.
+_THREADED_FACTORIES: List[Callable[[Any, int], ThreadedInstruction]] = [
+    _threaded_push,
+    _threaded_pop,
+    _threaded_dup,
+    lambda arg, nxt: _threaded_binary(OP_ADD, nxt),
+    lambda arg, nxt: _threaded_binary(OP_SUB, nxt),
+    lambda arg, nxt: _threaded_binary(OP_MUL, nxt),
+    lambda arg, nxt: _threaded_binary(OP_DIV, nxt),
+    lambda arg, nxt: _threaded_binary(OP_MOD, nxt),
+    _threaded_neg,
+    _threaded_store,
+    _threaded_load,
+    _threaded_jmp,
+    _threaded_jz,
+    _threaded_jnz,
+    _threaded_halt,
+    lambda arg, nxt: _threaded_binary(OP_EQ, nxt),
+    lambda arg, nxt: _threaded_binary(OP_NEQ, nxt),
+    lambda arg, nxt: _threaded_binary(OP_LT, nxt),
+    lambda arg, nxt: _threaded_binary(OP_GT, nxt),
+    lambda arg, nxt: _threaded_binary(OP_LE, nxt),
+    lambda arg, nxt: _threaded_binary(OP_GE, nxt),
+    _threaded_call,
+    _threaded_ret,
+    _threaded_print,
+    _threaded_read,
+    _threaded_native,
+    lambda arg, nxt: _threaded_array(OP_NEWARRAY, nxt),
+    lambda arg, nxt: _threaded_array(OP_ALOAD, nxt),
+    lambda arg, nxt: _threaded_array(OP_ASTORE, nxt),
+    lambda arg, nxt: _threaded_array(OP_ALEN, nxt),
+    lambda arg, nxt: _threaded_array(OP_AFILL, nxt),
+    lambda arg, nxt: _threaded_array(OP_ACOPY, nxt),
+    _threaded_nop,
+    _threaded_invalid,
+    _threaded_push_binary,
+    _threaded_load_jz,
+    _threaded_load_jnz,
+    _threaded_load_push_binary,
+    _threaded_load_push_binary_store,
+    _threaded_load_push_binary_jz,
+    _threaded_load_push_binary_jnz,
+]
+
+
+# The factories used instead of _THREADED_FACTORIES for a program that passed stack
+# verification: the closures do not check the stack length first.
+_UNCHECKED_FACTORIES: Dict[int, Callable[[Any, int], ThreadedInstruction]] = {
+    OP_POP: _unchecked_pop,
+    OP_DUP: _unchecked_dup,
+    OP_NEG: _unchecked_neg,
+    OP_STORE: _unchecked_store,
+    OP_JZ: _unchecked_jz,
+    OP_JNZ: _unchecked_jnz,
+    OP_PRINT: _unchecked_print,
+    OP_PUSH_BINARY: _unchecked_push_binary,
+}
+for _op in FUSABLE_BINARY_OPS:
+    _UNCHECKED_FACTORIES[_op] = lambda arg, nxt, _op=_op: _unchecked_binary(_op, nxt)
+
+
+def build_threaded_code(
+    code: List[Instruction],
+    stack_checks: bool = True,
+    max_int_bits: Optional[int] = None,
+    max_stack_size: Optional[int] = None,
+) -> List[ThreadedInstruction]:
+    """
+    Turns a decoded instruction stream into threaded code: one closure per instruction,
+    with its operand and fall-through program counter captured, that executes the
+    instruction against an interpreter and returns the next program counter.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+        stack_checks (bool): Whether the closures check that the stack holds the values they
+                             consume; pass False only for a program that passed stack verification.
+        max_int_bits (Optional[int]): The bit length the values computed by INT_RESULT_OPS are
+                                      checked against, or None; code should not be fused then.
+        max_stack_size (Optional[int]): The stack length checked after STACK_GROWTH_OPS, or None;
+                                        code should not be fused then either.
+    Returns:
+        List[ThreadedInstruction]: The closures, indexed like code.
+    """
+    if stack_checks:
+        factories = _THREADED_FACTORIES
+    else:
+        factories = [_UNCHECKED_FACTORIES.get(op, factory) for op, factory in enumerate(_THREADED_FACTORIES)]
+    threaded = [factories[op](arg, index + OPCODE_WIDTHS[op]) for index, (op, arg) in enumerate(code)]
+    if max_int_bits is not None:
+        for index, (op, arg) in enumerate(code):
+            if op in INT_RESULT_OPS:
+                count = arg.results if op == OP_NATIVE else 1
+                threaded[index] = _int_bits_checked(threaded[index], count, max_int_bits)
+    if max_stack_size is not None:
+        for index, (op, arg) in enumerate(code):
+            # Only the dispatch loop memoizes calls, so a CALL here never pushes.
+            if op in STACK_GROWTH_OPS and op != OP_CALL:
+                threaded[index] = _stack_limit_checked(threaded[index], max_stack_size)
+    return threaded
+
+
+def fuse_superinstructions(code: List[Instruction]) -> List[Instruction]:
+    """
+    Replaces each instruction that starts a sequence listed in SUPERINSTRUCTIONS by the
+    superinstruction for the whole sequence, so it is executed with a single dispatch.
+
+    The instructions the sequence covers are kept, so the result is indexed like code:
+    jump targets, return addresses and line numbers stay valid, and a jump into the middle
+    of a sequence simply runs the original instructions from there (which may start a
+    shorter superinstruction of their own).
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+    Returns:
+        List[Instruction]: A copy of code with superinstructions fused in.
+    """
+    fused = list(code)
+    ops = [op for op, _ in code]
+    for index in range(len(code)):
+        if ops[index] not in _FUSION_STARTS:
+            continue
+        for length in _FUSION_LENGTHS:
+            fused_op = _FUSION_TABLE.get(tuple(ops[index : index + length]))
+            if fused_op is None:
+                continue
+            window = code[index : index + length]
+            if any(
+                op in (OP_DIV, OP_MOD) and window[position - 1][1] == 0
+                for position, (op, _) in enumerate(window)
+            ):
+                continue
+            fused[index] = (
+                fused_op,
+                tuple(FUSABLE_BINARY_OPS[op] if op in _BINARY else arg for op, arg in window),
+            )
+            break
+    return fused
+
+
 def main():
     """
     Main entry point for the bytecode interpreter.
@@ -645,25 +3286,150 @@ def main():
     If no filename is provided, reads bytecode from standard input.
     Handles file not found and general file reading errors gracefully, printing error messages to stderr and exiting with a non-zero status code.
     After loading the bytecode, initializes a BytecodeInterpreter instance, loads the program, and executes it.
+    Load errors (such as undefined labels) are printed to stderr and exit with a non-zero status code.
+    The --engine option selects the execution engine (see ENGINES). --max-instructions, --time-limit
+    and --max-call-depth set the execution limits and --max-stack-size, --max-int-bits and
+    --max-output-bytes the quotas; exceeding one is reported like a load error. --int-width and
+    --overflow select the fixed-width integer mode.
+    Files (or standard input) in the binary format written by bytecode_binary are detected by
+    their magic number and loaded with load_binary. Source programs are loaded through the
+    on-disk program cache (see bytecode_cache) unless --no-cache is given. --input-file makes READ
+    take its values from a file instead of standard input, in the format given by --input-format.
+    --stats prints the resource use of the run to stderr when it ends.
     """
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Run a bytecode program.")
+    parser.add_argument("filename", nargs="?", help="bytecode file (default: standard input)")
+    parser.add_argument("--engine", choices=ENGINES, default="dispatch", help="execution engine")
+    parser.add_argument(
+        "--max-instructions", type=int, default=None, help="maximum number of instructions to execute"
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=DEFAULT_TIME_LIMIT,
+        help=f"maximum run time in seconds, 0 for none (default: {DEFAULT_TIME_LIMIT:g})",
+    )
+    parser.add_argument("--max-call-depth", type=int, default=None, help="maximum number of nested calls")
+    parser.add_argument("--max-stack-size", type=int, default=None, help="maximum number of values on the stack")
+    parser.add_argument("--max-int-bits", type=int, default=None, help="maximum bit length of any value")
+    parser.add_argument("--max-output-bytes", type=int, default=None, help="maximum bytes of output")
+    parser.add_argument("--max-heap-size", type=int, default=None, help="maximum number of array elements")
+    parser.add_argument(
+        "--int-width", type=int, choices=INT_WIDTHS, default=None, help="use fixed-width signed integers"
+    )
+    parser.add_argument(
+        "--overflow",
+        choices=OVERFLOW_MODES,
+        default="wrap",
+        help="with --int-width, wrap around or stop with an error on overflow (default: wrap)",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None, help="directory of the program cache (default: see bytecode_cache)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the program cache")
+    parser.add_argument("--input-file", default=None, help="file READ takes its values from (default: standard input)")
+    parser.add_argument(
+        "--stats", action="store_true", help="print the run's resource use (see RunMetrics) to stderr"
+    )
+    parser.add_argument(
+        "--memoize", action="store_true", help="remember the results of calls to pure subroutines"
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=INPUT_FORMATS,
+        default="text",
+        help="format of --input-file: whitespace-separated numbers, or little-endian 32 or 64-bit integers",
+    )
+    options = parser.parse_args()
+
+    import bytecode_binary
+
+    binary = None
+    if options.filename:
+        filename = options.filename
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                bytecode = f.read()
+            with open(filename, "rb") as f:
+                data = f.read(4)
+                if bytecode_binary.is_binary(data):
+                    binary = bytecode_binary.read_file(filename)
+                else:
+                    bytecode = (data + f.read()).decode("utf-8")
         except FileNotFoundError:
             print(f"Error: File '{filename}' not found", file=sys.stderr)
             sys.exit(1)
+        except BytecodeLoadError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
         except Exception as e:
             print(f"Error reading file: {e}", file=sys.stderr)
             sys.exit(1)
     else:
-        bytecode = sys.stdin.read()
+        data = sys.stdin.buffer.read()
+        try:
+            if bytecode_binary.is_binary(data):
+                binary = bytecode_binary.read_program(data)
+            else:
+                bytecode = data.decode("utf-8")
+        except BytecodeLoadError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+
+    inputs = None
+    if options.input_file:
+        try:
+            if options.input_format == "text":
+                inputs = MappedFileSource(options.input_file)
+            else:
+                inputs = ArraySource.from_file(options.input_file, INPUT_FORMATS[options.input_format])
+        except FileNotFoundError:
+            print(f"Error: File '{options.input_file}' not found", file=sys.stderr)
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error reading input file: {e}", file=sys.stderr)
+            sys.exit(1)
 
-    interpreter = BytecodeInterpreter()
-    interpreter.load_program(bytecode)
-    interpreter.run()
+    interpreter = BytecodeInterpreter(
+        engine=options.engine,
+        max_instructions=options.max_instructions,
+        time_limit=options.time_limit or None,
+        max_call_depth=options.max_call_depth,
+        inputs=inputs,
+        max_stack_size=options.max_stack_size,
+        max_int_bits=options.max_int_bits,
+        max_output_bytes=options.max_output_bytes,
+        max_heap_size=options.max_heap_size,
+        int_width=options.int_width,
+        overflow=options.overflow,
+        memoize=options.memoize,
+    )
+    try:
+        if binary is not None:
+            interpreter.load_binary(binary)
+        elif options.no_cache:
+            interpreter.load_program(bytecode)
+        else:
+            import bytecode_cache
+
+            bytecode_cache.BytecodeCache(options.cache_dir).load(interpreter, bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    metrics = RunMetrics() if options.stats else None
+    try:
+        interpreter.run(metrics=metrics)
+    except ExecutionLimitExceeded as e:
+        print(f"Runtime error at line {interpreter.line_numbers[interpreter.program_counter]}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if metrics is not None:
+            print(metrics.report(), file=sys.stderr)
+            if options.memoize:
+                print(interpreter.memo.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
+    # The modules main() and the engines import (bytecode_binary, bytecode_cache,
+    # bytecode_verifier, bytecode_compiler, ...) import bytecode_interpreter; let them find
+    # this module instead of loading a second copy with its own classes.
+    sys.modules.setdefault("bytecode_interpreter", sys.modules[__name__])
     main()
@@ -0,0 +1,196 @@
+"""
+Host-implemented intrinsics for the NATIVE instruction.
+
+`NATIVE name` calls a Python function registered under name in the interpreter's
+IntrinsicRegistry (BytecodeInterpreter.intrinsics). Every intrinsic declares its stack
+signature: it pops `arguments` values, the deepest one being the first argument, and
+pushes `results` values in their place. A single call replaces what would otherwise be a
+loop of bytecode, such as exponentiation by repeated MUL.
+
+Names are resolved when a program is loaded: an unknown name is a load error, and the
+stack verifier uses the declared signature like the stack effect of any other opcode.
+Register intrinsics before loading the programs that use them.
+
+An exception raised by the function becomes a runtime error of the program, reported as
+"name: message" at the NATIVE instruction, with the arguments already popped (as DIV does
+with its operands). Results must be integers.
+
+STANDARD_INTRINSICS is the set every interpreter starts with:
+
+    abs x          -> |x|
+    min a b        -> the smaller of a and b
+    max a b        -> the larger of a and b
+    gcd a b        -> greatest common divisor, non-negative
+    lcm a b        -> least common multiple, non-negative
+    pow a n        -> a to the power n (n >= 0)
+    powmod a n m   -> a to the power n modulo m (n >= 0, m != 0)
+    isqrt x        -> the integer square root of x (x >= 0)
+    divmod a b     -> a // b, a % b (two results, the remainder on top)
+    sum_range a b  -> a + (a + 1) + ... + (b - 1), 0 if b <= a
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+# Intrinsics run as one instruction, so the quotas only see their result once it has been
+# computed; pow refuses results that would be longer than this many bits instead.
+MAX_RESULT_BITS = 1 << 20
+
+
+class Intrinsic:
+    """
+    A host function callable from bytecode with NATIVE name.
+
+    Attributes:
+    - name: The name NATIVE refers to it by.
+    - function: The Python function, called with the popped values as positional arguments.
+    - arguments: The number of values it pops.
+    - results: The number of values it pushes. A function with one result returns an int,
+      one with none returns anything (ignored), and one with several returns a sequence of
+      that many ints, the last one ending up on top.
+    """
+
+    __slots__ = ("name", "function", "arguments", "results")
+
+    def __init__(self, name: str, function: Callable[..., object], arguments: int, results: int = 1):
+        self.name = name
+        self.function = function
+        self.arguments = arguments
+        self.results = results
+
+    def __repr__(self) -> str:
+        return f"Intrinsic({self.name!r}, arguments={self.arguments}, results={self.results})"
+
+    def apply(self, args: Sequence[int]) -> List[int]:
+        """
+        Calls the function with args and returns its results as a list of ints.
+
+        Raises:
+            RuntimeError: "name: message" if the function raises or returns something else than
+                its declared results.
+        """
+        try:
+            value = self.function(*args)
+        except Exception as e:
+            raise RuntimeError(f"{self.name}: {e}") from e
+        if self.results == 1:
+            values = [value]
+        elif self.results == 0:
+            return []
+        else:
+            try:
+                values = list(value)
+            except TypeError:
+                values = []
+            if len(values) != self.results:
+                raise RuntimeError(f"{self.name}: expected {self.results} results, got {value!r}")
+        for index, result in enumerate(values):
+            if type(result) is not int:
+                if not isinstance(result, int):
+                    raise RuntimeError(f"{self.name}: returned {type(result).__name__}, not an integer")
+                values[index] = int(result)
+        return values
+
+
+class IntrinsicRegistry:
+    """The intrinsics NATIVE can call, by name."""
+
+    def __init__(self, intrinsics: Sequence[Intrinsic] = ()):
+        self._intrinsics: Dict[str, Intrinsic] = {}
+        for intrinsic in intrinsics:
+            self._intrinsics[intrinsic.name] = intrinsic
+
+    def register(self, name: str, function: Callable[..., object], arguments: int, results: int = 1) -> Intrinsic:
+        """
+        Registers function as the intrinsic name, replacing any intrinsic of that name.
+
+        Args:
+            name (str): The name NATIVE refers to it by; one word without whitespace.
+            function (Callable): The Python function.
+            arguments (int): The number of values it pops from the stack.
+            results (int): The number of values it pushes, see Intrinsic.
+        Returns:
+            Intrinsic: The registered intrinsic.
+        Raises:
+            ValueError: If the name is not a single word or a count is negative.
+        """
+        if not name or name.split() != [name] or name.endswith(":") or name.startswith("#"):
+            raise ValueError(f"Invalid intrinsic name: {name!r}")
+        if arguments < 0 or results < 0:
+            raise ValueError("arguments and results must not be negative")
+        intrinsic = self._intrinsics[name] = Intrinsic(name, function, arguments, results)
+        return intrinsic
+
+    def unregister(self, name: str) -> None:
+        """Removes the intrinsic name; programs already loaded keep calling it."""
+        del self._intrinsics[name]
+
+    def get(self, name: str) -> Optional[Intrinsic]:
+        """Returns the intrinsic name, or None if there is none."""
+        return self._intrinsics.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._intrinsics
+
+    def __iter__(self) -> Iterator[Intrinsic]:
+        return iter(self._intrinsics.values())
+
+    def __len__(self) -> int:
+        return len(self._intrinsics)
+
+    def copy(self) -> "IntrinsicRegistry":
+        """Returns a registry with the same intrinsics, to extend without changing this one."""
+        return IntrinsicRegistry(list(self))
+
+
+def _pow(base: int, exponent: int) -> int:
+    if exponent < 0:
+        raise ValueError("negative exponent")
+    if abs(base) > 1 and exponent * (abs(base).bit_length() - 1) > MAX_RESULT_BITS:
+        raise ValueError(f"result longer than {MAX_RESULT_BITS} bits")
+    return base**exponent
+
+
+def _powmod(base: int, exponent: int, modulus: int) -> int:
+    if exponent < 0:
+        raise ValueError("negative exponent")
+    if modulus == 0:
+        raise ValueError("modulo by zero")
+    return pow(base, exponent, modulus)
+
+
+def _isqrt(value: int) -> int:
+    if value < 0:
+        raise ValueError("negative argument")
+    return math.isqrt(value)
+
+
+def _divmod(a: int, b: int) -> List[int]:
+    if b == 0:
+        raise ValueError("division by zero")
+    return [a // b, a % b]
+
+
+def _sum_range(start: int, stop: int) -> int:
+    if stop <= start:
+        return 0
+    return (stop - start) * (start + stop - 1) // 2
+
+
+STANDARD_INTRINSICS = (
+    Intrinsic("abs", abs, 1),
+    Intrinsic("min", min, 2),
+    Intrinsic("max", max, 2),
+    Intrinsic("gcd", math.gcd, 2),
+    Intrinsic("lcm", math.lcm, 2),
+    Intrinsic("pow", _pow, 2),
+    Intrinsic("powmod", _powmod, 3),
+    Intrinsic("isqrt", _isqrt, 1),
+    Intrinsic("divmod", _divmod, 2, 2),
+    Intrinsic("sum_range", _sum_range, 2),
+)
+
+
+def standard_registry() -> IntrinsicRegistry:
+    """Returns a new registry holding STANDARD_INTRINSICS."""
+    return IntrinsicRegistry(STANDARD_INTRINSICS)
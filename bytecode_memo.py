@@ -0,0 +1,99 @@
+"""
+Memoization of calls to pure subroutines.
+
+With BytecodeInterpreter(memoize=True) the interpreter finds the CALL targets whose result
+depends only on the values on top of the stack (see bytecode_verifier.find_pure_subroutines)
+and remembers what each call returned, keyed by the target and its argument values. A CALL
+of the same target with the same arguments then replaces them with the remembered results
+and continues after the CALL without running the subroutine, so a recursion that computes
+the same values many times, like a naive Fibonacci, runs each distinct call once.
+
+The results are kept in a MemoTable, a least-recently-used cache of at most max_size calls
+that counts its hits, misses and evictions.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+# Calls remembered by default, see BytecodeInterpreter(memo_size=...).
+MEMO_SIZE = 4096
+
+
+class MemoTable:
+    """
+    A bounded cache from (entry, arguments) to the results of a call, evicting the least
+    recently used entry once it holds max_size of them.
+
+    Attributes:
+    - max_size: The number of calls it remembers.
+    - hits: Lookups that found results.
+    - misses: Lookups that did not.
+    - evictions: Entries dropped to make room for new ones.
+    """
+
+    def __init__(self, max_size: int = MEMO_SIZE):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, ...]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, ...]]:
+        """Returns the results remembered for key, counting a hit, or None, counting a miss."""
+        results = self._entries.get(key)
+        if results is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return results
+
+    def put(self, key: Hashable, results: Tuple[int, ...]) -> None:
+        """Remembers results for key, evicting the least recently used entry if full."""
+        entries = self._entries
+        entries[key] = results
+        entries.move_to_end(key)
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Forgets every entry and resets the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were hits, 0.0 before the first one."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, object]:
+        """Returns the counters and size as a JSON-serializable dictionary."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def report(self) -> str:
+        """Returns the counters as human-readable text."""
+        return "\n".join(
+            [
+                f"Memoized calls: {len(self._entries)} of {self.max_size}",
+                f"Hits: {self.hits}",
+                f"Misses: {self.misses}",
+                f"Evictions: {self.evictions}",
+                f"Hit rate: {self.hit_rate:.1%}",
+            ]
+        )
@@ -0,0 +1,172 @@
+"""
+Output sinks for the values a bytecode program prints.
+
+Every BytecodeInterpreter writes PRINT output to its own sink (BytecodeInterpreter.output)
+instead of calling print(), so concurrent interpreters never share sys.stdout and nothing
+has to redirect it. A sink receives each value with write(); it formats the line, counts
+its bytes against max_bytes and hands it to _emit. Once a line would go past max_bytes
+the sink sets truncated and drops that line and all later ones. A quota (see set_quota)
+stops the program instead: the interpreter sets one for each run with max_output_bytes,
+and a line that would go past it makes write() raise the interpreter's error.
+
+The interpreter calls flush() when a run or step ends, before READ waits for input and
+before a runtime error is reported, so buffered output is never lost or reordered.
+
+- ListSink keeps every line in memory.
+- RingBufferSink keeps only the most recent lines.
+- FileSink writes to a text file, sys.stdout by default, in batches.
+- CallbackSink passes batches of output to a function.
+"""
+
+import sys
+from collections import deque
+from typing import Callable, List, Optional, TextIO
+
+# Lines FileSink and CallbackSink collect before passing them on.
+DEFAULT_BATCH_LINES = 256
+
+
+class OutputSink:
+    """
+    Base class of the output sinks.
+
+    Attributes:
+    - max_bytes: The most output the sink accepts, in bytes of text, or None for no limit.
+    - bytes_written: The output accepted so far.
+    - truncated: True once a line was dropped because of max_bytes.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self.truncated = False
+        # The bytes the current quota still allows, and the error raised past it.
+        self._quota: Optional[int] = None
+        self._quota_left = 0
+        self._quota_error: Optional[Callable[[int], Exception]] = None
+
+    def set_quota(self, max_bytes: Optional[int], error: Callable[[int], Exception]) -> None:
+        """
+        Allows max_bytes more bytes of output from now on, or removes the quota with None. A
+        line that would go past the quota is not recorded; write() raises error(max_bytes).
+        """
+        self._quota = max_bytes
+        self._quota_left = max_bytes if max_bytes is not None else 0
+        self._quota_error = error
+
+    def charge(self, size: int) -> None:
+        """Counts a line of size bytes against the quota, raising its error if it does not fit."""
+        if self._quota is not None:
+            self._quota_left -= size
+            if self._quota_left < 0:
+                raise self._quota_error(self._quota)
+
+    def write(self, value: int) -> None:
+        """Records a printed value as one line of output."""
+        line = f"{value}\n"
+        if self._quota is not None:
+            self.charge(len(line))
+        if self.max_bytes is not None:
+            if self.truncated or self.bytes_written + len(line) > self.max_bytes:
+                self.truncated = True
+                return
+        self.bytes_written += len(line)
+        self._emit(line)
+
+    def _emit(self, line: str) -> None:
+        """Stores or passes on one accepted line; implemented by each sink."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Passes on any buffered output."""
+
+
+class ListSink(OutputSink):
+    """Keeps every line in lines; getvalue() returns the output as one string."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        super().__init__(max_bytes)
+        self.lines: List[str] = []
+        self._emit = self.lines.append
+
+    def getvalue(self) -> str:
+        return "".join(self.lines)
+
+
+class RingBufferSink(OutputSink):
+    """
+    Keeps the last `capacity` lines; getvalue() returns them as one string and `dropped`
+    counts the older lines that were discarded.
+    """
+
+    def __init__(self, capacity: int, max_bytes: Optional[int] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        super().__init__(max_bytes)
+        self.lines: "deque[str]" = deque(maxlen=capacity)
+        self.dropped = 0
+
+    def _emit(self, line: str) -> None:
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+
+    def getvalue(self) -> str:
+        return "".join(self.lines)
+
+
+class _BatchingSink(OutputSink):
+    """Collects lines and passes them on with _send once batch_lines are buffered, or on flush."""
+
+    def __init__(self, batch_lines: int = DEFAULT_BATCH_LINES, max_bytes: Optional[int] = None):
+        if batch_lines < 1:
+            raise ValueError("batch_lines must be at least 1")
+        super().__init__(max_bytes)
+        self.batch_lines = batch_lines
+        self._buffer: List[str] = []
+
+    def _emit(self, line: str) -> None:
+        buffer = self._buffer
+        buffer.append(line)
+        if len(buffer) >= self.batch_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._send(text)
+
+    def _send(self, text: str) -> None:
+        raise NotImplementedError
+
+
+class FileSink(_BatchingSink):
+    """
+    Writes the output to a text file with one write() per batch. With file=None it writes to
+    whatever sys.stdout is at the time of each flush.
+    """
+
+    def __init__(
+        self, file: Optional[TextIO] = None, batch_lines: int = DEFAULT_BATCH_LINES, max_bytes: Optional[int] = None
+    ):
+        super().__init__(batch_lines, max_bytes)
+        self.file = file
+
+    def _send(self, text: str) -> None:
+        file = self.file if self.file is not None else sys.stdout
+        file.write(text)
+        file.flush()
+
+
+class CallbackSink(_BatchingSink):
+    """Calls callback with each batch of output, as a string of complete lines."""
+
+    def __init__(
+        self, callback: Callable[[str], None], batch_lines: int = DEFAULT_BATCH_LINES, max_bytes: Optional[int] = None
+    ):
+        super().__init__(batch_lines, max_bytes)
+        self.callback = callback
+
+    def _send(self, text: str) -> None:
+        self.callback(text)
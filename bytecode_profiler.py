@@ -0,0 +1,408 @@
+"""
+Per-opcode, per-line and call-graph execution profiler.
+
+BytecodeInterpreter.run(profile=Profile()) runs the program in a separate instrumented
+loop (see BytecodeInterpreter._run_instrumented) instead of the selected engine, so runs
+without a profile pay nothing for it. The loop executes the unfused instructions with the
+checked handlers and records:
+
+- how many times each instruction executes, from which the counts per opcode and per
+  source line follow;
+- the time taken by a random sample of the executed instructions, on average one in
+  sample_interval. The time of an opcode is estimated as its mean sampled time times its
+  count; random gaps between samples keep loops from always sampling the same instruction;
+- the instructions executed and the time spent under each call stack, the CALL targets
+  active at the time named by their labels below the root frame "<main>". The time is read
+  at every CALL and RET, so it includes the profiler's own overhead.
+
+From the call stacks follow, for each function, the exclusive count and time (spent in its
+own instructions) and the inclusive ones (including the functions it calls; recursive calls
+are counted once). collapsed() writes the stacks in the collapsed format read by flamegraph
+tools such as flamegraph.pl and speedscope:
+    <main>;func1;func2 12
+
+The NATIVE calls are also counted and timed per intrinsic, since one opcode covers them all.
+
+A Profile accumulates over the runs of one program. report() ranks the hot spots and
+to_dict() gives the same data for a JSON dump.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bytecode_interpreter import (
+    DEFAULT_TIME_LIMIT,
+    OPCODE_NAMES,
+    OP_NATIVE,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    ExecutionLimitExceeded,
+    Instruction,
+)
+
+# Executed instructions per timed sample, on average.
+DEFAULT_SAMPLE_INTERVAL = 16
+
+# The frame at the bottom of every call stack: the code outside any CALL.
+ROOT_FRAME = "<main>"
+
+CallStack = Tuple[str, ...]
+
+
+class Profile:
+    """
+    Execution counts and sampled times of a program, indexed like BytecodeInterpreter.code:
+    - counts: How many times each instruction was executed.
+    - times: The total time, in seconds, of the executions of each instruction that were timed.
+    - samples: How many executions of each instruction were timed.
+    - sample_interval: The mean number of executed instructions per timed sample.
+    - stacks, stack_times: The instructions executed and the seconds spent under each call stack.
+    - calls: How many times each function was called.
+    - code, line_numbers, instructions: The profiled program, set by bind().
+    """
+
+    def __init__(self, sample_interval: int = DEFAULT_SAMPLE_INTERVAL, seed: Optional[int] = None):
+        if sample_interval < 1:
+            raise ValueError("sample_interval must be at least 1")
+        self.sample_interval = sample_interval
+        self.counts: List[int] = []
+        self.times: List[float] = []
+        self.samples: List[int] = []
+        self.stacks: Dict[CallStack, int] = {}
+        self.stack_times: Dict[CallStack, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.code: List[Instruction] = []
+        self.line_numbers: List[int] = []
+        self.instructions: List[str] = []
+        self._function_names: Dict[int, str] = {}
+        self._random = random.Random(seed)
+        self._stack: CallStack = (ROOT_FRAME,)
+        self._mark = 0
+        self._mark_time = 0.0
+
+    def bind(self, interpreter: BytecodeInterpreter) -> None:
+        """Prepares the profile for a run of the interpreter's program; a new program starts it over."""
+        self._stack = (ROOT_FRAME,)
+        self._mark = 0
+        self._mark_time = time.perf_counter()
+        if interpreter.code is self.code:
+            return
+        self.code = interpreter.code
+        self.line_numbers = interpreter.line_numbers
+        self.instructions = interpreter.instructions
+        self.counts = [0] * len(self.code)
+        self.times = [0.0] * len(self.code)
+        self.samples = [0] * len(self.code)
+        self.stacks = {}
+        self.stack_times = {}
+        self.calls = {}
+        self._function_names = {}
+        for label, index in interpreter.labels.items():
+            self._function_names.setdefault(index, label)
+
+    def function_name(self, target: int) -> str:
+        """Returns the name of a call target: its first label, or the line it starts at."""
+        name = self._function_names.get(target)
+        if name is None:
+            line = self.line_numbers[target] if target < len(self.line_numbers) else len(self.instructions) + 1
+            name = self._function_names[target] = f"line {line}"
+        return name
+
+    def _charge(self, executed: int) -> None:
+        """Attributes the instructions and time since the last CALL or RET to the active call stack."""
+        now = time.perf_counter()
+        stack = self._stack
+        self.stacks[stack] = self.stacks.get(stack, 0) + executed - self._mark
+        self.stack_times[stack] = self.stack_times.get(stack, 0.0) + now - self._mark_time
+        self._mark = executed
+        self._mark_time = now
+
+    def enter(self, executed: int, target: int) -> None:
+        """Records a CALL to target, made as the executed-th instruction of the run."""
+        self._charge(executed)
+        name = self.function_name(target)
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self._stack += (name,)
+
+    def leave(self, executed: int) -> None:
+        """
+        Records a RET that returned. A return to a call made before the run, left on the
+        interpreter's call stack, stays in the root frame.
+        """
+        self._charge(executed)
+        if len(self._stack) > 1:
+            self._stack = self._stack[:-1]
+
+    def finish(self, executed: int) -> None:
+        """Ends a run that executed `executed` instructions."""
+        if executed > self._mark:
+            self._charge(executed)
+
+    def next_gap(self) -> int:
+        """Returns the number of instructions until the next timed one."""
+        interval = self.sample_interval
+        return 1 if interval == 1 else self._random.randint(1, 2 * interval - 1)
+
+    @property
+    def total(self) -> int:
+        """The number of instructions executed."""
+        return sum(self.counts)
+
+    def opcode_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns, for each opcode that was executed, its name, count and estimated time in
+        seconds (None if none of its executions was timed), ordered by estimated time and then
+        count, highest first.
+        """
+        counts: Dict[int, int] = {}
+        times: Dict[int, float] = {}
+        samples: Dict[int, int] = {}
+        for (op, _), count, time, sampled in zip(self.code, self.counts, self.times, self.samples):
+            if count:
+                counts[op] = counts.get(op, 0) + count
+                times[op] = times.get(op, 0.0) + time
+                samples[op] = samples.get(op, 0) + sampled
+        stats = [
+            {
+                "opcode": OPCODE_NAMES[op],
+                "count": count,
+                "time": times[op] / samples[op] * count if samples[op] else None,
+            }
+            for op, count in counts.items()
+        ]
+        stats.sort(key=lambda entry: (entry["time"] is not None, entry["time"] or 0.0, entry["count"]), reverse=True)
+        return stats
+
+    def intrinsic_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns, for each intrinsic that NATIVE called, its name, count and estimated time in
+        seconds (None if none of its calls was timed), ordered like opcode_stats().
+        """
+        counts: Dict[str, int] = {}
+        times: Dict[str, float] = {}
+        samples: Dict[str, int] = {}
+        for (op, arg), count, time, sampled in zip(self.code, self.counts, self.times, self.samples):
+            if op == OP_NATIVE and count:
+                counts[arg.name] = counts.get(arg.name, 0) + count
+                times[arg.name] = times.get(arg.name, 0.0) + time
+                samples[arg.name] = samples.get(arg.name, 0) + sampled
+        stats = [
+            {
+                "intrinsic": name,
+                "count": count,
+                "time": times[name] / samples[name] * count if samples[name] else None,
+            }
+            for name, count in counts.items()
+        ]
+        stats.sort(key=lambda entry: (entry["time"] is not None, entry["time"] or 0.0, entry["count"]), reverse=True)
+        return stats
+
+    def line_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns, for each source line that was executed, its number, count and source text,
+        ordered by count, highest first (ties in line order).
+        """
+        counts: Dict[int, int] = {}
+        for line, count in zip(self.line_numbers, self.counts):
+            if count:
+                counts[line] = counts.get(line, 0) + count
+        stats = [
+            {"line": line, "count": count, "instruction": self.instructions[line - 1]}
+            for line, count in counts.items()
+        ]
+        stats.sort(key=lambda entry: (-entry["count"], entry["line"]))
+        return stats
+
+    def function_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns, for each function that executed instructions or was called, its name, calls, and
+        inclusive and exclusive instruction counts and times in seconds, ordered by inclusive count
+        and then exclusive count, highest first.
+        """
+        stats: Dict[str, Dict[str, Any]] = {}
+
+        def entry(name: str) -> Dict[str, Any]:
+            if name not in stats:
+                stats[name] = {
+                    "function": name,
+                    "calls": self.calls.get(name, 0),
+                    "inclusive_count": 0,
+                    "exclusive_count": 0,
+                    "inclusive_time": 0.0,
+                    "exclusive_time": 0.0,
+                }
+            return stats[name]
+
+        for stack, count in self.stacks.items():
+            elapsed = self.stack_times[stack]
+            leaf = entry(stack[-1])
+            leaf["exclusive_count"] += count
+            leaf["exclusive_time"] += elapsed
+            for name in set(stack):
+                function = entry(name)
+                function["inclusive_count"] += count
+                function["inclusive_time"] += elapsed
+        for name in self.calls:
+            entry(name)
+        result = list(stats.values())
+        result.sort(key=lambda item: (item["inclusive_count"], item["exclusive_count"]), reverse=True)
+        return result
+
+    def collapsed(self, weight: str = "count") -> str:
+        """
+        Returns the call stacks in collapsed format, one "frame;frame;... value" line per stack.
+
+        Args:
+            weight (str): "count" for the instructions executed under each stack, or "time" for
+                the microseconds spent there.
+        """
+        if weight not in ("count", "time"):
+            raise ValueError(f"unknown weight: {weight}")
+        lines = []
+        for stack in sorted(self.stacks):
+            if weight == "count":
+                value = self.stacks[stack]
+            else:
+                value = round(self.stack_times[stack] * 1e6)
+            if value:
+                lines.append(f"{';'.join(stack)} {value}\n")
+        return "".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the profile as JSON-serialisable data."""
+        return {
+            "instructions_executed": self.total,
+            "sample_interval": self.sample_interval,
+            "samples": sum(self.samples),
+            "opcodes": self.opcode_stats(),
+            "intrinsics": self.intrinsic_stats(),
+            "lines": self.line_stats(),
+            "functions": self.function_stats(),
+            "stacks": [
+                {"stack": list(stack), "count": count, "time": self.stack_times[stack]}
+                for stack, count in sorted(self.stacks.items())
+            ],
+        }
+
+    def report(self, top: int = 10) -> str:
+        """
+        Returns a hot-spot report: every executed opcode and called intrinsic, the top most
+        executed lines and, if the program made any calls, every function.
+        """
+        total = self.total
+        opcodes = self.opcode_stats()
+        total_time = sum(entry["time"] or 0.0 for entry in opcodes)
+
+        def share(part: float, whole: float) -> str:
+            return f"{100.0 * part / whole:5.1f}%" if whole else "    -"
+
+        lines = [
+            f"Instructions executed: {total}, timed: {sum(self.samples)} "
+            f"(about 1 in {self.sample_interval})",
+            "",
+            f"{'Opcode':<10} {'Count':>12} {'':>6} {'Est. time':>12} {'':>6}",
+        ]
+        for entry in opcodes:
+            if entry["time"] is None:
+                timing = f"{'-':>12} {'':>6}"
+            else:
+                timing = f"{entry['time'] * 1000:>10.3f}ms {share(entry['time'], total_time)}"
+            lines.append(f"{entry['opcode']:<10} {entry['count']:>12} {share(entry['count'], total)} {timing}")
+        intrinsics = self.intrinsic_stats()
+        if intrinsics:
+            lines += ["", f"{'Intrinsic':<10} {'Count':>12} {'':>6} {'Est. time':>12} {'':>6}"]
+            for entry in intrinsics:
+                if entry["time"] is None:
+                    timing = f"{'-':>12} {'':>6}"
+                else:
+                    timing = f"{entry['time'] * 1000:>10.3f}ms {share(entry['time'], total_time)}"
+                lines.append(f"{entry['intrinsic']:<10} {entry['count']:>12} {share(entry['count'], total)} {timing}")
+        lines += ["", f"{'Line':>6} {'Count':>12} {'':>6}  Instruction"]
+        for entry in self.line_stats()[:top]:
+            lines.append(
+                f"{entry['line']:>6} {entry['count']:>12} {share(entry['count'], total)}  {entry['instruction']}"
+            )
+        if self.calls:
+            lines += [
+                "",
+                f"{'Function':<20} {'Calls':>8} {'Inclusive':>12} {'':>6} {'Exclusive':>12} {'':>6} "
+                f"{'Incl. time':>12} {'Excl. time':>12}",
+            ]
+            for entry in self.function_stats():
+                lines.append(
+                    f"{entry['function']:<20} {entry['calls']:>8} "
+                    f"{entry['inclusive_count']:>12} {share(entry['inclusive_count'], total)} "
+                    f"{entry['exclusive_count']:>12} {share(entry['exclusive_count'], total)} "
+                    f"{entry['inclusive_time'] * 1000:>10.3f}ms {entry['exclusive_time'] * 1000:>10.3f}ms"
+                )
+        return "\n".join(lines)
+
+
+def main():
+    """
+    Command line interface: runs a bytecode file with profiling and prints the report to stderr.
+        python bytecode_profiler.py <input_file> [--top N] [--json PATH] [--sample-interval N]
+                                    [--flamegraph PATH] [--flamegraph-weight count|time]
+    """
+    parser = argparse.ArgumentParser(description="Profile a bytecode program.")
+    parser.add_argument("filename", help="bytecode file")
+    parser.add_argument("--top", type=int, default=10, help="number of lines in the report (default: 10)")
+    parser.add_argument("--json", default=None, help="also write the profile as JSON to this file")
+    parser.add_argument(
+        "--flamegraph", default=None, help="also write the call stacks in collapsed format to this file"
+    )
+    parser.add_argument(
+        "--flamegraph-weight",
+        choices=("count", "time"),
+        default="count",
+        help="weigh the collapsed stacks by instructions or by microseconds (default: count)",
+    )
+    parser.add_argument(
+        "--sample-interval",
+        type=int,
+        default=DEFAULT_SAMPLE_INTERVAL,
+        help=f"executed instructions per timed sample (default: {DEFAULT_SAMPLE_INTERVAL})",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=DEFAULT_TIME_LIMIT,
+        help=f"maximum run time in seconds, 0 for none (default: {DEFAULT_TIME_LIMIT:g})",
+    )
+    options = parser.parse_args()
+    try:
+        with open(options.filename, "r", encoding="utf-8") as f:
+            bytecode = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{options.filename}' not found", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    interpreter = BytecodeInterpreter(time_limit=options.time_limit or None)
+    try:
+        interpreter.load_program(bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    profile = Profile(options.sample_interval)
+    try:
+        interpreter.run(profile=profile)
+    except ExecutionLimitExceeded as e:
+        print(f"Runtime error at line {interpreter.line_numbers[interpreter.program_counter]}: {e}", file=sys.stderr)
+    print(profile.report(options.top), file=sys.stderr)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(profile.to_dict(), f, indent=2)
+            f.write("\n")
+    if options.flamegraph:
+        with open(options.flamegraph, "w", encoding="utf-8") as f:
+            f.write(profile.collapsed(options.flamegraph_weight))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,955 @@
+"""
+Translator from stack bytecode to a three-address register form, and the interpreter
+that runs it.
+
+The decoded instruction stream of a BytecodeInterpreter is split into basic blocks.
+Inside a block the operand stack is simulated at translation time, the same way
+bytecode_compiler does it: each stack slot becomes a virtual register, so a value is
+computed straight into a register and read from there by the instruction that consumes
+it. Variables are registers too, and constants are registers filled in before the run.
+A sequence such as
+
+    LOAD a / LOAD b / ADD / STORE c
+
+becomes the single register instruction `c = a + b`, and a comparison followed by JZ or
+JNZ becomes one compare-and-branch. Only the values still on the stack when control
+leaves a block go through the real stack, and an instruction that finds too few
+simulated values (because they were pushed by an earlier block) runs the interpreter's
+own handler on the real stack.
+
+A register instruction is an (opcode, a, b, c) tuple. The register interpreter runs
+them from one flat list, dispatching the data instructions to small handler functions
+and the control instructions that end every block inline. LOAD only checks that a
+variable is defined where a forward analysis of the blocks cannot prove it already is.
+
+Runs reproduce the interpreter exactly: same output, same error messages and line
+numbers, the same final stack, variables, call stack, halted flag and program counter,
+and the same instruction count (of stack instructions) and limit checkpoints.
+"""
+
+import operator
+import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bytecode_compiler import BLOCK_TERMINATORS, FOLDABLE, ProgramFault
+from bytecode_interpreter import (
+    ARRAY_OPS,
+    BytecodeInterpreter,
+    build_int_bits_handlers,
+    build_stack_limit_handlers,
+    BytecodeLoadError,
+    ExecutionLimitExceeded,
+    Instruction,
+    IntegerSizeExceeded,
+    OPCODE_NAMES,
+    OP_PUSH,
+    OP_POP,
+    OP_DUP,
+    OP_ADD,
+    OP_SUB,
+    OP_MUL,
+    OP_DIV,
+    OP_MOD,
+    OP_NEG,
+    OP_STORE,
+    OP_LOAD,
+    OP_JMP,
+    OP_JZ,
+    OP_JNZ,
+    OP_HALT,
+    OP_EQ,
+    OP_NEQ,
+    OP_LT,
+    OP_GT,
+    OP_LE,
+    OP_GE,
+    OP_CALL,
+    OP_RET,
+    OP_PRINT,
+    OP_READ,
+    OP_NATIVE,
+    OP_NOP,
+    OP_INVALID,
+    StackLimitExceeded,
+    UNDEFINED,
+)
+
+# Register opcodes. The data instructions come first; every block ends with one of the
+# control instructions from R_JUMP on, or with R_FAIL.
+(
+    R_MOV,
+    R_ADD,
+    R_SUB,
+    R_MUL,
+    R_DIV,
+    R_MOD,
+    R_EQ,
+    R_NEQ,
+    R_LT,
+    R_GT,
+    R_LE,
+    R_GE,
+    R_NEG,
+    R_DEFINED,
+    R_NONZERO,
+    R_BITS,
+    R_DEPTH,
+    R_PRINT,
+    R_READ,
+    R_PUSH,
+    R_PUSHN,
+    R_POPTO,
+    R_STACK,
+    R_NATIVE,
+    R_ARRAY,
+    R_FAIL,
+    R_JUMP,
+    R_BRANCH,
+    R_COMPARE,
+    R_POP_BRANCH,
+    R_CALL,
+    R_RET,
+    R_HALT,
+) = range(33)
+
+# Register opcode of each binary stack opcode.
+BINARY_OPCODES = {
+    OP_ADD: R_ADD,
+    OP_SUB: R_SUB,
+    OP_MUL: R_MUL,
+    OP_DIV: R_DIV,
+    OP_MOD: R_MOD,
+    OP_EQ: R_EQ,
+    OP_NEQ: R_NEQ,
+    OP_LT: R_LT,
+    OP_GT: R_GT,
+    OP_LE: R_LE,
+    OP_GE: R_GE,
+}
+
+# Comparisons a following JZ or JNZ is fused with, and the function R_COMPARE calls.
+COMPARISONS = {
+    R_EQ: operator.eq,
+    R_NEQ: operator.ne,
+    R_LT: operator.lt,
+    R_GT: operator.gt,
+    R_LE: operator.le,
+    R_GE: operator.ge,
+}
+
+# Operators shown in listings.
+SYMBOLS = {
+    R_ADD: "+",
+    R_SUB: "-",
+    R_MUL: "*",
+    R_DIV: "//",
+    R_MOD: "%",
+    R_EQ: "==",
+    R_NEQ: "!=",
+    R_LT: "<",
+    R_GT: ">",
+    R_LE: "<=",
+    R_GE: ">=",
+}
+SYMBOL_OF_FUNCTION = {function: SYMBOLS[op] for op, function in COMPARISONS.items()}
+
+# A control transfer: (target pc, index of the target block's first register instruction
+# or -1 if the target is outside the program, stack instructions in the target block,
+# whether the transfer is backward and so a limit checkpoint).
+Edge = Tuple[int, int, int, bool]
+
+
+class _Edge:
+    """A transfer to target from the instruction at source, resolved into an Edge once the blocks are laid out."""
+
+    __slots__ = ("target", "source")
+
+    def __init__(self, target: int, source: int):
+        self.target = target
+        self.source = source
+
+
+class RegisterProgram:
+    """
+    A program translated to register instructions.
+
+    Attributes:
+    - code: The register instructions of all blocks, as (opcode, a, b, c) tuples.
+    - blocks: Maps the pc of each block's first stack instruction to (index into code,
+      number of stack instructions in the block).
+    - faults: Maps the index of each register instruction that can fail to the failing
+      stack instruction's pc, the registers still on the simulated stack (pushed onto the
+      real one before the error is reported) and the instructions of the block after it.
+    - slot_count: Registers 0 to slot_count - 1 are the program variables.
+    - registers: The initial values of the other registers: the constants, and 0 for the
+      temporaries.
+    - names: The name of every register, for listings.
+    - stack_checks: Whether the code checks the real stack holds the values it pops.
+    - max_int_bits: The bit length computed values are checked against, or None.
+    - max_stack_size: The stack length checked after the instructions that push values, or None.
+    - stack_instructions: The number of stack instructions translated.
+    """
+
+    def __init__(
+        self,
+        code: List[tuple],
+        blocks: Dict[int, Tuple[int, int]],
+        faults: Dict[int, Tuple[int, Tuple[int, ...], int]],
+        slot_count: int,
+        registers: List[Any],
+        names: List[str],
+        stack_checks: bool,
+        stack_instructions: int,
+        max_int_bits: Optional[int] = None,
+        max_stack_size: Optional[int] = None,
+    ):
+        self.code = code
+        self.blocks = blocks
+        self.faults = faults
+        self.slot_count = slot_count
+        self.registers = registers
+        self.names = names
+        self.stack_checks = stack_checks
+        self.stack_instructions = stack_instructions
+        self.max_int_bits = max_int_bits
+        self.max_stack_size = max_stack_size
+
+    def run(self, vm: BytecodeInterpreter) -> Tuple[int, bool]:
+        """
+        Runs the program from its first instruction on the interpreter's stack, variables and
+        call stack, which are updated in place, as is vm.instructions_executed.
+
+        Returns:
+            Tuple[int, bool]: The final program counter and halted flag.
+        Raises:
+            ProgramFault: For a runtime error, after the stack has been restored to what the
+                interpreter would hold at the failing instruction.
+            ExecutionLimitExceeded: If an execution limit is exceeded, at the same checkpoint
+                as the interpreter, or a quota at the instruction that exceeds it.
+        """
+        if 0 not in self.blocks:
+            return 0, False
+        code = self.code
+        blocks = self.blocks
+        stack = vm.stack
+        call_stack = vm.call_stack
+        slots = vm.slots
+        slot_count = self.slot_count
+        regs = slots[:slot_count] + self.registers
+        handlers = _data_handlers(vm, regs, self.stack_checks, self.max_int_bits, self.max_stack_size)
+        checkpoint = vm._checkpoint
+        max_call_depth = vm._max_call_depth
+        executed = vm.instructions_executed
+        next_check = vm._next_check
+        i, size = blocks[0]
+        executed += size
+        pc = 0
+        halted = False
+
+        try:
+            while True:
+                op, a, b, c = code[i]
+                i += 1
+                if op < R_JUMP:
+                    handlers[op](a, b, c)
+                    continue
+                if op == R_COMPARE:
+                    function, x, y = a
+                    edge = b if function(regs[x], regs[y]) else c
+                elif op == R_BRANCH:
+                    edge = b if regs[a] != 0 else c
+                elif op == R_JUMP:
+                    edge = a
+                elif op == R_POP_BRANCH:
+                    if stack:
+                        edge = b if stack.pop() != 0 else c
+                    else:
+                        edge = a
+                elif op == R_CALL:
+                    if len(call_stack) >= max_call_depth:
+                        vm._call_depth_exceeded(c)
+                    call_stack.append(b)
+                    edge = a
+                elif op == R_RET:
+                    if not call_stack:
+                        # RET without a caller halts and leaves the program counter in place.
+                        pc = a
+                        halted = True
+                        break
+                    target = call_stack.pop()
+                    if target <= a and executed >= next_check:
+                        next_check = checkpoint(executed, target)
+                    block = blocks.get(target)
+                    if block is None:
+                        pc = target
+                        break
+                    i, size = block
+                    executed += size
+                    continue
+                else:
+                    pc = a + 1
+                    halted = True
+                    break
+                target, i, size, backward = edge
+                if backward and executed >= next_check:
+                    next_check = checkpoint(executed, target)
+                if i < 0:
+                    pc = target
+                    break
+                executed += size
+        except ExecutionLimitExceeded:
+            fault = self.faults.get(i - 1)
+            if op < R_JUMP and fault is not None:
+                # A quota exceeded by a data instruction stops at its stack instruction.
+                pc, pending, undo = fault
+                stack.extend([regs[register] for register in pending])
+                if op == R_ARRAY:
+                    # NEWARRAY keeps its size on the stack.
+                    stack.extend([regs[register] for register in c])
+                executed -= undo
+                vm.program_counter = pc
+            raise
+        except Exception as e:
+            fault = self.faults.get(i - 1)
+            if fault is None:
+                raise
+            pc, pending, undo = fault
+            stack.extend([regs[register] for register in pending])
+            executed -= undo
+            raise ProgramFault(pc, str(e)) from None
+        finally:
+            vm.instructions_executed = executed
+            vm._next_check = next_check
+            slots[:slot_count] = regs[:slot_count]
+        return pc, halted
+
+    def listing(self) -> str:
+        """Returns the register instructions as text, block by block."""
+        starts = {index: pc for pc, (index, _) in self.blocks.items()}
+        lines = []
+        for index, instruction in enumerate(self.code):
+            if index in starts:
+                pc = starts[index]
+                size = self.blocks[pc][1]
+                plural = "s" if size != 1 else ""
+                lines.append(f"@{pc}: ({size} stack instruction{plural})")
+            lines.append("    " + self._format(instruction))
+        return "\n".join(lines) + "\n"
+
+    def _format(self, instruction: tuple) -> str:
+        op, a, b, c = instruction
+        name = self.names.__getitem__
+        if op == R_MOV:
+            return f"{name(a)} = {name(b)}"
+        if op in SYMBOLS:
+            return f"{name(a)} = {name(b)} {SYMBOLS[op]} {name(c)}"
+        if op == R_NEG:
+            return f"{name(a)} = -{name(b)}"
+        if op == R_DEFINED:
+            return f"check {name(a)} defined"
+        if op == R_NONZERO:
+            return f"check {name(a)} != 0"
+        if op == R_BITS:
+            return f"check {name(a)} fits"
+        if op == R_DEPTH:
+            return f"check stack length <= {a}"
+        if op == R_PRINT:
+            return f"print {name(a)}"
+        if op == R_READ:
+            return f"{name(a)} = read"
+        if op == R_PUSH:
+            return f"push {name(a)}"
+        if op == R_PUSHN:
+            return f"push {', '.join(map(name, a))}"
+        if op == R_POPTO:
+            return f"{name(a)} = pop"
+        if op == R_STACK:
+            return f"stack {OPCODE_NAMES[a]}"
+        if op == R_NATIVE:
+            results = f"{', '.join(map(name, c))} = " if c else ""
+            return f"{results}{a.name}({', '.join(map(name, b))})"
+        if op == R_ARRAY:
+            call = f"{ARRAY_OPS[b][0]}({', '.join(map(name, c))})"
+            return call if a is None else f"{name(a)} = {call}"
+        if op == R_FAIL:
+            return f"fail {a!r}"
+        if op == R_JUMP:
+            return f"jump {_format_edge(a)}"
+        if op == R_BRANCH:
+            return f"if {name(a)} != 0 jump {_format_edge(b)} else {_format_edge(c)}"
+        if op == R_COMPARE:
+            function, x, y = a
+            return f"if {name(x)} {SYMBOL_OF_FUNCTION[function]} {name(y)} jump {_format_edge(b)} else {_format_edge(c)}"
+        if op == R_POP_BRANCH:
+            return f"if pop != 0 jump {_format_edge(b)} else {_format_edge(c)} (empty: {_format_edge(a)})"
+        if op == R_CALL:
+            return f"call {_format_edge(a)} return @{b}"
+        if op == R_RET:
+            return "ret"
+        return "halt"
+
+
+def _format_edge(edge: Edge) -> str:
+    return f"@{edge[0]}"
+
+
+def _data_handlers(
+    vm: BytecodeInterpreter,
+    regs: List[Any],
+    stack_checks: bool,
+    max_int_bits: Optional[int] = None,
+    max_stack_size: Optional[int] = None,
+) -> List[Any]:
+    """Returns the functions that run the data instructions on regs, indexed by register opcode."""
+    stack = vm.stack
+    push = stack.append
+    pop = stack.pop
+    write = vm.output.write
+    read_input = vm.read_input
+    native = vm._handlers if stack_checks else vm._unchecked_handlers
+    if max_int_bits is not None:
+        native = build_int_bits_handlers(vm, native)
+    if max_stack_size is not None:
+        native = build_stack_limit_handlers(vm, native)
+    array_methods = {op: getattr(vm, method) for op, (method, _, _) in ARRAY_OPS.items()}
+
+    def mov(d, x, _):
+        regs[d] = regs[x]
+
+    def add(d, x, y):
+        regs[d] = regs[x] + regs[y]
+
+    def sub(d, x, y):
+        regs[d] = regs[x] - regs[y]
+
+    def mul(d, x, y):
+        regs[d] = regs[x] * regs[y]
+
+    def div(d, x, y):
+        regs[d] = regs[x] // regs[y]
+
+    def mod(d, x, y):
+        regs[d] = regs[x] % regs[y]
+
+    def eq(d, x, y):
+        regs[d] = 1 if regs[x] == regs[y] else 0
+
+    def neq(d, x, y):
+        regs[d] = 1 if regs[x] != regs[y] else 0
+
+    def lt(d, x, y):
+        regs[d] = 1 if regs[x] < regs[y] else 0
+
+    def gt(d, x, y):
+        regs[d] = 1 if regs[x] > regs[y] else 0
+
+    def le(d, x, y):
+        regs[d] = 1 if regs[x] <= regs[y] else 0
+
+    def ge(d, x, y):
+        regs[d] = 1 if regs[x] >= regs[y] else 0
+
+    def neg(d, x, _):
+        regs[d] = -regs[x]
+
+    def defined(x, message, _):
+        if regs[x] is UNDEFINED:
+            raise RuntimeError(message)
+
+    def nonzero(x, message, _):
+        if regs[x] == 0:
+            raise RuntimeError(message)
+
+    def bits(x, _, __):
+        if regs[x].bit_length() > max_int_bits:
+            raise IntegerSizeExceeded(max_int_bits)
+
+    def depth(limit, _, __):
+        if len(stack) > limit:
+            raise StackLimitExceeded(max_stack_size)
+
+    def print_(x, _, __):
+        value = regs[x]
+        if value > 2147483647:
+            raise RuntimeError("OVERFLOW!")
+        write(value)
+
+    def read(d, _, __):
+        regs[d] = read_input()
+
+    def push_one(x, _, __):
+        push(regs[x])
+
+    def push_many(registers, _, __):
+        stack.extend([regs[x] for x in registers])
+
+    def pop_to(d, _, __):
+        if stack:
+            regs[d] = pop()
+
+    def stack_op(opcode, arg, _):
+        native[opcode](arg)
+
+    def call_native(intrinsic, args, results):
+        values = intrinsic.apply([regs[x] for x in args])
+        for d, value in zip(results, values):
+            regs[d] = value
+
+    def array_op(d, opcode, args):
+        value = array_methods[opcode](*[regs[x] for x in args])
+        if d is not None:
+            regs[d] = value
+
+    def fail(message, _, __):
+        raise RuntimeError(message)
+
+    return [
+        mov, add, sub, mul, div, mod, eq, neq, lt, gt, le, ge, neg, defined, nonzero, bits, depth,
+        print_, read, push_one, push_many, pop_to, stack_op, call_native, array_op, fail,
+    ]  # fmt: skip
+
+
+class _Translator:
+    """
+    Translates a decoded instruction stream into register instructions. `slot_names` names
+    the variable slots used by LOAD and STORE. Without `stack_checks`, operations on the
+    real stack assume it holds enough values. With `max_int_bits`, the values computed by
+    the arithmetic instructions, READ and NATIVE are checked against it, and with
+    `max_stack_size` the number of values on the real and simulated stacks after the
+    instructions that push values.
+    """
+
+    def __init__(
+        self,
+        code: List[Instruction],
+        slot_names: List[str],
+        stack_checks: bool = True,
+        max_int_bits: Optional[int] = None,
+        max_stack_size: Optional[int] = None,
+    ):
+        self.code = code
+        self.slot_names = slot_names
+        self.stack_checks = stack_checks
+        self.max_int_bits = max_int_bits
+        self.max_stack_size = max_stack_size
+        self.slot_count = len(slot_names)
+        self.names: List[str] = list(slot_names)
+        self.registers: List[Any] = []
+        self.constants: Dict[int, int] = {}
+        self.constant_registers: Set[int] = set()
+        self.temporaries: Set[int] = set()
+        self.leaders = self._find_leaders()
+
+    def _find_leaders(self) -> List[int]:
+        """Returns the sorted start indices of the basic blocks."""
+        code = self.code
+        leaders = {0} if code else set()
+        for pc, (op, arg) in enumerate(code):
+            if op in BLOCK_TERMINATORS:
+                if pc + 1 < len(code):
+                    leaders.add(pc + 1)
+                if op in (OP_JMP, OP_JZ, OP_JNZ, OP_CALL) and arg < len(code):
+                    leaders.add(arg)
+        return sorted(leaders)
+
+    def _block_end(self, index: int) -> int:
+        return self.leaders[index + 1] if index + 1 < len(self.leaders) else len(self.code)
+
+    def translate(self) -> RegisterProgram:
+        defined_on_entry = self._defined_on_entry()
+        blocks = [self._translate_block(index, defined_on_entry[index]) for index in range(len(self.leaders))]
+
+        starts: Dict[int, Tuple[int, int]] = {}
+        index = 0
+        for block, (out, _) in enumerate(blocks):
+            leader = self.leaders[block]
+            starts[leader] = (index, self._block_end(block) - leader)
+            index += len(out)
+
+        def resolve(edge: _Edge) -> Edge:
+            start, size = starts.get(edge.target, (-1, 0))
+            return (edge.target, start, size, edge.target <= edge.source)
+
+        code: List[tuple] = []
+        faults: Dict[int, Tuple[int, Tuple[int, ...], int]] = {}
+        for out, block_faults in blocks:
+            offset = len(code)
+            for instruction in out:
+                code.append(tuple(resolve(item) if isinstance(item, _Edge) else item for item in instruction))
+            for position, fault in block_faults.items():
+                faults[offset + position] = fault
+        return RegisterProgram(
+            code,
+            starts,
+            faults,
+            self.slot_count,
+            self.registers,
+            self.names,
+            self.stack_checks,
+            len(self.code),
+            self.max_int_bits,
+            self.max_stack_size,
+        )
+
+    # -- definedness analysis ------------------------------------------------------
+
+    def _defined_on_entry(self) -> List[Set[int]]:
+        """
+        Returns, for every block, the variables defined on every path into it, so that
+        their LOADs need no check. Variables never become undefined again, so a block
+        defines at least what it defined when entered with nothing defined, and a CALL
+        returns with at least what was defined when it was made. The program entry starts
+        with nothing defined, and so do the return points of CALLs when the code has stack
+        checks: a call stack left over from an earlier run can then return to them.
+        """
+        count = len(self.leaders)
+        block_of = {pc: index for index, pc in enumerate(self.leaders)}
+        scratch = _Translator(self.code, self.slot_names, self.stack_checks)
+        generated = []
+        for index in range(count):
+            scratch._translate_block(index, set())
+            generated.append(scratch.defined)
+
+        predecessors: List[List[int]] = [[] for _ in range(count)]
+        roots = {0}
+        for index in range(count):
+            end = self._block_end(index)
+            op, arg = self.code[end - 1]
+            successors = []
+            if op in (OP_JMP, OP_JZ, OP_JNZ, OP_CALL):
+                successors.append(arg)
+            if op == OP_CALL and self.stack_checks:
+                roots.add(end)
+            if op not in (OP_JMP, OP_RET, OP_HALT, OP_INVALID):
+                successors.append(end)
+            for target in successors:
+                if target in block_of:
+                    predecessors[block_of[target]].append(index)
+
+        entry: List[Optional[Set[int]]] = [None] * count
+        for pc in roots:
+            if pc in block_of:
+                entry[block_of[pc]] = set()
+        changed = True
+        while changed:
+            changed = False
+            for index in range(count):
+                if self.leaders[index] in roots:
+                    continue
+                incoming = [entry[p] | generated[p] for p in predecessors[index] if entry[p] is not None]
+                if not incoming:
+                    continue
+                defined = set.intersection(*incoming)
+                if defined != entry[index]:
+                    entry[index] = defined
+                    changed = True
+        return [defined if defined is not None else set() for defined in entry]
+
+    # -- block translation ---------------------------------------------------------
+
+    def _constant(self, value: int) -> int:
+        register = self.constants.get(value)
+        if register is None:
+            register = self.slot_count + len(self.registers)
+            self.registers.append(value)
+            self.names.append(repr(value))
+            self.constants[value] = register
+            self.constant_registers.add(register)
+        return register
+
+    def _new_temp(self) -> int:
+        register = self.slot_count + len(self.registers)
+        self.registers.append(0)
+        self.names.append(f"t{len(self.temporaries) + 1}")
+        self.temporaries.add(register)
+        return register
+
+    def _translate_block(self, index: int, defined: Set[int]) -> Tuple[List[tuple], Dict[int, tuple]]:
+        start = self.leaders[index]
+        end = self._block_end(index)
+        self.block_end = end
+        self.out: List[tuple] = []
+        self.faults: Dict[int, tuple] = {}
+        self.sym: List[int] = []
+        self.defined = set(defined)
+        # The temporary written by the last emitted instruction, which a STORE can retarget.
+        self.last_temp: Optional[int] = None
+
+        for pc in range(start, end):
+            op, arg = self.code[pc]
+            if self._translate_instruction(pc, op, arg):
+                return self.out, self.faults
+        self._flush()
+        self._emit((R_JUMP, _Edge(end, end - 1), 0, 0))
+        return self.out, self.faults
+
+    def _emit(self, instruction: tuple, pc: Optional[int] = None, pending: Tuple[int, ...] = ()) -> None:
+        """Appends an instruction; one that can fail at pc records the registers to restore to the stack."""
+        if pc is not None:
+            self.faults[len(self.out)] = (pc, pending, self.block_end - pc - 1)
+        self.out.append(instruction)
+        self.last_temp = None
+
+    def _define(self, op: int, a: Any = 0, b: Any = 0) -> int:
+        """Emits an instruction computing a new temporary, pushes it and returns it."""
+        temp = self._new_temp()
+        self._emit((op, temp, a, b))
+        self.last_temp = temp
+        self.sym.append(temp)
+        return temp
+
+    def _flush(self) -> None:
+        """Pushes the simulated stack onto the real stack."""
+        sym = self.sym
+        if len(sym) == 1:
+            self._emit((R_PUSH, sym[0], 0, 0))
+        elif sym:
+            self._emit((R_PUSHN, tuple(sym), 0, 0))
+        self.sym = []
+
+    def _check_bits(self, pc: int, register: int) -> None:
+        """With max_int_bits, emits the check of a value the instruction at pc computed and pushed."""
+        if self.max_int_bits is not None:
+            self._emit((R_BITS, register, 0, 0), pc, tuple(self.sym))
+
+    def _check_depth(self, pc: int) -> None:
+        """
+        With max_stack_size, emits the check of the stack length after the instruction at pc,
+        which can have pushed values, counting the ones still on the simulated stack.
+        """
+        if self.max_stack_size is not None:
+            self._emit((R_DEPTH, self.max_stack_size - len(self.sym), 0, 0), pc, tuple(self.sym))
+
+    def _fits(self, value: int) -> bool:
+        """Whether a constant computed at translation time passes the max_int_bits check."""
+        return self.max_int_bits is None or value.bit_length() <= self.max_int_bits
+
+    def _stack_op(self, pc: int, op: int, arg: Any) -> None:
+        """Runs the interpreter's handler for op on the real stack."""
+        self._flush()
+        self._emit((R_STACK, op, arg, 0), pc)
+
+    def _translate_instruction(self, pc: int, op: int, arg: Any) -> bool:
+        """Translates one instruction; returns True if it ends the block."""
+        sym = self.sym
+        if op == OP_PUSH:
+            sym.append(self._constant(arg))
+            self._check_depth(pc)
+        elif op == OP_POP:
+            if sym:
+                sym.pop()
+            else:
+                self._stack_op(pc, op, arg)
+        elif op == OP_DUP:
+            if sym:
+                sym.append(sym[-1])
+                self._check_depth(pc)
+            else:
+                self._stack_op(pc, op, arg)
+        elif op in BINARY_OPCODES:
+            self._translate_binary(pc, op, arg)
+        elif op == OP_NEG:
+            if not sym:
+                self._stack_op(pc, op, arg)
+            elif sym[-1] in self.constant_registers and self._fits(-self._value(sym[-1])):
+                sym.append(self._constant(-self._value(sym.pop())))
+            else:
+                self._check_bits(pc, self._define(R_NEG, sym.pop()))
+        elif op == OP_STORE:
+            self._translate_store(arg)
+        elif op == OP_LOAD:
+            if arg not in self.defined:
+                self._emit((R_DEFINED, arg, f"Undefined variable: {self.slot_names[arg]}", 0), pc, tuple(sym))
+                self.defined.add(arg)
+            sym.append(arg)
+            self._check_depth(pc)
+        elif op == OP_JMP:
+            self._flush()
+            self._emit((R_JUMP, _Edge(arg, pc), 0, 0))
+            return True
+        elif op == OP_JZ or op == OP_JNZ:
+            self._translate_conditional(pc, op, arg)
+            return True
+        elif op == OP_HALT:
+            self._flush()
+            self._emit((R_HALT, pc, 0, 0))
+            return True
+        elif op == OP_CALL:
+            self._flush()
+            self._emit((R_CALL, _Edge(arg, pc), pc + 1, pc))
+            return True
+        elif op == OP_RET:
+            self._flush()
+            self._emit((R_RET, pc, 0, 0))
+            return True
+        elif op == OP_PRINT:
+            if sym:
+                self._emit((R_PRINT, sym[-1], 0, 0), pc, tuple(sym))
+            else:
+                self._stack_op(pc, op, arg)
+        elif op == OP_READ:
+            self._check_bits(pc, self._define(R_READ))
+            self._check_depth(pc)
+        elif op == OP_NATIVE:
+            if len(sym) < arg.arguments:
+                self._stack_op(pc, op, arg)
+            else:
+                args = tuple(sym[len(sym) - arg.arguments :])
+                del sym[len(sym) - arg.arguments :]
+                results = tuple(self._new_temp() for _ in range(arg.results))
+                self._emit((R_NATIVE, arg, args, results), pc, tuple(sym))
+                sym.extend(results)
+                for result in results:
+                    self._check_bits(pc, result)
+                self._check_depth(pc)
+        elif op in ARRAY_OPS:
+            _, count, results = ARRAY_OPS[op]
+            if len(sym) < count:
+                self._stack_op(pc, op, arg)
+            else:
+                args = tuple(sym[len(sym) - count :])
+                del sym[len(sym) - count :]
+                result = self._new_temp() if results else None
+                self._emit((R_ARRAY, result, op, args), pc, tuple(sym))
+                if result is not None:
+                    self.last_temp = result
+                    sym.append(result)
+        elif op == OP_INVALID:
+            self._emit((R_FAIL, arg, 0, 0), pc, tuple(sym))
+            self.sym = []
+            return True
+        elif op != OP_NOP:
+            raise ValueError(f"Cannot translate opcode {op}")
+        return False
+
+    def _value(self, register: int) -> int:
+        return self.registers[register - self.slot_count]
+
+    def _translate_binary(self, pc: int, op: int, arg: Any) -> None:
+        sym = self.sym
+        if len(sym) < 2:
+            # Not enough simulated values: fall back to operating on the real stack.
+            self._stack_op(pc, op, arg)
+            return
+        b = sym.pop()
+        a = sym.pop()
+        constants = self.constant_registers
+        if a in constants and b in constants:
+            x, y = self._value(a), self._value(b)
+            value = None
+            if op in FOLDABLE:
+                value = int(FOLDABLE[op](x, y))
+            elif y != 0:
+                value = x // y if op == OP_DIV else x % y
+            if value is not None and self._fits(value):
+                sym.append(self._constant(value))
+                return
+        if op in (OP_DIV, OP_MOD) and not (b in constants and self._value(b) != 0):
+            message = "Division by zero" if op == OP_DIV else "Modulo by zero"
+            self._emit((R_NONZERO, b, message, 0), pc, tuple(sym))
+        result = self._define(BINARY_OPCODES[op], a, b)
+        if BINARY_OPCODES[op] not in COMPARISONS:
+            self._check_bits(pc, result)
+
+    def _translate_store(self, slot: int) -> None:
+        sym = self.sym
+        if not sym:
+            self._emit((R_POPTO, slot, 0, 0))
+            if not self.stack_checks:
+                self.defined.add(slot)
+            return
+        value = sym.pop()
+        if slot in sym:
+            # Values read from the variable earlier are still on the stack: keep the old value.
+            copy = self._new_temp()
+            self._emit((R_MOV, copy, slot, 0))
+            self.sym = sym = [copy if entry == slot else entry for entry in sym]
+        if value == self.last_temp and value not in sym:
+            # Compute the value straight into the variable instead of a temporary.
+            op, _, a, b = self.out[-1]
+            self.out[-1] = (op, slot, a, b)
+        elif value != slot:
+            self._emit((R_MOV, slot, value, 0))
+        self.last_temp = None
+        self.defined.add(slot)
+
+    def _translate_conditional(self, pc: int, op: int, target: int) -> None:
+        sym = self.sym
+        taken = _Edge(target, pc)
+        following = _Edge(pc + 1, pc)
+        if not sym:
+            if op == OP_JZ:
+                instruction = (R_POP_BRANCH, following, following, taken)
+            else:
+                instruction = (R_POP_BRANCH, following, taken, following)
+            self._emit(instruction)
+            return
+        condition = sym.pop()
+        fused = condition == self.last_temp and condition not in sym and self.out[-1][0] in COMPARISONS
+        if fused:
+            # The pushes that flush the stack do not write registers, so the comparison can
+            # move past them into the branch.
+            comparison, _, a, b = self.out.pop()
+        self._flush()
+        if fused:
+            true, false = (following, taken) if op == OP_JZ else (taken, following)
+            self._emit((R_COMPARE, (COMPARISONS[comparison], a, b), true, false))
+        elif op == OP_JZ:
+            self._emit((R_BRANCH, condition, following, taken))
+        else:
+            self._emit((R_BRANCH, condition, taken, following))
+
+
+def translate_program(
+    code: List[Instruction],
+    slot_names: List[str],
+    stack_checks: bool = True,
+    max_int_bits: Optional[int] = None,
+    max_stack_size: Optional[int] = None,
+) -> RegisterProgram:
+    """
+    Translates a decoded instruction stream (BytecodeInterpreter.code) into register instructions.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+        slot_names (List[str]): The variable name of each slot (BytecodeInterpreter.slot_names).
+        stack_checks (bool): Whether the register code checks that the real stack holds the values
+            an instruction consumes; pass False only for a program that passed stack verification.
+        max_int_bits (Optional[int]): The bit length the values computed by the arithmetic
+            instructions, READ and NATIVE are checked against, or None for no check.
+        max_stack_size (Optional[int]): The stack length checked after the instructions that
+            push values, or None for no check.
+    Returns:
+        RegisterProgram: The register instructions.
+    """
+    return _Translator(code, slot_names, stack_checks, max_int_bits, max_stack_size).translate()
+
+
+def main():
+    """Prints the register instructions translated from a bytecode file."""
+    if len(sys.argv) < 2:
+        print("Usage: python bytecode_register.py <input_file>", file=sys.stderr)
+        sys.exit(1)
+    input_file = sys.argv[1]
+    try:
+        with open(input_file, "r", encoding="utf-8") as f:
+            bytecode = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    interpreter = BytecodeInterpreter()
+    try:
+        interpreter.load_program(bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    program = translate_program(interpreter.code, interpreter.slot_names)
+    print(program.listing(), end="")
+    print(f"# {program.stack_instructions} stack instructions, {len(program.code)} register instructions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Load-time stack-depth verifier for decoded bytecode.
+
+The verifier is an abstract interpreter over the control-flow graph of a decoded
+instruction stream (BytecodeInterpreter.code). It tracks how many values are on the
+operand stack before every instruction, without running the program:
+
+- Every subroutine (the program entry and each CALL target reached from it) is analysed
+  on its own, with depths relative to the depth at which it was entered. Like a JVM
+  verifier, it requires every instruction to be reached with one depth: a loop that
+  leaves an extra value behind on each iteration cannot be verified.
+- A CALL continues at the following instruction with the depth the subroutine returns
+  with, the same for all of its RETs.
+- The absolute depths follow from the call graph: a subroutine is entered with at least
+  (at most) the smallest (largest) depth any of its call sites has.
+
+An instruction that may find fewer values on the stack than it consumes is an underflow.
+A verified program has no underflows, so the interpreter runs it without checking the
+stack length before each instruction, and its maximum depth bounds the stack of any run
+that starts with an empty call stack.
+"""
+
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from bytecode_interpreter import (
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    Instruction,
+    OPCODE_NAMES,
+    OP_PUSH,
+    OP_POP,
+    OP_DUP,
+    OP_ADD,
+    OP_SUB,
+    OP_MUL,
+    OP_DIV,
+    OP_MOD,
+    OP_NEG,
+    OP_STORE,
+    OP_LOAD,
+    OP_JMP,
+    OP_JZ,
+    OP_JNZ,
+    OP_HALT,
+    OP_EQ,
+    OP_NEQ,
+    OP_LT,
+    OP_GT,
+    OP_LE,
+    OP_GE,
+    OP_CALL,
+    OP_RET,
+    OP_PRINT,
+    OP_READ,
+    OP_NATIVE,
+    OP_NEWARRAY,
+    OP_ALOAD,
+    OP_ASTORE,
+    OP_ALEN,
+    OP_AFILL,
+    OP_ACOPY,
+    OP_NOP,
+    OP_INVALID,
+)
+
+# The number of values each opcode consumes from the stack and the number it leaves in
+# their place. PRINT and DUP read the top value, so they consume it and put it back.
+# NATIVE has the stack signature of the intrinsic it calls, see stack_effect.
+STACK_EFFECTS: Dict[int, Tuple[int, int]] = {
+    OP_PUSH: (0, 1),
+    OP_POP: (1, 0),
+    OP_DUP: (1, 2),
+    OP_ADD: (2, 1),
+    OP_SUB: (2, 1),
+    OP_MUL: (2, 1),
+    OP_DIV: (2, 1),
+    OP_MOD: (2, 1),
+    OP_NEG: (1, 1),
+    OP_STORE: (1, 0),
+    OP_LOAD: (0, 1),
+    OP_JMP: (0, 0),
+    OP_JZ: (1, 0),
+    OP_JNZ: (1, 0),
+    OP_HALT: (0, 0),
+    OP_EQ: (2, 1),
+    OP_NEQ: (2, 1),
+    OP_LT: (2, 1),
+    OP_GT: (2, 1),
+    OP_LE: (2, 1),
+    OP_GE: (2, 1),
+    OP_CALL: (0, 0),
+    OP_RET: (0, 0),
+    OP_PRINT: (1, 1),
+    OP_READ: (0, 1),
+    OP_NEWARRAY: (1, 1),
+    OP_ALOAD: (2, 1),
+    OP_ASTORE: (3, 0),
+    OP_ALEN: (1, 1),
+    OP_AFILL: (4, 0),
+    OP_ACOPY: (5, 0),
+    OP_NOP: (0, 0),
+    OP_INVALID: (0, 0),
+}
+
+
+def stack_effect(op: int, arg: object) -> Tuple[int, int]:
+    """Returns the values the instruction (op, arg) consumes and the number it leaves in their place."""
+    if op == OP_NATIVE:
+        return arg.arguments, arg.results
+    return STACK_EFFECTS[op]
+
+
+# Relative depth recorded for a RET reached with two different depths.
+_CONFLICT = object()
+
+
+class StackAnalysis:
+    """
+    The result of analyze_stack.
+
+    - depths: The smallest stack depth before each instruction over all runs that start
+      with an empty stack, or None for instructions that are never reached.
+    - max_depth: The largest stack depth such a run can reach, or None if the program is
+      not verified or recursion lets the stack grow without bound.
+    - underflows: (index, message) for each instruction that may find too few values on
+      the stack, in program order.
+    - conflicts: (index, message) for each instruction reached with different relative
+      depths, which leaves the program unverified.
+    - subroutine_depths: For the program entry and each CALL target, the depth before each of
+      the instructions reachable from it, relative to the depth it was entered with.
+    - returns: For the same entries, the relative depth their RETs return with, or None if
+      they never return or return with different depths.
+    """
+
+    def __init__(
+        self,
+        depths: List[Optional[int]],
+        max_depth: Optional[int],
+        underflows: List[Tuple[int, str]],
+        conflicts: List[Tuple[int, str]],
+        subroutine_depths: Optional[Dict[int, Dict[int, int]]] = None,
+        returns: Optional[Dict[int, Optional[int]]] = None,
+    ):
+        self.depths = depths
+        self.max_depth = max_depth
+        self.underflows = underflows
+        self.conflicts = conflicts
+        self.subroutine_depths = subroutine_depths if subroutine_depths is not None else {}
+        self.returns = returns if returns is not None else {}
+
+    @property
+    def verified(self) -> bool:
+        """True if every reachable instruction is proven to find the values it consumes."""
+        return not self.underflows and not self.conflicts
+
+
+class _Subroutine:
+    """
+    The intraprocedural analysis of the code reachable from one entry point: the depth
+    before each instruction relative to the entry depth, the depth RET returns with, and
+    the (index, relative depth, target) of every CALL.
+    """
+
+    def __init__(self, entry: int):
+        self.entry = entry
+        self.depths: Dict[int, int] = {}
+        self.returns: object = None
+        self.calls: List[Tuple[int, int, int]] = []
+        self.conflicts: List[Tuple[int, str]] = []
+
+    def analyze(self, code: List[Instruction], returns: Dict[int, object]) -> None:
+        """Computes the relative depths, given what is known about each callee's RET."""
+        depths = self.depths = {self.entry: 0}
+        self.returns = None
+        self.calls = []
+        self.conflicts = []
+        pending = [self.entry]
+        while pending:
+            pc = pending.pop()
+            depth = depths[pc]
+            op, arg = code[pc]
+            pops, pushes = stack_effect(op, arg)
+            if op == OP_INVALID or op == OP_HALT:
+                continue
+            if op == OP_RET:
+                if self.returns is None:
+                    self.returns = depth
+                elif self.returns != depth:
+                    self.returns = _CONFLICT
+                continue
+            if op == OP_JMP:
+                successors = [(arg, depth)]
+            elif op == OP_JZ or op == OP_JNZ:
+                successors = [(arg, depth - 1), (pc + 1, depth - 1)]
+            elif op == OP_CALL:
+                self.calls.append((pc, depth, arg))
+                effect = returns.get(arg)
+                successors = [(pc + 1, depth + effect)] if isinstance(effect, int) else []
+            else:
+                successors = [(pc + 1, depth - pops + pushes)]
+            for target, target_depth in successors:
+                if target >= len(code):
+                    continue
+                if target not in depths:
+                    depths[target] = target_depth
+                    pending.append(target)
+                elif depths[target] != target_depth:
+                    self.conflicts.append(
+                        (target, f"reached with {depths[target]} and {target_depth} values")
+                    )
+
+
+def _entry_bounds(
+    subroutines: Dict[int, _Subroutine], better, unbounded: float
+) -> Dict[int, float]:
+    """
+    Propagates entry depths along the call graph: the program entry starts at depth 0 and
+    a callee gets the better (min or max) of its callers' entry depth plus the relative
+    depth of the call. Cycles that keep improving (recursion that shrinks or grows the
+    stack on every level) converge to `unbounded`.
+    """
+    bounds: Dict[int, float] = {0: 0}
+    rounds = len(subroutines)
+    for round_number in range(2 * rounds + 1):
+        changed = False
+        for entry, subroutine in subroutines.items():
+            if entry not in bounds:
+                continue
+            for _, depth, target in subroutine.calls:
+                if target not in subroutines:
+                    continue
+                candidate = bounds[entry] + depth
+                if target not in bounds or better(candidate, bounds[target]) != bounds[target]:
+                    # After `rounds` rounds every finite bound has settled.
+                    bounds[target] = unbounded if round_number >= rounds else candidate
+                    changed = True
+        if not changed:
+            break
+    return bounds
+
+
+def _join(known: object, found: object) -> object:
+    """Combines the RET depths of a subroutine found in two analyses; conflicts are kept."""
+    if known is None or known == found:
+        return found if found is not None else known
+    if found is None:
+        return known
+    return _CONFLICT
+
+
+def analyze_stack(code: List[Instruction]) -> StackAnalysis:
+    """
+    Computes the stack depth at every instruction of a decoded instruction stream.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+    Returns:
+        StackAnalysis: The depths, maximum depth, underflows and conflicts.
+    """
+    subroutines: Dict[int, _Subroutine] = {}
+    returns: Dict[int, object] = {}
+    seen: Set[int] = set()
+    changed = bool(code)
+    while changed:
+        # A subroutine's RET depth only goes from unknown to known to conflicting, and
+        # knowing it makes the instructions after its call sites reachable, so this settles.
+        changed = False
+        pending = [0]
+        seen = set()
+        while pending:
+            entry = pending.pop()
+            if entry in seen:
+                continue
+            seen.add(entry)
+            subroutine = subroutines.setdefault(entry, _Subroutine(entry))
+            subroutine.analyze(code, returns)
+            joined = _join(returns.get(entry), subroutine.returns)
+            if joined is not returns.get(entry) and joined != returns.get(entry):
+                returns[entry] = joined
+                changed = True
+            pending.extend(target for _, _, target in subroutine.calls if target < len(code))
+    # A RET depth that turns into a conflict cuts off the code after the calls of its
+    # subroutine, and with it the subroutines that were only called from there.
+    subroutines = {entry: subroutine for entry, subroutine in subroutines.items() if entry in seen}
+
+    lowest = _entry_bounds(subroutines, min, float("-inf"))
+    highest = _entry_bounds(subroutines, max, float("inf"))
+
+    low_depths: List[Optional[float]] = [None] * len(code)
+    peak = 0.0
+    conflicts: List[Tuple[int, str]] = []
+    for entry, subroutine in subroutines.items():
+        conflicts.extend(subroutine.conflicts)
+        if returns.get(entry) is _CONFLICT:
+            conflicts.append((entry, "the subroutine returns with different stack depths"))
+        for pc, depth in subroutine.depths.items():
+            low = lowest[entry] + depth
+            if low_depths[pc] is None or low < low_depths[pc]:
+                low_depths[pc] = low
+            pops, pushes = stack_effect(*code[pc])
+            peak = max(peak, highest[entry] + depth + max(0, pushes - pops))
+
+    underflows = []
+    for pc, low in enumerate(low_depths):
+        op, arg = code[pc]
+        pops = stack_effect(op, arg)[0]
+        if pops and low is not None and low < pops:
+            available = max(int(low), 0) if low != float("-inf") else "fewer"
+            values = "value" if pops == 1 else "values"
+            name = f"NATIVE {arg.name}" if op == OP_NATIVE else OPCODE_NAMES[op]
+            underflows.append(
+                (pc, f"Stack underflow: {name} needs {pops} {values}, {available} may be on the stack")
+            )
+    conflicts.sort()
+    depths = [None if low is None else 0 if low < 0 else int(low) for low in low_depths]
+    verified = not underflows and not conflicts
+    max_depth = int(peak) if verified and peak != float("inf") else None
+    return StackAnalysis(
+        depths,
+        max_depth,
+        underflows,
+        conflicts,
+        {entry: subroutine.depths for entry, subroutine in subroutines.items()},
+        {entry: returns[entry] if isinstance(returns.get(entry), int) else None for entry in subroutines},
+    )
+
+
+# Instructions that read or write state other than the operand stack, or end the program.
+_IMPURE_OPS = frozenset(
+    {
+        OP_STORE,
+        OP_LOAD,
+        OP_PRINT,
+        OP_READ,
+        OP_NATIVE,
+        OP_NEWARRAY,
+        OP_ALOAD,
+        OP_ASTORE,
+        OP_ALEN,
+        OP_AFILL,
+        OP_ACOPY,
+        OP_HALT,
+        OP_INVALID,
+    }
+)
+
+
+class PureSubroutine:
+    """
+    A CALL target that is a function of the values on top of the stack: it reads nothing but
+    its `arguments` values and returns with `results` values in their place, and neither
+    it nor anything it calls touches variables, the heap, input or output.
+    """
+
+    __slots__ = ("entry", "arguments", "results")
+
+    def __init__(self, entry: int, arguments: int, results: int):
+        self.entry = entry
+        self.arguments = arguments
+        self.results = results
+
+    def __repr__(self) -> str:
+        return f"PureSubroutine({self.entry}, arguments={self.arguments}, results={self.results})"
+
+
+def find_pure_subroutines(
+    code: List[Instruction], analysis: Optional[StackAnalysis] = None
+) -> Dict[int, PureSubroutine]:
+    """
+    Finds the CALL targets whose result depends only on their stack arguments.
+
+    A target is pure if every instruction reachable from it before its RETs only moves values
+    on the stack, every RET returns with the same relative depth, no instruction is reached
+    with different depths and it only calls pure targets. Its arguments are the deepest values
+    below the entry depth that it or its callees consume.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+        analysis (Optional[StackAnalysis]): The analyze_stack result for code, computed if None.
+    Returns:
+        Dict[int, PureSubroutine]: The pure subroutines by entry index.
+    """
+    if analysis is None:
+        analysis = analyze_stack(code)
+    conflicted = {pc for pc, _ in analysis.conflicts}
+    targets = {arg for op, arg in code if op == OP_CALL}
+    arguments: Dict[int, int] = {}
+    for entry, depths in analysis.subroutine_depths.items():
+        if entry not in targets or analysis.returns.get(entry) is None:
+            continue
+        if any(code[pc][0] in _IMPURE_OPS or pc in conflicted for pc in depths):
+            continue
+        arguments[entry] = 0
+
+    # Optimistically assume every candidate is pure and needs no arguments, then drop and
+    # grow them until nothing changes. A recursion that reaches deeper into its caller's
+    # stack on every level would grow without bound, so those are dropped after as many
+    # rounds as there are candidates.
+    rounds = len(arguments)
+    round_number = 0
+    changed = True
+    while changed:
+        changed = False
+        round_number += 1
+        for entry in list(arguments):
+            needed = 0
+            for pc, depth in analysis.subroutine_depths[entry].items():
+                op, arg = code[pc]
+                if op == OP_CALL:
+                    if arg not in arguments:
+                        needed = None
+                        break
+                    needed = max(needed, arguments[arg] - depth)
+                else:
+                    needed = max(needed, stack_effect(op, arg)[0] - depth)
+            if needed is None or (needed != arguments[entry] and round_number > rounds):
+                del arguments[entry]
+                changed = True
+            elif needed != arguments[entry]:
+                arguments[entry] = needed
+                changed = True
+    return {
+        entry: PureSubroutine(entry, count, analysis.returns[entry] + count)
+        for entry, count in sorted(arguments.items())
+    }
+
+
+def main():
+    """Prints the stack depth before every instruction of a bytecode file and any problems found."""
+    if len(sys.argv) < 2:
+        print("Usage: python bytecode_verifier.py <input_file>", file=sys.stderr)
+        sys.exit(1)
+    input_file = sys.argv[1]
+    try:
+        with open(input_file, "r", encoding="utf-8") as f:
+            bytecode = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+    interpreter = BytecodeInterpreter()
+    try:
+        interpreter.load_program(bytecode)
+    except BytecodeLoadError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    analysis = analyze_stack(interpreter.code)
+    for pc, depth in enumerate(analysis.depths):
+        line = interpreter.line_numbers[pc]
+        shown = "-" if depth is None else depth
+        print(f"{line:>5} {shown:>5}  {interpreter.instructions[line - 1]}")
+    for pc, message in analysis.underflows:
+        print(f"Line {interpreter.line_numbers[pc]}: {message}")
+    for pc, message in analysis.conflicts:
+        print(f"Line {interpreter.line_numbers[pc]}: Stack depth cannot be verified: {message}")
+    if analysis.verified:
+        print(f"Verified, maximum stack depth {analysis.max_depth if analysis.max_depth is not None else 'unbounded'}")
+    else:
+        print("Not verified")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,16 @@ class Config:
 
     SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-secret-key-change-in-production"
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_TIME_LIMIT = 10.0  # Largest time_limit an /api/run request may ask for, in seconds
+    MAX_OUTPUT_BYTES = 1024 * 1024  # PRINT output kept per run; later lines are dropped
+    # Quotas of every /run and /api/run run, and the largest values a request may ask for.
+    # A full stack of the largest integers takes about 50 MB.
+    MAX_STACK_SIZE = 100_000  # Values on the stack
+    MAX_INT_BITS = 4096  # Bit length of any value
+    MAX_CALL_DEPTH = 10_000  # Nested calls
+    MAX_HEAP_SIZE = 1_000_000  # Array elements, 8 bytes each
+    RUN_ENGINE = "tiered"  # Engine of /run and /api/run runs that do not name one
+    PROGRAM_CACHE_SIZE = 128  # Decoded programs kept for reuse by /run and /api/run
 
 
 class DevelopmentConfig(Config):
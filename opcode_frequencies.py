@@ -0,0 +1,153 @@
+"""
+Counts opcode pairs, triples and quadruples over a corpus of bytecode programs.
+
+This is the data the superinstruction catalogue (SUPERINSTRUCTIONS in
+bytecode_interpreter.py) is chosen from. Two counts are reported for every sequence:
+how often it appears in the program text (static) and how often it is executed as a
+straight run of consecutive instructions (executed), which is what fusing it saves.
+Sequences already covered by a superinstruction are marked with '*'.
+
+Usage:
+    python opcode_frequencies.py [--top N] [--iterations N] [FILE ...]
+
+Without files the corpus is tests/*.bc plus the benchmark workloads. Programs still
+running after MAX_STEPS instructions (such as tests/test_infinite_loop.bc) only
+contribute static counts.
+"""
+
+import argparse
+import glob
+import os
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from benchmark import WORKLOADS
+from bytecode_input import IterableSource
+from bytecode_interpreter import (
+    OPCODE_NAMES,
+    SUPERINSTRUCTIONS,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    Instruction,
+)
+from bytecode_output import ListSink
+
+# Sequence lengths that are counted.
+LENGTHS = (2, 3, 4)
+
+# Executed instructions recorded per program.
+MAX_STEPS = 100000
+
+
+def executed_indices(interpreter: BytecodeInterpreter, max_steps: int = MAX_STEPS) -> List[int]:
+    """
+    Runs the loaded program one instruction at a time and records what was executed.
+
+    PRINT and READ use the interpreter's output sink and input source. A runtime error ends
+    the run.
+
+    Args:
+        interpreter (BytecodeInterpreter): An interpreter with a program loaded.
+        max_steps (int): The maximum number of instructions to execute.
+    Returns:
+        List[int]: The index in interpreter.code of every executed instruction, in order.
+    """
+    code = interpreter.code
+    trace: List[int] = []
+    interpreter.program_counter = 0
+    interpreter.halted = False
+    while (
+        not interpreter.halted
+        and interpreter.program_counter < len(code)
+        and len(trace) < max_steps
+    ):
+        trace.append(interpreter.program_counter)
+        try:
+            interpreter.execute_instruction(*code[interpreter.program_counter])
+        except Exception:
+            break
+    return trace
+
+
+def sequence_counts(code: List[Instruction], indices: List[int], length: int) -> Counter:
+    """
+    Counts the opcode sequences of a given length in a run of instruction indices.
+
+    Args:
+        code (List[Instruction]): The decoded instructions, as built by load_program.
+        indices (List[int]): Instruction indices in execution order: every index for the
+                             program text, or the trace returned by executed_indices.
+        length (int): The number of consecutive instructions in a sequence.
+    Returns:
+        Counter: Opcode name tuples mapped to the number of times the indices run through
+                 that many consecutive instructions with those opcodes.
+    """
+    counts: Counter = Counter()
+    for i in range(len(indices) - length + 1):
+        start = indices[i]
+        if all(indices[i + j] == start + j for j in range(1, length)):
+            counts[tuple(OPCODE_NAMES[code[start + j][0]] for j in range(length))] += 1
+    return counts
+
+
+def is_fused(sequence: Tuple[str, ...]) -> bool:
+    """Returns True if some superinstruction covers exactly this opcode sequence."""
+    ops = [OPCODE_NAMES.index(name) for name in sequence]
+    return any(
+        len(pattern) == len(ops) and all(op in accepted for op, accepted in zip(ops, pattern))
+        for pattern, _ in SUPERINSTRUCTIONS
+    )
+
+
+def corpus(files: List[str], iterations: int) -> Dict[str, str]:
+    """Returns the programs to analyse, by name."""
+    if not files:
+        tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+        files = sorted(glob.glob(os.path.join(tests_dir, "*.bc")))
+        programs = {
+            f"benchmark:{name}": template.format(n=iterations)
+            for name, template in WORKLOADS.items()
+        }
+    else:
+        programs = {}
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            programs[path] = f.read()
+    return programs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count opcode sequences over bytecode programs.")
+    parser.add_argument(
+        "files", nargs="*", help="bytecode files (default: tests/*.bc and the benchmarks)"
+    )
+    parser.add_argument("--top", type=int, default=12, help="sequences listed per length")
+    parser.add_argument(
+        "--iterations", type=int, default=100, help="loop count of the benchmark workloads"
+    )
+    options = parser.parse_args()
+
+    static = {length: Counter() for length in LENGTHS}
+    executed = {length: Counter() for length in LENGTHS}
+    for source in corpus(options.files, options.iterations).values():
+        interpreter = BytecodeInterpreter(output=ListSink(), inputs=IterableSource([]))
+        try:
+            interpreter.load_program(source)
+        except BytecodeLoadError:
+            continue
+        code = interpreter.code
+        trace = executed_indices(interpreter)
+        for length in LENGTHS:
+            static[length] += sequence_counts(code, list(range(len(code))), length)
+            if len(trace) < MAX_STEPS:
+                executed[length] += sequence_counts(code, trace, length)
+
+    for length in LENGTHS:
+        print(f"\n{'sequence':<32}{'executed':>10}{'static':>8}")
+        for sequence, count in executed[length].most_common(options.top):
+            marker = "*" if is_fused(sequence) else " "
+            print(f"{marker} {' '.join(sequence):<30}{count:>10}{static[length][sequence]:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Content-addressed cache of decoded programs.
+
+A ProgramCache maps the SHA-256 of a program's source, together with the loader settings
+of the interpreter (superinstructions, verify_stack, strict_stack), to the DecodedProgram
+built by load_program. Loading a cached program through the cache skips decoding, label
+resolution, superinstruction fusion and stack verification; the interpreter only allocates
+its own stack, slots and call stack. The least recently used entry is evicted once the
+cache holds max_entries programs.
+
+Programs that fail to load are not cached. The cache is safe to share between threads.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from bytecode_interpreter import BytecodeInterpreter, DecodedProgram
+
+DEFAULT_MAX_ENTRIES = 128
+
+CacheKey = Tuple[str, bool, bool, bool]
+
+
+class ProgramCache:
+    """
+    A bounded LRU cache of decoded programs keyed by the hash of their source.
+
+    Attributes:
+    - max_entries: The number of programs kept before the least recently used is evicted.
+    - hits, misses, evictions: Counters since the cache was created or cleared.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[CacheKey, DecodedProgram]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source: str, interpreter: BytecodeInterpreter) -> CacheKey:
+        """Returns the cache key of source loaded by interpreter."""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return digest, interpreter.superinstructions, interpreter.verify_stack, interpreter.strict_stack
+
+    def load(self, interpreter: BytecodeInterpreter, source: str) -> bool:
+        """
+        Loads source into interpreter, from the cache if it holds the program.
+
+        Args:
+            interpreter (BytecodeInterpreter): The interpreter to load the program into.
+            source (str): The bytecode program.
+        Returns:
+            bool: True if the program came from the cache.
+        Raises:
+            BytecodeLoadError: If the program cannot be loaded, as raised by load_program.
+        """
+        key = self.key(source, interpreter)
+        with self._lock:
+            program = self._entries.get(key)
+            if program is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if program is not None:
+            interpreter.load_decoded(program)
+            return True
+        interpreter.load_program(source)
+        program = interpreter.decoded_program()
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return False
+
+    def clear(self) -> None:
+        """Removes every program and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of cached programs, the size limit and the counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1 +1,18 @@
 # This file makes the tests directory a package so unittest discovery works properly.
+import io
+
+from bytecode_interpreter import BytecodeInterpreter
+from bytecode_output import ListSink
+
+
+def run(code, **options):
+    """
+    Runs code and returns the interpreter. Its output goes to a ListSink and its errors to a
+    StringIO unless options pass output or errors.
+    """
+    options.setdefault("output", ListSink())
+    options.setdefault("errors", io.StringIO())
+    interp = BytecodeInterpreter(**options)
+    interp.load_program(code)
+    interp.run()
+    return interp
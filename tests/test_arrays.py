@@ -0,0 +1,118 @@
+import io
+import unittest
+
+from bytecode_interpreter import ENGINES, BytecodeInterpreter, HeapLimitExceeded, RunMetrics
+from bytecode_output import ListSink
+from tests import run
+
+# Fills an array with the squares of 0..4, copies it one place to the right into a second
+# array and prints the sum of that one.
+SQUARES = """
+PUSH 5
+NEWARRAY
+STORE a
+PUSH 6
+NEWARRAY
+STORE b
+PUSH 0
+STORE i
+fill:
+    LOAD i
+    LOAD a
+    ALEN
+    LT
+    JZ copy
+    LOAD a
+    LOAD i
+    LOAD i
+    LOAD i
+    MUL
+    ASTORE
+    LOAD i
+    PUSH 1
+    ADD
+    STORE i
+    JMP fill
+copy:
+    LOAD a
+    PUSH 0
+    LOAD b
+    PUSH 1
+    PUSH 5
+    ACOPY
+    PUSH 0
+    STORE sum
+    PUSH 0
+    STORE i
+total:
+    LOAD i
+    PUSH 6
+    LT
+    JZ end
+    LOAD sum
+    LOAD b
+    LOAD i
+    ALOAD
+    ADD
+    STORE sum
+    LOAD i
+    PUSH 1
+    ADD
+    STORE i
+    JMP total
+end:
+    LOAD sum
+    PRINT
+    HALT
+"""
+
+
+class TestArrays(unittest.TestCase):
+    def test_arrays_on_every_engine(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = run(SQUARES, engine=engine)
+                self.assertEqual(interp.output.getvalue(), "30\n")
+                self.assertEqual([list(values) for values in interp.heap], [[0, 1, 4, 9, 16], [0, 0, 1, 4, 9, 16]])
+                self.assertEqual(interp.stack, [30])
+                self.assertTrue(interp.halted)
+
+    def test_bounds_checks(self):
+        cases = [
+            ("PUSH 3\nNEWARRAY\nPUSH 3\nALOAD", "Array index out of range: 3 (length 3)"),
+            ("PUSH 3\nNEWARRAY\nPUSH -1\nPUSH 7\nASTORE", "Array index out of range: -1 (length 3)"),
+            ("PUSH 1\nPUSH 0\nALOAD", "Invalid array handle: 1"),
+            ("PUSH -2\nNEWARRAY", "Invalid array size: -2"),
+            ("PUSH 3\nNEWARRAY\nPUSH 2\nPUSH 2\nPUSH 0\nAFILL", "Array range out of bounds: 2 elements from 2 (length 3)"),
+            ("PUSH 3\nNEWARRAY\nPUSH 0\nPUSH 9223372036854775808\nASTORE", "Array value out of range: 9223372036854775808"),
+            ("PUSH 1\nNEWARRAY\nALEN\nALOAD", "Stack Underflow."),
+        ]
+        for engine in ENGINES:
+            for code, message in cases:
+                with self.subTest(engine=engine, code=code):
+                    interp = run(code, engine=engine, verify_stack=False)
+                    line = code.count("\n") + 1
+                    self.assertEqual(interp.errors.getvalue(), f"Runtime error at line {line}: {message}\n")
+                    self.assertEqual(interp.program_counter, line - 1)
+
+    def test_heap_quota(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, output=ListSink(), errors=io.StringIO(), max_heap_size=10)
+                interp.load_program("PUSH 6\nNEWARRAY\nPUSH 4\nNEWARRAY\nPUSH 1\nNEWARRAY")
+                with self.assertRaises(HeapLimitExceeded):
+                    interp.run()
+                self.assertEqual(interp.program_counter, 5)
+                self.assertEqual(interp.instructions_executed, 6)
+                self.assertEqual(interp.stack, [0, 1, 1])
+                self.assertEqual([len(values) for values in interp.heap], [6, 4])
+
+        metrics = RunMetrics()
+        interp = BytecodeInterpreter(output=ListSink())
+        interp.load_program("PUSH 6\nNEWARRAY\nPUSH 4\nNEWARRAY")
+        interp.run(metrics=metrics)
+        self.assertEqual(metrics.heap_size, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
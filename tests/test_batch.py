@@ -0,0 +1,95 @@
+import io
+import unittest
+
+from bytecode_input import IterableSource
+from bytecode_interpreter import BytecodeInterpreter
+from bytecode_output import ListSink
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    numpy = None
+else:
+    from bytecode_batch import run_batch
+
+SUM_TO_N = """
+READ
+STORE n
+PUSH 0
+STORE s
+loop:
+    LOAD n
+    JZ end
+    LOAD s
+    LOAD n
+    ADD
+    STORE s
+    LOAD n
+    PUSH 1
+    SUB
+    STORE n
+    JMP loop
+end:
+    LOAD s
+    PRINT
+    PUSH 100
+    LOAD n
+    DIV
+    HALT
+"""
+
+
+def load(code, **options):
+    interp = BytecodeInterpreter(**options)
+    interp.load_program(code)
+    return interp
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+class TestBatch(unittest.TestCase):
+    def test_lanes_match_separate_runs(self):
+        inputs = [[3], [0], [10], [], [3]]
+        results = run_batch(load(SUM_TO_N), inputs)
+        for lane, values in enumerate(inputs):
+            output = ListSink()
+            interp = BytecodeInterpreter(output=output, errors=io.StringIO(), inputs=IterableSource(values))
+            interp.load_program(SUM_TO_N)
+            interp.run()
+            result = results[lane]
+            self.assertEqual(result.output, [int(line) for line in output.lines])
+            self.assertEqual(result.stack, interp.stack)
+            self.assertEqual(result.variables, interp.variables)
+            self.assertEqual(result.error, interp.error)
+            self.assertEqual(result.instructions_executed, interp.instructions_executed)
+        self.assertEqual(results[2].output, [55])
+        # The loop ends with n = 0, so every lane divides by zero.
+        self.assertEqual(results[0].error, "Runtime error at line 22: Division by zero")
+
+    def test_preset_variables_and_limits(self):
+        code = "loop:\nLOAD x\nJZ end\nLOAD x\nPUSH 1\nSUB\nSTORE x\nJMP loop\nend:\nLOAD y\nHALT"
+        results = run_batch(load(code, max_instructions=40), variables={"x": [0, 2, 100], "y": 7})
+        self.assertEqual([result.halted for result in results], [True, True, False])
+        self.assertEqual(results[1].stack, [7])
+        self.assertEqual(results[1].variables, {"x": 0, "y": 7})
+        self.assertEqual(
+            results[2].error, "Runtime error at line 2: Instruction limit exceeded: executed more than 40 instructions."
+        )
+
+    def test_int64_wraparound(self):
+        code = "READ\nREAD\nMUL\nPRINT"
+        results = run_batch(load(code), [[2**32, 2**32], [2**40, 2**40], [-3, 5]])
+        self.assertEqual(results[0].stack, [0])
+        self.assertEqual(results[1].error, None)
+        self.assertEqual(results[1].output, [0])
+        self.assertEqual(results[2].output, [-15])
+
+    def test_lane_count_must_agree(self):
+        with self.assertRaises(ValueError):
+            run_batch(load("HALT"), [[1]], {"x": [1, 2]})
+        with self.assertRaises(ValueError):
+            run_batch(load("HALT"))
+        self.assertEqual(run_batch(load("HALT"), size=0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import glob
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bytecode_binary import assemble, disassemble, read_file, read_program
+from bytecode_interpreter import BytecodeInterpreter, BytecodeLoadError
+
+TESTS_DIR = os.path.dirname(__file__)
+
+# Programs that need special handling: one never terminates, one reads stdin.
+SKIPPED = {"test_infinite_loop.bc", "test_input.bc"}
+
+
+def run(load):
+    """Load a program with load(interp), run it and return (stdout, stderr, stack, variables)."""
+    interp = BytecodeInterpreter()
+    load(interp)
+    with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout, patch(
+        "sys.stderr", new_callable=io.StringIO
+    ) as mock_stderr:
+        interp.run()
+    return mock_stdout.getvalue(), mock_stderr.getvalue(), interp.stack, interp.variables
+
+
+class TestBinary(unittest.TestCase):
+    def test_bc_files_round_trip_and_run_the_same(self):
+        for path in sorted(glob.glob(os.path.join(TESTS_DIR, "*.bc"))):
+            filename = os.path.basename(path)
+            if filename in SKIPPED:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+            with self.subTest(file=filename):
+                try:
+                    image = assemble(code)
+                except BytecodeLoadError:
+                    continue
+                program = read_program(image)
+                self.assertEqual(assemble(disassemble(program)), image)
+                self.assertEqual(
+                    run(lambda interp: interp.load_binary(program)),
+                    run(lambda interp: interp.load_program(code)),
+                )
+
+    def test_disassemble_keeps_lines_and_targets(self):
+        code = "PUSH 2\n\nloop:\n  PUSH -1\n  ADD\n  DUP\n  JNZ loop\nJMP 9\nBAD 1\nSTORE n\n"
+        self.assertEqual(
+            disassemble(read_program(assemble(code))),
+            "PUSH 2\n\nloop:\nPUSH -1\nADD\nDUP\nJNZ loop\nJMP 9\nBAD 1\nSTORE n\n",
+        )
+
+    def test_read_file_maps_the_image(self):
+        code = "PUSH 123456789012345678901234567890\nSTORE big\nPUSH -987654321\nPRINT"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "program.bcx")
+            with open(path, "wb") as f:
+                f.write(assemble(code))
+            program = read_file(path)
+        stdout, stderr, stack, variables = run(lambda interp: interp.load_binary(program))
+        self.assertEqual(stdout, "-987654321\n")
+        self.assertEqual(variables, {"big": 123456789012345678901234567890})
+
+    def test_invalid_image_rejected(self):
+        image = assemble("PUSH 1\nJMP end\nend:\nPRINT")
+        for data in (b"", b"BCX9" + image[4:], image[:30]):
+            with self.assertRaises(BytecodeLoadError):
+                read_program(data)
+        program = read_program(image)
+        program.operands[1] = 99
+        with self.assertRaises(BytecodeLoadError) as cm:
+            BytecodeInterpreter().load_binary(program)
+        self.assertEqual(
+            cm.exception.errors, ["Load error at instruction 1: invalid binary program: target 99 out of range"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bytecode_cache import SUFFIX, BytecodeCache
+from bytecode_interpreter import BytecodeInterpreter, BytecodeLoadError
+
+
+def run(cache, code):
+    """Load code through cache and run it; return (from cache, stdout)."""
+    interp = BytecodeInterpreter()
+    hit = cache.load(interp, code)
+    with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        interp.run()
+    return hit, mock_stdout.getvalue()
+
+
+class TestBytecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = BytecodeCache(os.path.join(self.directory.name, "cache"))
+
+    def test_second_load_comes_from_disk(self):
+        code = "PUSH 6\nPUSH 7\nMUL\nPRINT"
+        self.assertEqual(run(self.cache, code), (False, "42\n"))
+        self.assertEqual(run(self.cache, code), (True, "42\n"))
+        self.assertEqual(os.listdir(self.cache.directory), [os.path.basename(self.cache.path(code))])
+
+    def test_load_errors_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(BytecodeLoadError):
+                self.cache.load(BytecodeInterpreter(), "JMP nowhere")
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_damaged_entry_is_rewritten(self):
+        code = "PUSH 1\nPRINT"
+        run(self.cache, code)
+        with open(self.cache.path(code), "wb") as f:
+            f.write(b"BCX1 damaged")
+        self.assertEqual(run(self.cache, code), (False, "1\n"))
+        self.assertEqual(run(self.cache, code), (True, "1\n"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        programs = [f"PUSH {n}\nPRINT" for n in range(4)]
+        for n, code in enumerate(programs):
+            run(self.cache, code)
+            os.utime(self.cache.path(code), (n, n))
+        size = os.path.getsize(self.cache.path(programs[0]))
+        self.cache.max_bytes = 3 * size
+        os.utime(self.cache.path(programs[0]), (10, 10))  # a recent hit
+        run(self.cache, "PUSH 4\nPRINT")
+        remaining = {path for _, _, path in self.cache.entries()}
+        self.assertEqual(
+            remaining, {self.cache.path(code) for code in (programs[0], programs[3], "PUSH 4\nPRINT")}
+        )
+        self.assertFalse([name for name in os.listdir(self.cache.directory) if not name.endswith(SUFFIX)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from bytecode_interpreter import BytecodeInterpreter
+from bytecode_compiler import compile_program
+
+
+def load(code):
+    interp = BytecodeInterpreter(engine="compiled")
+    interp.load_program(code)
+    return interp
+
+
+class TestCompiler(unittest.TestCase):
+    def test_block_values_stay_in_locals(self):
+        interp = load(
+            """
+            PUSH 2
+            STORE a
+            PUSH 3
+            STORE b
+            LOAD a
+            LOAD b
+            ADD
+            STORE c
+            """
+        )
+        source = compile_program(interp.code, interp.slot_names).source
+        self.assertIn("v2 = (v0 + v1)", source)
+        self.assertNotIn("push(", source)
+        interp.run()
+        self.assertEqual(interp.variables, {"a": 2, "b": 3, "c": 5})
+        self.assertEqual(interp.stack, [])
+
+    def test_error_restores_stack_and_line(self):
+        interp = load(
+            """
+            PUSH 1
+            PUSH 2
+            LOAD missing
+            """
+        )
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 3: Undefined variable: missing\n")
+        self.assertEqual(interp.stack, [1, 2])
+        self.assertEqual(interp.program_counter, 2)
+
+    def test_store_does_not_clobber_pending_load(self):
+        interp = load(
+            """
+            PUSH 1
+            STORE x
+            LOAD x
+            PUSH 5
+            STORE x
+            LOAD x
+            ADD
+            """
+        )
+        interp.run()
+        self.assertEqual(interp.stack, [6])
+        self.assertEqual(interp.variables["x"], 5)
+
+    def test_recursive_calls(self):
+        interp = load(
+            """
+            PUSH 10
+            CALL countdown
+            HALT
+            countdown:
+                DUP
+                JZ done
+                PUSH 1
+                SUB
+                CALL countdown
+            done:
+                RET
+            """
+        )
+        interp.run()
+        self.assertEqual(interp.stack, [0])
+        self.assertTrue(interp.halted)
+        self.assertEqual(interp.call_stack, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
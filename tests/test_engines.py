@@ -0,0 +1,209 @@
+import glob
+import io
+import os
+import unittest
+from unittest.mock import patch
+
+from bytecode_interpreter import (
+    ENGINES,
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    CallDepthExceeded,
+    InstructionLimitExceeded,
+    IntegerSizeExceeded,
+    OutputLimitExceeded,
+    StackLimitExceeded,
+    TimeLimitExceeded,
+)
+from bytecode_output import ListSink
+
+TESTS_DIR = os.path.dirname(__file__)
+
+# Programs that need special handling: one never terminates, one reads stdin.
+SKIPPED = {"test_infinite_loop.bc", "test_input.bc"}
+
+
+def run_with_engine(code, engine, superinstructions=True):
+    """Load and run a program with the given engine; return (stdout, stderr, interpreter)."""
+    interp = BytecodeInterpreter(engine=engine, superinstructions=superinstructions)
+    interp.load_program(code)
+    with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout, patch(
+        "sys.stderr", new_callable=io.StringIO
+    ) as mock_stderr:
+        interp.run()
+    return mock_stdout.getvalue(), mock_stderr.getvalue(), interp
+
+
+class TestEngines(unittest.TestCase):
+    def test_engines_match_dispatch_on_bc_files(self):
+        """Every engine produces the same output, errors and final state as the dispatch engine
+        running the unfused instructions."""
+        for path in sorted(glob.glob(os.path.join(TESTS_DIR, "*.bc"))):
+            filename = os.path.basename(path)
+            if filename in SKIPPED:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+            try:
+                expected_out, expected_err, expected = run_with_engine(
+                    code, "dispatch", superinstructions=False
+                )
+            except BytecodeLoadError:
+                continue
+            for engine in ENGINES:
+                with self.subTest(filename=filename, engine=engine):
+                    out, err, interp = run_with_engine(code, engine)
+                    self.assertEqual(out, expected_out)
+                    self.assertEqual(err, expected_err)
+                    self.assertEqual(interp.stack, expected.stack)
+                    self.assertEqual(interp.variables, expected.variables)
+                    self.assertEqual(interp.halted, expected.halted)
+
+    def test_threaded_engine_reports_error_line(self):
+        code = """
+        PUSH 10
+        PUSH 0
+        DIV
+        PRINT
+        """
+        out, err, interp = run_with_engine(code, "threaded")
+        self.assertEqual(out, "")
+        self.assertEqual(err, "Runtime error at line 3: Division by zero\n")
+
+    def test_tiered_engine_compiles_hot_loop(self):
+        code = """
+        PUSH 500
+        STORE i
+        loop:
+            LOAD i
+            JZ end
+            LOAD i
+            CALL double_func
+            POP
+            LOAD i
+            PUSH 1
+            SUB
+            STORE i
+            JMP loop
+        end:
+            LOAD i
+            PRINT
+            HALT
+        double_func:
+            DUP
+            ADD
+            RET
+        """
+        expected_out, _, expected = run_with_engine(code, "dispatch")
+        out, err, interp = run_with_engine(code, "tiered")
+        self.assertEqual(out, expected_out)
+        self.assertEqual(err, "")
+        self.assertEqual(interp.variables, expected.variables)
+        self.assertGreaterEqual(interp.traces_compiled, 1)
+        # Once compiled, the whole loop runs inside the trace instead of re-entering it per iteration.
+        self.assertLess(interp.traces_entered, 10)
+
+    def test_instruction_limit_stops_every_engine_at_same_point(self):
+        code = """
+        PUSH 0
+        STORE i
+        loop:
+            LOAD i
+            PUSH 1
+            ADD
+            STORE i
+            JMP loop
+        """
+        results = []
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, max_instructions=1000)
+                interp.load_program(code)
+                with self.assertRaises(InstructionLimitExceeded) as cm:
+                    interp.run()
+                self.assertEqual(cm.exception.limit, 1000)
+                self.assertGreater(interp.instructions_executed, 1000)
+                results.append((interp.instructions_executed, interp.program_counter, interp.variables))
+        self.assertEqual(len(set(map(repr, results))), 1)
+
+    def test_call_depth_limit(self):
+        code = """
+        recurse:
+            CALL recurse
+        """
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, max_call_depth=50)
+                interp.load_program(code)
+                with self.assertRaises(CallDepthExceeded):
+                    interp.run()
+                self.assertEqual(len(interp.call_stack), 50)
+                self.assertEqual(interp.line_numbers[interp.program_counter], 2)
+
+    def test_time_limit(self):
+        code = """
+        loop:
+            JMP loop
+        """
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, time_limit=0.05)
+                interp.load_program(code)
+                with self.assertRaises(TimeLimitExceeded):
+                    interp.run()
+
+    def test_quotas_stop_every_engine_at_the_same_instruction(self):
+        cases = [
+            ("loop:\nPUSH 1\nJMP loop", {"max_stack_size": 100}, StackLimitExceeded, 2, 201),
+            ("PUSH 3\nsquare:\nDUP\nMUL\nJMP square", {"max_int_bits": 1000}, IntegerSizeExceeded, 4, 30),
+            ("PUSH 12\nloop:\nPRINT\nJMP loop", {"max_output_bytes": 30}, OutputLimitExceeded, 3, 22),
+        ]
+        for code, quota, error, line, executed in cases:
+            for engine in ENGINES:
+                with self.subTest(quota=quota, engine=engine):
+                    output = ListSink()
+                    interp = BytecodeInterpreter(engine=engine, output=output, **quota)
+                    interp.load_program(code)
+                    with self.assertRaises(error):
+                        interp.run()
+                    self.assertEqual(interp.line_numbers[interp.program_counter], line)
+                    self.assertEqual(interp.instructions_executed, executed)
+                    self.assertLessEqual(output.bytes_written, quota.get("max_output_bytes", 0))
+
+    def test_quotas_keep_the_selected_engine(self):
+        code = "PUSH 0\nloop:\nPUSH 1\nADD\nDUP\nPUSH 100\nLT\nJNZ loop\nPRINT"
+        quotas = {"max_stack_size": 10, "max_int_bits": 64, "max_output_bytes": 100, "max_heap_size": 10}
+        interp = BytecodeInterpreter(engine="tiered", output=ListSink(), **quotas)
+        interp.hot_loop_threshold = 2
+        interp.load_program(code)
+        with patch.object(interp, "_run_instrumented") as instrumented:
+            interp.run()
+        instrumented.assert_not_called()
+        self.assertEqual(interp.output.getvalue(), "100\n")
+        self.assertEqual(interp.traces_compiled, 1)
+
+    def test_quotas_apply_to_step_and_events(self):
+        interp = BytecodeInterpreter(max_stack_size=3)
+        interp.load_program("loop:\nPUSH 1\nJMP loop")
+        with self.assertRaises(StackLimitExceeded):
+            while True:
+                interp.step(5)
+        self.assertEqual(len(interp.stack), 4)
+
+        interp = BytecodeInterpreter(max_int_bits=8)
+        interp.load_program("READ\nPRINT\nREAD\nPRINT")
+        events = interp.events()
+        self.assertEqual(next(events), ("read", None))
+        self.assertEqual(events.send(255), ("print", 255))
+        self.assertEqual(next(events), ("read", None))
+        with self.assertRaises(IntegerSizeExceeded):
+            events.send(256)
+        self.assertEqual(interp.line_numbers[interp.program_counter], 3)
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            BytecodeInterpreter(engine="turbo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from array import array
+from unittest.mock import patch
+
+from bytecode_input import ArraySource, IterableSource, MappedFileSource, TextSource
+from bytecode_interpreter import ENGINES, BytecodeInterpreter
+from bytecode_output import ListSink
+
+SUM_THREE = """
+READ
+READ
+ADD
+READ
+ADD
+PRINT
+"""
+
+
+def run(code, inputs, engine="dispatch"):
+    output = ListSink()
+    interp = BytecodeInterpreter(engine=engine, output=output, inputs=inputs)
+    interp.load_program(code)
+    interp.run()
+    return output.getvalue()
+
+
+class TestInputSources(unittest.TestCase):
+    def test_iterable_source_on_every_engine(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(SUM_THREE, IterableSource([1, 20, 300]), engine), "321\n")
+
+    def test_exhausted_or_invalid_input_reads_zero(self):
+        self.assertEqual(run(SUM_THREE, IterableSource([5])), "5\n")
+        self.assertEqual(run(SUM_THREE, TextSource("7 x\n 9")), "16\n")
+
+    def test_mapped_file_and_array_sources(self):
+        with tempfile.TemporaryDirectory() as directory:
+            text_path = os.path.join(directory, "input.txt")
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write("  -4\n10\t100 ")
+            source = MappedFileSource(text_path)
+            self.assertEqual(run(SUM_THREE, source), "106\n")
+            source.close()
+            empty_path = os.path.join(directory, "empty.txt")
+            open(empty_path, "w").close()
+            self.assertEqual(run(SUM_THREE, MappedFileSource(empty_path)), "0\n")
+        self.assertEqual(run(SUM_THREE, ArraySource(array("q", [-(2**40), 1, 1]))), f"{-(2**40) + 2}\n")
+        self.assertEqual(run(SUM_THREE, ArraySource((3).to_bytes(4, "little") * 3, "i")), "9\n")
+
+    def test_stdin_is_the_default(self):
+        with patch("builtins.input", side_effect=["1", "2", EOFError]):
+            self.assertEqual(run(SUM_THREE, None), "3\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,19 @@
 import unittest
-from bytecode_interpreter import BytecodeInterpreter
+from bytecode_interpreter import (
+    BytecodeInterpreter,
+    BytecodeLoadError,
+    OP_PUSH,
+    OP_LOAD,
+    OP_STORE,
+    OP_JMP,
+    OP_INVALID,
+    OP_LOAD_JZ,
+    OP_LOAD_PUSH_BINARY_STORE,
+    ENGINES,
+    InstructionLimitExceeded,
+    RunMetrics,
+    StackLimitExceeded,
+)
 from unittest.mock import patch
 import io
 import os
@@ -40,6 +54,95 @@ class TestBytecodeInterpreter(unittest.TestCase):
         self.assertEqual(interp.stack, [7])
         self.assertEqual(interp.variables["x"], 7)
 
+    def test_load_program_decodes_instructions(self):
+        code = """
+        PUSH 7
+        STORE x
+        LOAD x
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.code[0], (OP_PUSH, 7))
+        self.assertEqual(interp.code[2], (OP_LOAD, 0))
+        self.assertEqual(interp.slot_names, ["x"])
+        self.assertEqual(interp.instructions[0], "PUSH 7")
+
+    def test_variables_kept_in_slots(self):
+        code = """
+        PUSH 7
+        STORE x
+        LOAD y
+        """
+        interp = BytecodeInterpreter()
+        interp.variables = {"y": 1}
+        interp.load_program(code)
+        self.assertEqual(interp.slot_names, ["y", "x"])
+        self.assertEqual(interp.code[1], (OP_STORE, 1))
+        interp.run()
+        self.assertEqual(interp.stack, [1])
+        self.assertEqual(interp.variables, {"x": 7, "y": 1})
+        interp.variables = {}
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 3: Undefined variable: y\n")
+        self.assertEqual(interp.variables, {"x": 7})
+
+    def test_invalid_instruction_reported_when_executed(self):
+        code = """
+        PUSH 1
+        PRINT
+        PUSH abc
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.code[2][0], OP_INVALID)
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout, patch(
+            "sys.stderr", new_callable=io.StringIO
+        ) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stdout.getvalue(), "1\n")
+        self.assertIn("Runtime error at line 3: invalid literal", mock_stderr.getvalue())
+
+    def test_branch_targets_resolved_at_load(self):
+        code = """
+        PUSH 1
+        JMP skip
+        # comment
+        PUSH 2
+        skip:
+        JMP 7
+        PUSH 3
+        PRINT
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.labels["skip"], 3)
+        self.assertEqual(interp.code[1], (OP_JMP, 3))
+        # Line index 7 is "PRINT", the 6th decoded instruction.
+        self.assertEqual(interp.code[3], (OP_JMP, 5))
+        self.assertEqual(interp.line_numbers[5], 8)
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            interp.run()
+        self.assertEqual(mock_stdout.getvalue(), "1\n")
+
+    def test_undefined_labels_reported_at_load(self):
+        code = """
+        PUSH 0
+        JZ nowhere
+        CALL missing
+        HALT
+        """
+        interp = BytecodeInterpreter()
+        with self.assertRaises(BytecodeLoadError) as ctx:
+            interp.load_program(code)
+        self.assertEqual(
+            ctx.exception.errors,
+            [
+                "Load error at line 2: Invalid jump target: nowhere",
+                "Load error at line 3: Invalid call target: missing",
+            ],
+        )
+
     def run_bc_file_and_capture(self, filename):
         path = os.path.join(os.path.dirname(__file__), filename)
         with open(path, "r", encoding="utf-8") as f:
@@ -50,6 +153,258 @@ class TestBytecodeInterpreter(unittest.TestCase):
             interp.run()
             return mock_stdout.getvalue().strip()
 
+    def test_superinstructions_fused_at_load(self):
+        code = """
+        PUSH 3
+        STORE n
+        loop:
+            LOAD n
+            JZ end
+            LOAD n
+            PUSH 1
+            SUB
+            STORE n
+            JMP loop
+        end:
+            LOAD n
+            PUSH 0
+            DIV
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.fused_code[2], (OP_LOAD_JZ, (0, 9)))
+        self.assertEqual(interp.fused_code[4][0], OP_LOAD_PUSH_BINARY_STORE)
+        # The covered instructions stay in place for jumps into the middle of a sequence.
+        self.assertEqual(interp.fused_code[3], interp.code[3])
+        # Dividing by a constant zero would fail after the PUSH, so it is not fused.
+        self.assertEqual(interp.fused_code[9:], interp.code[9:])
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 14: Division by zero\n")
+        self.assertEqual(interp.variables, {"n": 0})
+        self.assertEqual(interp.stack, [])
+
+    def test_superinstruction_error_keeps_line_number(self):
+        code = """
+        PUSH 1
+        LOAD missing
+        PUSH 1
+        SUB
+        STORE x
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.fused_code[1][0], OP_LOAD_PUSH_BINARY_STORE)
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 2: Undefined variable: missing\n")
+        self.assertEqual(interp.stack, [1])
+        self.assertEqual(interp.program_counter, 1)
+
+    def test_step_resumes_where_it_stopped(self):
+        code = """
+        PUSH 3
+        STORE n
+        loop:
+            LOAD n
+            JZ end
+            LOAD n
+            PUSH 1
+            SUB
+            STORE n
+            JMP loop
+        end:
+            HALT
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        self.assertEqual(interp.step(), 1)
+        self.assertEqual(interp.stack, [3])
+        self.assertEqual(interp.program_counter, 1)
+        # A slice ending inside a superinstruction executes only part of it.
+        self.assertEqual(interp.run_for(5), 5)
+        self.assertEqual(interp.instructions_executed, 6)
+        self.assertEqual(interp.program_counter, 6)
+        while not interp.finished:
+            interp.run_for(4)
+        self.assertTrue(interp.halted)
+        self.assertEqual(interp.variables, {"n": 0})
+        self.assertEqual(interp.step(10), 0)
+
+    def test_events_stream_io(self):
+        code = """
+        READ
+        DUP
+        PRINT
+        MUL
+        PRINT
+        HALT
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        events = interp.events()
+        self.assertEqual(next(events), ("read", None))
+        self.assertEqual(events.send("7"), ("print", 7))
+        self.assertEqual(next(events), ("print", 49))
+        self.assertEqual(next(events), ("halt", None))
+        self.assertIsNone(next(events, None))
+        self.assertEqual(interp.instructions_executed, 6)
+
+    def test_events_report_errors(self):
+        interp = BytecodeInterpreter()
+        interp.load_program("PUSH 1\nPRINT\nLOAD x")
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            events = list(interp.events())
+        self.assertEqual(events, [("print", 1), ("error", "Runtime error at line 3: Undefined variable: x")])
+        self.assertEqual(mock_stderr.getvalue(), "")
+        self.assertEqual(interp.error, "Runtime error at line 3: Undefined variable: x")
+
+    def test_run_metrics(self):
+        code = """
+        PUSH 3
+        STORE n
+        PUSH 2
+        STORE x
+        loop:
+            LOAD x
+            LOAD x
+            MUL
+            STORE x
+            LOAD n
+            PUSH 1
+            SUB
+            DUP
+            STORE n
+            JNZ loop
+        CALL f
+        HALT
+        f:
+            CALL g
+            RET
+        g:
+            PUSH 1
+            PUSH 2
+            PUSH 3
+            POP
+            POP
+            POP
+            RET
+        """
+        interp = BytecodeInterpreter()
+        interp.load_program(code)
+        metrics = RunMetrics()
+        interp.run(metrics=metrics)
+        self.assertEqual(interp.variables, {"n": 0, "x": 256})
+        self.assertEqual(metrics.instructions_executed, interp.instructions_executed)
+        self.assertEqual(metrics.peak_stack_depth, 3)
+        self.assertEqual(metrics.peak_call_depth, 2)
+        self.assertEqual(metrics.live_variables, 2)
+        # x reaches 16 * 16 = 256.
+        self.assertEqual(metrics.max_int_bits, 9)
+        self.assertGreater(metrics.wall_time, 0.0)
+        self.assertIn("Peak call depth: 2", metrics.report())
+        self.assertEqual(metrics.to_dict()["peak_stack_depth"], 3)
+
+    def test_run_metrics_filled_when_limit_exceeded(self):
+        interp = BytecodeInterpreter(max_instructions=100)
+        interp.load_program("loop:\nPUSH -5\nJMP loop")
+        metrics = RunMetrics()
+        with self.assertRaises(InstructionLimitExceeded):
+            interp.run(metrics=metrics)
+        self.assertEqual(metrics.instructions_executed, 102)
+        self.assertEqual(metrics.peak_stack_depth, 51)
+        self.assertEqual(metrics.max_int_bits, 3)
+
+    def test_stack_limit_stops_straight_line_code_at_the_push(self):
+        code = "\n".join(["PUSH 1"] * 10 + ["HALT"])
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, max_stack_size=4)
+                interp.load_program(code)
+                with self.assertRaises(StackLimitExceeded):
+                    interp.run()
+                self.assertEqual(interp.line_numbers[interp.program_counter], 5)
+                self.assertEqual(interp.instructions_executed, 5)
+                self.assertEqual(len(interp.stack), 5)
+        # Stepping, and a program that stays within the limit, agree.
+        interp = BytecodeInterpreter(max_stack_size=4)
+        interp.load_program(code)
+        with self.assertRaises(StackLimitExceeded):
+            interp.step(10)
+        self.assertEqual(interp.line_numbers[interp.program_counter], 5)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine, max_stack_size=10)
+                interp.load_program(code)
+                interp.run()
+                self.assertEqual(len(interp.stack), 10)
+
+    def test_stack_limit_stops_recursion_at_the_push(self):
+        code = """
+        f:
+            PUSH 1
+            PUSH 2
+            PUSH 3
+            CALL f
+        """
+        for engine in ENGINES:
+            for metrics in (None, RunMetrics()):
+                with self.subTest(engine=engine, metrics=metrics is not None):
+                    interp = BytecodeInterpreter(engine=engine, max_stack_size=5)
+                    interp.load_program(code)
+                    with self.assertRaises(StackLimitExceeded):
+                        interp.run(metrics=metrics)
+                    self.assertEqual(interp.line_numbers[interp.program_counter], 4)
+                    self.assertEqual(interp.instructions_executed, 7)
+                    self.assertEqual(interp.stack, [1, 2, 3, 1, 2, 3])
+                    self.assertEqual(interp.call_stack, [4])
+
+    def test_fixed_width_integers(self):
+        code = """
+        PUSH 1
+        STORE x
+        loop:
+            LOAD x
+            PUSH 65536
+            MUL
+            DUP
+            STORE x
+            JNZ loop
+        LOAD x
+        PUSH -2147483648
+        PUSH -1
+        DIV
+        HALT
+        """
+        interp = BytecodeInterpreter(int_width=32)
+        interp.load_program(code)
+        interp.run()
+        # 65536 * 65536 wraps to 0, and so does -2**31 // -1 back to -2**31.
+        self.assertEqual(interp.variables, {"x": 0})
+        self.assertEqual(interp.stack, [0, -2147483648])
+
+        interp = BytecodeInterpreter(int_width=64, overflow="trap")
+        interp.load_program(code)
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(
+            mock_stderr.getvalue(),
+            "Runtime error at line 6: Integer overflow: 18446744073709551616 does not fit in 64 bits\n",
+        )
+        self.assertEqual(interp.variables, {"x": 281474976710656})
+
+        interp = BytecodeInterpreter(int_width=32)
+        interp.load_program("PUSH 4294967297\nREAD")
+        with patch("builtins.input", return_value="2147483648"):
+            interp.step(2)
+        self.assertEqual(interp.stack, [1, -2147483648])
+
+    def test_fixed_width_options_validated(self):
+        with self.assertRaises(ValueError):
+            BytecodeInterpreter(int_width=16)
+        with self.assertRaises(ValueError):
+            BytecodeInterpreter(int_width=64, overflow="saturate")
+
     def test_bc_files(self):
         cases = [
             ("test1.bc", "20"),
@@ -69,10 +424,10 @@ class TestBytecodeInterpreter(unittest.TestCase):
         with open(path, "r", encoding="utf-8") as f:
             code = f.read()
         interp = BytecodeInterpreter()
-        interp.load_program(code)
 
-        # Try to run and capture any exceptions
+        # Try to load and run and capture any exceptions
         try:
+            interp.load_program(code)
             with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
                 interp.run()
                 return mock_stdout.getvalue().strip(), None
@@ -0,0 +1,98 @@
+import io
+import unittest
+
+from bytecode_binary import assemble, disassemble, read_program
+from bytecode_interpreter import ENGINES, BytecodeInterpreter, BytecodeLoadError
+from bytecode_intrinsics import standard_registry
+from bytecode_output import ListSink
+from bytecode_profiler import Profile
+from tests import run
+
+# 2**10 = 1024, divmod(1024, 7) = (146, 2), gcd(2, 2) = 2, isqrt(1024) = 32; PRINT does not pop.
+PROGRAM = """
+PUSH 2
+PUSH 10
+NATIVE pow
+DUP
+STORE p
+PUSH 7
+NATIVE divmod
+DUP
+PRINT
+NATIVE gcd
+PRINT
+LOAD p
+NATIVE isqrt
+PRINT
+HALT
+"""
+
+
+class TestIntrinsics(unittest.TestCase):
+    def test_standard_intrinsics_on_every_engine(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = run(PROGRAM, engine=engine)
+                self.assertEqual(interp.output.getvalue(), "2\n2\n32\n")
+                self.assertEqual(interp.stack, [146, 2, 32])
+                self.assertEqual(interp.variables, {"p": 1024})
+                self.assertTrue(interp.halted)
+
+    def test_error_reported_at_the_call(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = run("PUSH 5\nPUSH 3\nPUSH -1\nNATIVE pow\nPRINT", engine=engine)
+                self.assertEqual(interp.errors.getvalue(), "Runtime error at line 4: pow: negative exponent\n")
+                self.assertEqual(interp.stack, [5])
+                self.assertEqual(interp.program_counter, 3)
+
+    def test_host_registered_intrinsic(self):
+        intrinsics = standard_registry()
+        intrinsics.register("clamp", lambda value, low, high: max(low, min(value, high)), 3)
+        intrinsics.register("swap", lambda a, b: (b, a), 2, 2)
+        interp = run("PUSH 15\nPUSH 0\nPUSH 9\nNATIVE clamp\nPUSH 1\nNATIVE swap", intrinsics=intrinsics)
+        self.assertEqual(interp.stack, [1, 9])
+        self.assertNotIn("clamp", standard_registry())
+        with self.assertRaises(ValueError):
+            intrinsics.register("two words", abs, 1)
+
+    def test_unknown_intrinsic_and_underflow_at_load(self):
+        interp = BytecodeInterpreter()
+        with self.assertRaises(BytecodeLoadError) as cm:
+            interp.load_program("PUSH 1\nNATIVE nope")
+        self.assertEqual(cm.exception.errors, ["Load error at line 2: Unknown intrinsic: nope"])
+        with self.assertRaises(BytecodeLoadError) as cm:
+            interp = BytecodeInterpreter(strict_stack=True)
+            interp.load_program("PUSH 1\nNATIVE gcd")
+        self.assertEqual(
+            cm.exception.errors,
+            ["Load error at line 2: Stack underflow: NATIVE gcd needs 2 values, 1 may be on the stack"],
+        )
+
+    def test_fixed_width_applies_to_every_result(self):
+        code = "PUSH -2147483648\nPUSH -1\nNATIVE divmod"
+        self.assertEqual(run(code, int_width=32).stack, [-2147483648, 0])
+        interp = run(code, int_width=32, overflow="trap")
+        self.assertEqual(
+            interp.errors.getvalue(), "Runtime error at line 3: Integer overflow: 2147483648 does not fit in 32 bits\n"
+        )
+
+    def test_profile_counts_and_binary_round_trip(self):
+        profile = Profile(sample_interval=1)
+        interp = BytecodeInterpreter(output=ListSink(), errors=io.StringIO())
+        interp.load_program(PROGRAM)
+        interp.run(profile=profile)
+        counts = {entry["intrinsic"]: entry["count"] for entry in profile.intrinsic_stats()}
+        self.assertEqual(counts, {"pow": 1, "divmod": 1, "gcd": 1, "isqrt": 1})
+        self.assertIn("Intrinsic", profile.report())
+
+        source = disassemble(read_program(assemble(PROGRAM)))
+        self.assertIn("NATIVE divmod", source)
+        interp = BytecodeInterpreter(output=ListSink(), errors=io.StringIO())
+        interp.load_binary(read_program(assemble(PROGRAM)))
+        interp.run()
+        self.assertEqual(interp.output.getvalue(), "2\n2\n32\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+
+from bytecode_interpreter import ENGINES, BytecodeInterpreter
+from bytecode_memo import MemoTable
+from bytecode_output import ListSink
+from bytecode_profiler import Profile
+from bytecode_verifier import find_pure_subroutines
+from tests import run
+
+# Prints sum(n) = n + sum(n - 1) for n = 0..19; every call but the first of each n is a hit.
+SUMS = """
+PUSH 0
+STORE i
+loop:
+    LOAD i
+    PUSH 20
+    LT
+    JZ end
+    LOAD i
+    CALL sum
+    PRINT
+    POP
+    LOAD i
+    PUSH 1
+    ADD
+    STORE i
+    JMP loop
+end:
+    HALT
+sum:
+    DUP
+    JZ done
+    DUP
+    PUSH 1
+    SUB
+    CALL sum
+    ADD
+done:
+    RET
+"""
+
+
+class TestMemoization(unittest.TestCase):
+    def test_recursion_hits_on_every_engine(self):
+        expected = run(SUMS)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = run(SUMS, engine=engine, memoize=True)
+                self.assertEqual(interp.output.getvalue(), expected.output.getvalue())
+                self.assertEqual(interp.stack, expected.stack)
+                self.assertEqual(interp.variables, {"i": 20})
+                self.assertEqual((interp.memo.hits, interp.memo.misses), (19, 20))
+                self.assertLess(interp.instructions_executed, expected.instructions_executed)
+        self.assertEqual(expected.memo.hits + expected.memo.misses, 0)
+
+    def test_only_stack_functions_are_pure(self):
+        interp = BytecodeInterpreter()
+        interp.load_program(
+            """
+            PUSH 3
+            CALL double
+            CALL add_global
+            CALL show
+            CALL twice
+            PUSH 1
+            PUSH 2
+            CALL pair
+            HALT
+            double:
+                DUP
+                ADD
+                RET
+            add_global:
+                LOAD g
+                ADD
+                RET
+            show:
+                PRINT
+                RET
+            twice:
+                CALL double
+                CALL show
+                RET
+            pair:
+                MUL
+                PUSH 7
+                RET
+            """
+        )
+        pure = find_pure_subroutines(interp.code)
+        self.assertEqual(
+            {entry: (sub.arguments, sub.results) for entry, sub in pure.items()},
+            {interp.labels["double"]: (1, 1), interp.labels["pair"]: (2, 2)},
+        )
+
+    def test_lru_eviction_and_counters(self):
+        memo = MemoTable(2)
+        memo.put((0, (1,)), (1,))
+        memo.put((0, (2,)), (2,))
+        self.assertEqual(memo.get((0, (1,))), (1,))
+        memo.put((0, (3,)), (3,))
+        self.assertIsNone(memo.get((0, (2,))))
+        self.assertEqual(memo.to_dict()["evictions"], 1)
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (1, 1, 2))
+        with self.assertRaises(ValueError):
+            MemoTable(0)
+
+        interp = run(SUMS, memoize=True, memo_size=1)
+        self.assertEqual(interp.output.getvalue().split()[-1], "190")
+        self.assertEqual(len(interp.memo), 1)
+
+    def test_memo_kept_between_runs_and_cleared_on_load(self):
+        interp = run(SUMS, memoize=True)
+        interp.run()
+        self.assertEqual((interp.memo.hits, interp.memo.misses), (39, 20))
+        interp.load_program(SUMS)
+        self.assertEqual(len(interp.memo), 0)
+
+    def test_profile_attributes_only_made_calls(self):
+        profile = Profile(sample_interval=1)
+        interp = BytecodeInterpreter(output=ListSink(), memoize=True)
+        interp.load_program(SUMS)
+        interp.run(profile=profile)
+        self.assertEqual(interp.output.getvalue().split()[-1], "190")
+        self.assertEqual(profile.counts[interp.labels["sum"]], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
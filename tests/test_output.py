@@ -0,0 +1,77 @@
+import io
+import unittest
+
+from bytecode_interpreter import ENGINES, BytecodeInterpreter, OutputLimitExceeded
+from bytecode_output import CallbackSink, FileSink, ListSink, RingBufferSink
+from tests import run
+
+COUNTDOWN = """
+PUSH 5
+loop:
+    PRINT
+    PUSH 1
+    SUB
+    DUP
+    JNZ loop
+POP
+POP
+"""
+
+
+class TestOutputSinks(unittest.TestCase):
+    def test_list_sink_on_every_engine(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                output, errors = ListSink(), io.StringIO()
+                run(COUNTDOWN, engine=engine, output=output, errors=errors)
+                self.assertEqual(output.getvalue(), "5\n4\n3\n2\n1\n")
+                self.assertEqual(errors.getvalue(), "Runtime error at line 9: Stack Underflow.\n")
+
+    def test_max_bytes_truncates_whole_lines(self):
+        output = ListSink(max_bytes=7)
+        run(COUNTDOWN, output=output, errors=io.StringIO())
+        self.assertEqual(output.getvalue(), "5\n4\n3\n")
+        self.assertTrue(output.truncated)
+        self.assertEqual(output.bytes_written, 6)
+
+    def test_quota_raises_and_restarts_with_each_run(self):
+        output = ListSink()
+        interp = BytecodeInterpreter(output=output, max_output_bytes=7)
+        interp.load_program(COUNTDOWN)
+        with self.assertRaises(OutputLimitExceeded):
+            interp.run()
+        self.assertEqual(output.getvalue(), "5\n4\n3\n")
+        self.assertEqual(interp.line_numbers[interp.program_counter], 3)
+        with self.assertRaises(OutputLimitExceeded):
+            interp.run()
+        self.assertEqual(output.getvalue(), "5\n4\n3\n" * 2)
+        output.set_quota(None, OutputLimitExceeded)
+        output.write(12345678)
+        self.assertEqual(output.bytes_written, 21)
+
+    def test_ring_buffer_keeps_last_lines(self):
+        output = RingBufferSink(2)
+        run(COUNTDOWN, output=output, errors=io.StringIO())
+        self.assertEqual(output.getvalue(), "2\n1\n")
+        self.assertEqual(output.dropped, 3)
+
+    def test_callback_sink_batches(self):
+        batches = []
+        run(COUNTDOWN, output=CallbackSink(batches.append, batch_lines=2), errors=io.StringIO())
+        self.assertEqual(batches, ["5\n4\n", "3\n2\n", "1\n"])
+
+    def test_file_sink_flushes_before_errors(self):
+        stream = io.StringIO()
+        run(COUNTDOWN, output=FileSink(stream), errors=stream)
+        self.assertEqual(stream.getvalue(), "5\n4\n3\n2\n1\nRuntime error at line 9: Stack Underflow.\n")
+
+    def test_run_for_flushes_output(self):
+        stream = io.StringIO()
+        interp = BytecodeInterpreter(output=FileSink(stream))
+        interp.load_program(COUNTDOWN)
+        interp.run_for(3)
+        self.assertEqual(stream.getvalue(), "5\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
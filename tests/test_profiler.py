@@ -0,0 +1,126 @@
+import io
+import json
+import unittest
+
+from bytecode_interpreter import BytecodeInterpreter, InstructionLimitExceeded
+from bytecode_output import ListSink
+from bytecode_profiler import ROOT_FRAME, Profile
+
+LOOP = """
+PUSH 3
+STORE n
+loop:
+    LOAD n
+    JZ end
+    LOAD n
+    PUSH 1
+    SUB
+    STORE n
+    JMP loop
+end:
+    HALT
+"""
+
+CALLS = """
+CALL outer
+CALL inner
+HALT
+outer:
+    CALL inner
+    CALL inner
+    RET
+inner:
+    PUSH 1
+    POP
+    RET
+"""
+
+
+def profiled(code, profile, **options):
+    interp = BytecodeInterpreter(output=ListSink(), errors=io.StringIO(), **options)
+    interp.load_program(code)
+    interp.run(profile=profile)
+    return interp
+
+
+class TestProfiler(unittest.TestCase):
+    def test_counts_per_opcode_and_line(self):
+        profile = Profile(sample_interval=1)
+        interp = profiled(LOOP, profile)
+        self.assertTrue(interp.halted)
+        self.assertEqual(profile.total, interp.instructions_executed)
+        self.assertEqual(profile.total, 2 + 3 * 7 + 3)
+        counts = {entry["opcode"]: entry["count"] for entry in profile.opcode_stats()}
+        self.assertEqual(counts, {"LOAD": 7, "JZ": 4, "PUSH": 4, "SUB": 3, "STORE": 4, "JMP": 3, "HALT": 1})
+        self.assertTrue(all(entry["time"] is not None for entry in profile.opcode_stats()))
+        self.assertEqual(profile.line_stats()[0], {"line": 4, "count": 4, "instruction": "LOAD n"})
+
+    def test_profile_accumulates_over_runs(self):
+        profile = Profile()
+        interp = profiled(LOOP, profile)
+        interp.run(profile=profile)
+        self.assertEqual(profile.total, 2 * interp.instructions_executed)
+
+    def test_limits_and_errors_match_the_engines(self):
+        profile = Profile(seed=1)
+        with self.assertRaises(InstructionLimitExceeded):
+            profiled("loop:\nJMP loop", profile, max_instructions=10)
+        self.assertEqual(profile.total, 11)
+
+        errors = io.StringIO()
+        interp = BytecodeInterpreter(errors=errors)
+        interp.load_program("PUSH 1\nPOP\nPOP")
+        interp.run(profile=Profile())
+        self.assertEqual(errors.getvalue(), "Runtime error at line 3: Stack Underflow.\n")
+
+    def test_report_and_json(self):
+        profile = Profile(seed=2)
+        profiled(LOOP, profile)
+        report = profile.report(top=2)
+        self.assertIn("Instructions executed: 26", report)
+        self.assertIn("     4            4  15.4%  LOAD n", report)
+        data = json.loads(json.dumps(profile.to_dict()))
+        self.assertEqual(data["instructions_executed"], 26)
+        self.assertEqual(len(data["lines"]), 10)
+
+
+class TestCallGraph(unittest.TestCase):
+    def test_inclusive_and_exclusive_counts(self):
+        profile = Profile()
+        interp = profiled(CALLS, profile)
+        self.assertEqual(interp.instructions_executed, 15)
+        self.assertEqual(
+            profile.stacks,
+            {(ROOT_FRAME,): 3, (ROOT_FRAME, "outer"): 3, (ROOT_FRAME, "outer", "inner"): 6, (ROOT_FRAME, "inner"): 3},
+        )
+        stats = {entry["function"]: entry for entry in profile.function_stats()}
+        self.assertEqual(
+            [(name, entry["calls"], entry["inclusive_count"], entry["exclusive_count"]) for name, entry in stats.items()],
+            [(ROOT_FRAME, 0, 15, 3), ("inner", 3, 9, 9), ("outer", 1, 9, 3)],
+        )
+        self.assertGreaterEqual(stats["outer"]["inclusive_time"], stats["outer"]["exclusive_time"])
+        self.assertIn("inner", profile.report())
+
+    def test_collapsed_stacks(self):
+        profile = Profile()
+        profiled(CALLS, profile)
+        self.assertEqual(
+            profile.collapsed(),
+            "<main> 3\n<main>;inner 3\n<main>;outer 3\n<main>;outer;inner 6\n",
+        )
+        self.assertEqual(len(profile.collapsed("time").splitlines()), 4)
+        with self.assertRaises(ValueError):
+            profile.collapsed("calls")
+
+    def test_recursion_and_unlabelled_targets(self):
+        code = "PUSH 2\nCALL 3\nHALT\nDUP\nJZ 8\nPUSH 1\nSUB\nCALL 3\nRET"
+        profile = Profile()
+        profiled(code, profile)
+        stats = {entry["function"]: entry for entry in profile.function_stats()}
+        self.assertEqual(stats["line 4"]["calls"], 3)
+        # Each instruction counts once towards the inclusive count of a recursive function.
+        self.assertEqual(stats["line 4"]["inclusive_count"], profile.total - 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from bytecode_interpreter import BytecodeInterpreter, BytecodeLoadError
+from program_cache import ProgramCache
+
+COUNTDOWN = """
+PUSH 3
+STORE n
+loop:
+    LOAD n
+    JZ end
+    LOAD n
+    PRINT
+    PUSH 1
+    SUB
+    STORE n
+    JMP loop
+end:
+    HALT
+"""
+
+
+def run(interp):
+    with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+        interp.run()
+    return mock_stdout.getvalue()
+
+
+class TestProgramCache(unittest.TestCase):
+    def test_hit_shares_decoded_program_not_state(self):
+        cache = ProgramCache()
+        first = BytecodeInterpreter()
+        self.assertFalse(cache.load(first, COUNTDOWN))
+        self.assertEqual(run(first), "3\n2\n1\n")
+        second = BytecodeInterpreter(engine="threaded")
+        self.assertTrue(cache.load(second, COUNTDOWN))
+        self.assertIs(second.code, first.code)
+        self.assertEqual(second.variables, {})
+        self.assertEqual(run(second), "3\n2\n1\n")
+        self.assertEqual(second.variables, {"n": 0})
+        self.assertEqual(cache.stats(), {"entries": 1, "max_entries": 128, "hits": 1, "misses": 1, "evictions": 0})
+
+    def test_lru_eviction(self):
+        cache = ProgramCache(max_entries=2)
+        for code in ("PUSH 1", "PUSH 2", "PUSH 1", "PUSH 3", "PUSH 1", "PUSH 2"):
+            cache.load(BytecodeInterpreter(), code)
+        # PUSH 2 was evicted by PUSH 3, and PUSH 3 by PUSH 2 again; PUSH 1 stayed in use.
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (2, 4, 2))
+        self.assertEqual(len(cache), 2)
+
+    def test_loader_settings_are_part_of_the_key(self):
+        cache = ProgramCache()
+        cache.load(BytecodeInterpreter(), "PUSH 1\nPOP\nPOP")
+        with self.assertRaises(BytecodeLoadError):
+            cache.load(BytecodeInterpreter(strict_stack=True), "PUSH 1\nPOP\nPOP")
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 2, 1))
+
+    def test_existing_variables_get_remapped_slots(self):
+        cache = ProgramCache()
+        cache.load(BytecodeInterpreter(), "LOAD a\nLOAD b\nADD\nSTORE c")
+        interp = BytecodeInterpreter()
+        interp.variables = {"b": 2, "a": 40}
+        self.assertTrue(cache.load(interp, "LOAD a\nLOAD b\nADD\nSTORE c"))
+        run(interp)
+        self.assertEqual(interp.variables, {"a": 40, "b": 2, "c": 42})
+
+
+if __name__ == "__main__":
+    unittest.main()
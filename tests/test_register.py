@@ -0,0 +1,102 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from bytecode_interpreter import BytecodeInterpreter
+from bytecode_register import R_ADD, R_COMPARE, translate_program
+
+
+def load(code):
+    interp = BytecodeInterpreter(engine="register")
+    interp.load_program(code)
+    return interp
+
+
+class TestRegisterTranslation(unittest.TestCase):
+    def test_load_load_add_store_becomes_one_instruction(self):
+        interp = load(
+            """
+            PUSH 2
+            STORE a
+            PUSH 3
+            STORE b
+            LOAD a
+            LOAD b
+            ADD
+            STORE c
+            """
+        )
+        program = translate_program(interp.code, interp.slot_names)
+        a, b, c = (interp.slot_names.index(name) for name in "abc")
+        self.assertIn((R_ADD, c, a, b), program.code)
+        self.assertIn("    c = a + b\n", program.listing())
+        self.assertEqual(len(program.code), 4)
+        interp.run()
+        self.assertEqual(interp.variables, {"a": 2, "b": 3, "c": 5})
+        self.assertEqual(interp.stack, [])
+        self.assertEqual(interp.instructions_executed, 8)
+
+    def test_comparison_fused_with_branch_and_loads_checked_once(self):
+        interp = load(
+            """
+            PUSH 5
+            STORE x
+            loop:
+            LOAD x
+            PUSH 0
+            GT
+            JZ end
+            LOAD x
+            PUSH 1
+            SUB
+            STORE x
+            JMP loop
+            end:
+            HALT
+            """
+        )
+        program = translate_program(interp.code, interp.slot_names)
+        self.assertEqual(sum(1 for instruction in program.code if instruction[0] == R_COMPARE), 1)
+        # x is stored before the loop, so no block has to check that it is defined.
+        self.assertNotIn("check x defined", program.listing())
+        interp.run()
+        self.assertEqual(interp.variables, {"x": 0})
+        self.assertTrue(interp.halted)
+
+    def test_error_restores_stack_and_line(self):
+        interp = load(
+            """
+            PUSH 1
+            PUSH 2
+            LOAD missing
+            """
+        )
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            interp.run()
+        self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 3: Undefined variable: missing\n")
+        self.assertEqual(interp.stack, [1, 2])
+        self.assertEqual(interp.program_counter, 2)
+        self.assertEqual(interp.instructions_executed, 3)
+
+    def test_values_from_earlier_blocks_use_the_real_stack(self):
+        interp = load(
+            """
+            PUSH 6
+            PUSH 7
+            CALL multiply
+            PRINT
+            HALT
+            multiply:
+            MUL
+            RET
+            """
+        )
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            interp.run()
+        self.assertEqual(mock_stdout.getvalue(), "42\n")
+        self.assertEqual(interp.stack, [42])
+        self.assertEqual(interp.instructions_executed, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
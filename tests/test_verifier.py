@@ -0,0 +1,157 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from bytecode_interpreter import BytecodeInterpreter, BytecodeLoadError, ENGINES
+from bytecode_verifier import analyze_stack
+
+
+def load(code, **options):
+    interp = BytecodeInterpreter(**options)
+    interp.load_program(code)
+    return interp
+
+
+class TestVerifier(unittest.TestCase):
+    def test_depths_through_calls(self):
+        interp = load(
+            """
+            PUSH 3
+            CALL double
+            PRINT
+            HALT
+            double:
+                DUP
+                ADD
+                RET
+            """
+        )
+        analysis = interp.stack_analysis
+        self.assertTrue(analysis.verified)
+        self.assertEqual(analysis.depths, [0, 1, 1, 1, 1, 2, 1])
+        self.assertEqual(analysis.max_depth, 2)
+
+    def test_underflow_flagged(self):
+        analysis = load(
+            """
+            PUSH 1
+            ADD
+            HALT
+            """
+        ).stack_analysis
+        self.assertFalse(analysis.verified)
+        self.assertEqual(analysis.underflows, [(1, "Stack underflow: ADD needs 2 values, 1 may be on the stack")])
+
+    def test_loop_growing_stack_not_verified(self):
+        analysis = load(
+            """
+            loop:
+                PUSH 1
+                JMP loop
+            """
+        ).stack_analysis
+        self.assertFalse(analysis.verified)
+        self.assertEqual(analysis.conflicts, [(0, "reached with 0 and 1 values")])
+        self.assertIsNone(analysis.max_depth)
+
+    def test_recursion_growing_stack_is_unbounded(self):
+        analysis = analyze_stack(
+            load(
+                """
+                PUSH 5
+                CALL down
+                HALT
+                down:
+                    DUP
+                    JZ done
+                    DUP
+                    PUSH 1
+                    SUB
+                    CALL down
+                    POP
+                done:
+                    RET
+                """
+            ).code
+        )
+        self.assertTrue(analysis.verified)
+        self.assertIsNone(analysis.max_depth)
+
+    def test_conflicting_return_cuts_off_later_calls(self):
+        # f's recursive RET only disagrees with its base case once f is known to return,
+        # which happens after the code calling g was first reached.
+        interp = load(
+            """
+            PUSH 1
+            CALL f
+            CALL g
+            HALT
+            f:
+                JZ base
+                PUSH 0
+                CALL f
+                PUSH 3
+                RET
+            base:
+                RET
+            g:
+                RET
+            """
+        )
+        analysis = interp.stack_analysis
+        self.assertFalse(analysis.verified)
+        self.assertIsNone(analysis.depths[interp.labels["g"]])
+        self.assertNotIn(interp.labels["g"], analysis.subroutine_depths)
+        self.assertIsNone(analysis.returns[interp.labels["f"]])
+
+    def test_strict_stack_rejects_underflow(self):
+        with self.assertRaises(BytecodeLoadError) as cm:
+            load("PUSH 1\nPOP\nPOP", strict_stack=True)
+        self.assertEqual(
+            cm.exception.errors, ["Load error at line 3: Stack underflow: POP needs 1 value, 0 may be on the stack"]
+        )
+
+    def test_unverified_program_keeps_checks(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = load("PUSH 1\nADD\nPOP\nPOP\nPUSH 2", engine=engine)
+                with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+                    interp.run()
+                self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 4: Stack Underflow.\n")
+
+    def test_leftover_call_stack_disables_fast_path(self):
+        code = """
+        LOAD t
+        JZ first
+        RET
+        first:
+            PUSH 1
+            STORE t
+            CALL get
+            POP
+            HALT
+        get:
+            PUSH 5
+            LOAD t
+            JNZ stop
+            RET
+        stop:
+            HALT
+        """
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interp = BytecodeInterpreter(engine=engine)
+                interp.variables = {"t": 0}
+                interp.load_program(code)
+                self.assertTrue(interp.stack_analysis.verified)
+                interp.run()
+                self.assertEqual(interp.call_stack, [6])
+                # The second run returns from the main program into the stale call site.
+                interp.stack = []
+                with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+                    interp.run()
+                self.assertEqual(mock_stderr.getvalue(), "Runtime error at line 8: Stack Underflow.\n")
+
+
+if __name__ == "__main__":
+    unittest.main()